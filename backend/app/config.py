@@ -1,8 +1,8 @@
 
 import os
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
-from openai import OpenAI
+from elasticsearch import AsyncElasticsearch
+from openai import AsyncOpenAI
 
 load_dotenv()
 
@@ -13,10 +13,137 @@ LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
 LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
 
+# Speech-to-text: any OpenAI-compatible /audio/transcriptions endpoint
+STT_BASE_URL = os.getenv("STT_BASE_URL", "https://api.groq.com/openai/v1")
+STT_API_KEY = os.getenv("STT_API_KEY", LLM_API_KEY)
+STT_MODEL = os.getenv("STT_MODEL", "whisper-large-v3")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "en")
+STT_TIMEOUT_SECONDS = float(os.getenv("STT_TIMEOUT_SECONDS", "30"))
+STT_MAX_CONNECTIONS = int(os.getenv("STT_MAX_CONNECTIONS", "10"))
+
+# /api/transcribe upload limits; uploads above the spool threshold are buffered on disk
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(25 * 1024 * 1024)))
+AUDIO_MAX_DURATION_SECONDS = float(os.getenv("AUDIO_MAX_DURATION_SECONDS", "120"))
+AUDIO_SPOOL_THRESHOLD_BYTES = int(os.getenv("AUDIO_SPOOL_THRESHOLD_BYTES", str(1024 * 1024)))
+
+# Preprocessing before STT: mono, 16 kHz, leading/trailing silence trimmed, re-encoded.
+# Opt-in: it reads the whole upload into memory, and needs ffmpeg for anything but WAV
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "false").lower() == "true"
+AUDIO_PREPROCESS_WORKERS = int(os.getenv("AUDIO_PREPROCESS_WORKERS", "2"))
+AUDIO_TARGET_RATE = int(os.getenv("AUDIO_TARGET_RATE", "16000"))
+AUDIO_VAD_THRESHOLD_DB = float(os.getenv("AUDIO_VAD_THRESHOLD_DB", "10"))
+AUDIO_VAD_PADDING_MS = int(os.getenv("AUDIO_VAD_PADDING_MS", "250"))
+AUDIO_ENCODE_BITRATE = os.getenv("AUDIO_ENCODE_BITRATE", "24k")
+
+# Long recordings are split at pauses into overlapping chunks transcribed in parallel;
+# failed chunks are retried on their own, up to STT_CHUNK_ATTEMPTS tries each.
+# Independent of AUDIO_PREPROCESS; needs a WAV upload or ffmpeg to decode
+STT_LONG_AUDIO = os.getenv("STT_LONG_AUDIO", "true").lower() == "true"
+STT_LONG_AUDIO_SECONDS = float(os.getenv("STT_LONG_AUDIO_SECONDS", "45"))
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "20"))
+STT_CHUNK_OVERLAP_MS = int(os.getenv("STT_CHUNK_OVERLAP_MS", "1000"))
+STT_CHUNK_CONCURRENCY = int(os.getenv("STT_CHUNK_CONCURRENCY", "4"))
+STT_CHUNK_ATTEMPTS = int(os.getenv("STT_CHUNK_ATTEMPTS", "3"))
+
+# Slack delivery queue: token bucket per webhook, per-channel coalescing window, retries
+SLACK_RATE_PER_SECOND = float(os.getenv("SLACK_RATE_PER_SECOND", "1"))
+SLACK_BURST = int(os.getenv("SLACK_BURST", "3"))
+SLACK_COALESCE_MS = int(os.getenv("SLACK_COALESCE_MS", "1000"))
+SLACK_COALESCE_MAX = int(os.getenv("SLACK_COALESCE_MAX", "10"))
+SLACK_MAX_ATTEMPTS = int(os.getenv("SLACK_MAX_ATTEMPTS", "5"))
+SLACK_TIMEOUT_SECONDS = float(os.getenv("SLACK_TIMEOUT_SECONDS", "5"))
+
+# Seconds shutdown waits for in-flight pipeline runs before closing clients
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+
+# Planning mode: "two_step" (intent call + planning call) or "one_shot" (single call)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_step")
+
+# Start transcript-keyed context retrieval while intent extraction is running
+SPECULATIVE_CONTEXT = os.getenv("SPECULATIVE_CONTEXT", "false").lower() == "true"
+
+# Approximate token budget for the retrieved context block in planning prompts
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800"))
+
+# Plans awaiting confirmation: "memory" (per worker) or "sqlite" (shared across workers)
+PENDING_STORE = os.getenv("PENDING_STORE", "memory")
+PENDING_STORE_PATH = os.getenv("PENDING_STORE_PATH", "pending_actions.db")
+PENDING_TTL_SECONDS = int(os.getenv("PENDING_TTL_SECONDS", "900"))
+PENDING_MAX_ENTRIES = int(os.getenv("PENDING_MAX_ENTRIES", "1000"))
+
+# Background execution: confirmed plans run as persisted jobs on a bounded
+# worker pool instead of inside the request (per request via "background")
+BACKGROUND_EXECUTION = os.getenv("BACKGROUND_EXECUTION", "false").lower() == "true"
+# Job store and workers; without them "background" requests run inline
+JOB_QUEUE_ENABLED = os.getenv("JOB_QUEUE_ENABLED", str(BACKGROUND_EXECUTION)).lower() == "true"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.db")
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+
+# Plan steps executed concurrently when they do not depend on each other
+PLAN_MAX_CONCURRENCY = int(os.getenv("PLAN_MAX_CONCURRENCY", "4"))
+
+# Write-behind buffer for audit documents (voiceops-actions / voiceops-commands)
+AUDIT_FLUSH_MAX_DOCS = int(os.getenv("AUDIT_FLUSH_MAX_DOCS", "100"))
+AUDIT_FLUSH_MAX_AGE_MS = int(os.getenv("AUDIT_FLUSH_MAX_AGE_MS", "1000"))
+AUDIT_BUFFER_MAX_DOCS = int(os.getenv("AUDIT_BUFFER_MAX_DOCS", "5000"))
+
+# Refresh policy per index: none | wait_for | immediate.
+# Override with ES_REFRESH_POLICY="voiceops-tickets=immediate,voiceops-actions=none"
+REFRESH_POLICY = {
+    "voiceops-tickets": "wait_for",
+    "voiceops-actions": "none",
+    "voiceops-commands": "none",
+    **dict(
+        entry.strip().split("=", 1)
+        for entry in os.getenv("ES_REFRESH_POLICY", "").split(",") if "=" in entry
+    ),
+}
+# Matches the index.refresh_interval setting; reads inside this window after a
+# write only see the document because of the refresh policy
+ES_REFRESH_INTERVAL_MS = int(os.getenv("ES_REFRESH_INTERVAL_MS", "1000"))
+
+# Safety-net TTL for cached ticket/action aggregations (writes invalidate them sooner)
+STATS_CACHE_TTL_SECONDS = int(os.getenv("STATS_CACHE_TTL_SECONDS", "60"))
+
+# Hourly/daily rollup of voiceops-actions read by the analytics endpoints.
+# Every run recomputes the hours within the lateness window; 0 disables the updater
+ROLLUP_INTERVAL_SECONDS = float(os.getenv("ROLLUP_INTERVAL_SECONDS", "60"))
+ROLLUP_LATENESS_SECONDS = int(os.getenv("ROLLUP_LATENESS_SECONDS", "300"))
+# Only the worker holding the updater lease runs updates; the lease is renewed
+# every run and taken over by another worker once it has lapsed
+ROLLUP_LEASE_SECONDS = float(os.getenv("ROLLUP_LEASE_SECONDS", str(max(3 * ROLLUP_INTERVAL_SECONDS, 60))))
+
+# Intent extraction cache (normalized transcript -> intent)
+INTENT_CACHE_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "512"))
+INTENT_CACHE_TTL_SECONDS = int(os.getenv("INTENT_CACHE_TTL_SECONDS", "3600"))
+INTENT_CACHE_NEAR_DUPLICATES = os.getenv("INTENT_CACHE_NEAR_DUPLICATES", "false").lower() == "true"
+INTENT_CACHE_SIMILARITY = float(os.getenv("INTENT_CACHE_SIMILARITY", "0.7"))
+
+# Local intent classifier (opt-in); the LLM is still called below this confidence
+# or when the command verb / ticket ID disagree with the predicted intent
+INTENT_LOCAL_CLASSIFIER = os.getenv("INTENT_LOCAL_CLASSIFIER", "false").lower() == "true"
+INTENT_LOCAL_THRESHOLD = float(os.getenv("INTENT_LOCAL_THRESHOLD", "0.85"))
+
 JIRA_DOMAIN = os.getenv("JIRA_DOMAIN", "")
 JIRA_EMAIL = os.getenv("JIRA_EMAIL", "")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN", "")
 JIRA_PROJECT_KEY = os.getenv("JIRA_PROJECT_KEY", "VO")
 
-es_client = Elasticsearch(ELASTICSEARCH_URL, api_key=ELASTICSEARCH_API_KEY)
-llm_client = OpenAI(api_key=LLM_API_KEY, base_url=LLM_BASE_URL)
\ No newline at end of file
+# Connection pool for the shared Jira HTTP client
+JIRA_MAX_CONNECTIONS = int(os.getenv("JIRA_MAX_CONNECTIONS", "20"))
+JIRA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("JIRA_MAX_KEEPALIVE_CONNECTIONS", "10"))
+JIRA_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("JIRA_KEEPALIVE_EXPIRY_SECONDS", "30"))
+JIRA_TIMEOUT_SECONDS = float(os.getenv("JIRA_TIMEOUT_SECONDS", "10"))
+JIRA_CONNECT_TIMEOUT_SECONDS = float(os.getenv("JIRA_CONNECT_TIMEOUT_SECONDS", "5"))
+
+# Jira metadata cache (issue type, priorities, transitions, user lookups).
+# Entries are reloaded in the background once past the refresh-ahead ratio of their TTL
+JIRA_METADATA_TTL_SECONDS = float(os.getenv("JIRA_METADATA_TTL_SECONDS", "900"))
+JIRA_USER_NEGATIVE_TTL_SECONDS = float(os.getenv("JIRA_USER_NEGATIVE_TTL_SECONDS", "300"))
+JIRA_REFRESH_AHEAD_RATIO = float(os.getenv("JIRA_REFRESH_AHEAD_RATIO", "0.8"))
+
+es_client = AsyncElasticsearch(ELASTICSEARCH_URL, api_key=ELASTICSEARCH_API_KEY)
+llm_client = AsyncOpenAI(api_key=LLM_API_KEY, base_url=LLM_BASE_URL)
@@ -1,11 +1,48 @@
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import es_client, llm_client, SHUTDOWN_DRAIN_SECONDS
+from app.pipeline import agent
 from app.routes import commands, tickets, analytics
+from app.services import audio_preprocess, audit_buffer, jira_service, job_queue, rollup_service, slack_service, speech_service
+
+
+logger = logging.getLogger("voiceops")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs inside each worker process: the ES, LLM and Jira clients open their
+    # connection pools lazily on this worker's event loop, never across processes
+    logger.info("VoiceOps worker %s starting", os.getpid())
+    audit_buffer.start()
+    slack_service.start()
+    job_queue.start()
+    rollup_service.start()
+    yield
+    # Stop claiming background jobs and let running ones finish (queued jobs
+    # stay persisted for the next start), then drain request-bound runs
+    await job_queue.stop(SHUTDOWN_DRAIN_SECONDS)
+    remaining = await agent.drain(SHUTDOWN_DRAIN_SECONDS)
+    if remaining:
+        logger.warning("Shutting down with %d pipeline run(s) still in flight", remaining)
+    await rollup_service.stop()
+    await audit_buffer.stop()
+    await slack_service.stop()
+    await es_client.close()
+    await llm_client.close()
+    await jira_service.close()
+    await speech_service.close()
+    audio_preprocess.close()
+
 
 app = FastAPI(
     title="VoiceOps Agent API",
     description="Context-driven voice agent powered by Elasticsearch Agent Builder",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -18,4 +55,4 @@ app.add_middleware(
 
 app.include_router(commands.router)
 app.include_router(tickets.router)
-app.include_router(analytics.router)
\ No newline at end of file
+app.include_router(analytics.router)
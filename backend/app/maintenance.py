@@ -0,0 +1,71 @@
+"""
+One-shot maintenance commands.
+
+    python -m app.maintenance migrate-ticket-ids
+    python -m app.maintenance backfill-action-rollups
+"""
+
+import argparse
+import asyncio
+from elasticsearch.helpers import async_bulk, async_scan
+from app.config import es_client
+from app.services import rollup_service
+
+
+async def migrate_ticket_ids(index: str = "voiceops-tickets") -> dict:
+    """Re-key ticket documents so that _id == ticket_id.
+
+    Documents indexed before deterministic IDs carry an auto-generated _id;
+    each one is copied to its ticket_id and the old copy deleted. When several
+    documents share a ticket_id, an already re-keyed document is kept, otherwise
+    the most recently created one wins.
+    """
+    keyed = set()
+    latest = {}
+    stale_ids = []
+    async for hit in async_scan(es_client, index=index, query={"query": {"match_all": {}}}):
+        ticket_id = hit["_source"].get("ticket_id")
+        if not ticket_id:
+            continue
+        if hit["_id"] == ticket_id:
+            keyed.add(ticket_id)
+            continue
+        stale_ids.append(hit["_id"])
+        kept = latest.get(ticket_id)
+        if kept is None or hit["_source"].get("created_at", "") >= kept.get("created_at", ""):
+            latest[ticket_id] = hit["_source"]
+
+    operations = [
+        {"_op_type": "index", "_index": index, "_id": ticket_id, "_source": source}
+        for ticket_id, source in latest.items() if ticket_id not in keyed
+    ]
+    operations += [{"_op_type": "delete", "_index": index, "_id": doc_id} for doc_id in stale_ids]
+
+    if operations:
+        await async_bulk(es_client, operations)
+        await es_client.indices.refresh(index=index)
+
+    return {
+        "index": index,
+        "rekeyed": sum(1 for op in operations if op["_op_type"] == "index"),
+        "removed": len(stale_ids),
+    }
+
+
+COMMANDS = {
+    "migrate-ticket-ids": migrate_ticket_ids,
+    "backfill-action-rollups": rollup_service.backfill,
+}
+
+
+async def _run(command: str):
+    try:
+        print(await COMMANDS[command]())
+    finally:
+        await es_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VoiceOps maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    asyncio.run(_run(parser.parse_args().command))
@@ -1,14 +1,19 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 
 
 class VoiceCommand(BaseModel):
     transcript: str
+    mode: Optional[Literal["two_step", "one_shot"]] = None
+    # Return a job ID at once and execute in the background (default: BACKGROUND_EXECUTION;
+    # runs inline when JOB_QUEUE_ENABLED is off)
+    background: Optional[bool] = None
 
 
 class ConfirmAction(BaseModel):
     command_id: str
     approved: bool
+    background: Optional[bool] = None
 
 
 class TicketUpdate(BaseModel):
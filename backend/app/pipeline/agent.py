@@ -3,29 +3,59 @@ Agent Pipeline: Orchestrates the full command processing flow.
 Voice → Intent → Context Search → Reasoning → Plan → Execute → Log
 """
 
+import asyncio
+import functools
+import time
 import uuid
 from datetime import datetime, timezone
-from app.services import elasticsearch_service as es_service
+from app.config import SPECULATIVE_CONTEXT, PIPELINE_MODE, BACKGROUND_EXECUTION, JOB_QUEUE_ENABLED
 from app.services import llm_service
-from app.services import slack_service
 from app.services import action_service
+from app.services import context_service
+from app.services import pending_store
+from app.services import job_queue
+from app.pipeline import executor
+
+# Accumulated latency and token usage per pipeline mode
+mode_stats: dict = {}
+
+# Pipeline runs currently executing, so shutdown can wait for them to finish
+_in_flight = 0
+_idle = asyncio.Event()
+_idle.set()
+
+
+def _tracked(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        global _in_flight
+        _in_flight += 1
+        _idle.clear()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _in_flight -= 1
+            if _in_flight == 0:
+                _idle.set()
+    return wrapper
+
 
-# Stores pending actions awaiting user confirmation
-pending_actions: dict = {}
+async def drain(timeout: float) -> int:
+    """Wait up to timeout seconds for in-flight runs; returns how many are still running."""
+    try:
+        await asyncio.wait_for(_idle.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    return _in_flight
 
 
-async def process_command(transcript: str) -> dict:
+@_tracked
+async def process_command(transcript: str, mode: str | None = None, emit=None) -> dict:
     command_id = f"cmd-{uuid.uuid4().hex[:8]}"
     start_time = datetime.now(timezone.utc)
 
-    # Step 1: Extract intent
-    intent_data = llm_service.extract_intent(transcript)
-
-    # Step 2: Search context
-    context = _gather_context(intent_data, transcript)
-
-    # Step 3: Create action plan
-    plan = llm_service.create_action_plan(transcript, intent_data, context)
+    # Steps 1-3: Extract intent, search context, create action plan
+    intent_data, context, plan, run = await _plan(transcript, mode, emit)
 
     duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
 
@@ -38,17 +68,16 @@ async def process_command(transcript: str) -> dict:
             "duration_ms": duration_ms,
             "status": "needs_clarification",
             "clarification": plan["clarification_needed"],
-            "pipeline": _build_pipeline_response(intent_data, context, plan)
+            "pipeline": _build_pipeline_response(intent_data, context, plan, run)
         }
 
     # Store for confirmation
-    pending_actions[command_id] = {
+    await pending_store.put(command_id, {
         "transcript": transcript,
         "intent_data": intent_data,
-        "context": context,
         "plan": plan,
         "start_time": start_time,
-    }
+    })
 
     return {
         "success": True,
@@ -56,33 +85,71 @@ async def process_command(transcript: str) -> dict:
         "transcript": transcript,
         "duration_ms": duration_ms,
         "status": "pending_confirmation",
-        "pipeline": _build_pipeline_response(intent_data, context, plan)
+        "pipeline": _build_pipeline_response(intent_data, context, plan, run)
     }
 
 
-async def confirm_action(command_id: str, approved: bool) -> dict:
-    pending = pending_actions.get(command_id)
+@_tracked
+async def confirm_action(command_id: str, approved: bool, background: bool | None = None) -> dict:
+    # Taken up front so a plan can only be confirmed or rejected once
+    pending = await pending_store.take(command_id)
     if not pending:
         return {"success": False, "error": "No pending action found"}
 
     if not approved:
-        action_service.log_action(
+        await action_service.log_action(
             command_id, "rejected", "user_review", True,
             "User rejected the proposed plan.", "No actions executed.", 0
         )
-        del pending_actions[command_id]
         return {"success": True, "command_id": command_id, "status": "rejected"}
 
-    # Execute the plan
+    if _in_background(background):
+        try:
+            job_id = await job_queue.submit("confirm", command_id, {
+                "command_id": command_id,
+                "transcript": pending["transcript"],
+                "intent_data": pending["intent_data"],
+                "plan": pending["plan"],
+            })
+        except Exception:
+            # Nothing was persisted, so keep the plan confirmable
+            await pending_store.restore(command_id, pending)
+            raise
+        return _queued(command_id, job_id)
+
+    return await _execute_confirmed(command_id, pending)
+
+
+def _in_background(background: bool | None) -> bool:
+    # Without a running job queue, background requests execute inline
+    return JOB_QUEUE_ENABLED and (BACKGROUND_EXECUTION if background is None else background)
+
+
+def _queued(command_id: str, job_id: str) -> dict:
+    return {
+        "success": True,
+        "command_id": command_id,
+        "status": "queued",
+        "job_id": job_id,
+        "job_url": f"/api/jobs/{job_id}",
+        "stream_url": f"/api/jobs/{job_id}/stream",
+    }
+
+
+@job_queue.handler("confirm")
+async def _confirm_job(payload: dict, on_step) -> dict:
+    return await _execute_confirmed(payload["command_id"], payload, on_step)
+
+
+@_tracked
+async def _execute_confirmed(command_id: str, pending: dict, on_step=None) -> dict:
     start_time = datetime.now(timezone.utc)
-    results = _execute_plan(command_id, pending["plan"], start_time)
+    results = await executor.execute_plan(command_id, pending["plan"], start_time, on_step)
 
-    action_service.log_command(
+    await action_service.log_command(
         command_id, pending["transcript"], pending["intent_data"], "executed"
     )
 
-    del pending_actions[command_id]
-
     return {
         "success": True,
         "command_id": command_id,
@@ -90,16 +157,32 @@ async def confirm_action(command_id: str, approved: bool) -> dict:
         "execution_results": results,
         "total_actions": len(results),
         "successful_actions": sum(1 for r in results if r["status"] == "success"),
+        "queued_actions": sum(1 for r in results if r["status"] == "queued"),
+        "critical_path": executor.critical_path(results),
     }
 
 
-async def quick_execute(transcript: str) -> dict:
+async def quick_execute(transcript: str, mode: str | None = None, background: bool | None = None) -> dict:
     command_id = f"cmd-{uuid.uuid4().hex[:8]}"
+    if _in_background(background):
+        # Planning runs in the job too, so the request only waits for the insert
+        job_id = await job_queue.submit("quick_execute", command_id, {
+            "command_id": command_id, "transcript": transcript, "mode": mode,
+        })
+        return {**_queued(command_id, job_id), "transcript": transcript}
+    return await _quick_execute(command_id, transcript, mode)
+
+
+@job_queue.handler("quick_execute")
+async def _quick_execute_job(payload: dict, on_step) -> dict:
+    return await _quick_execute(payload["command_id"], payload["transcript"], payload["mode"], on_step)
+
+
+@_tracked
+async def _quick_execute(command_id: str, transcript: str, mode: str | None, on_step=None) -> dict:
     start_time = datetime.now(timezone.utc)
 
-    intent_data = llm_service.extract_intent(transcript)
-    context = _gather_context(intent_data, transcript)
-    plan = llm_service.create_action_plan(transcript, intent_data, context)
+    intent_data, context, plan, run = await _plan(transcript, mode)
 
     if plan.get("clarification_needed"):
         return {
@@ -107,11 +190,11 @@ async def quick_execute(transcript: str) -> dict:
             "command_id": command_id,
             "status": "needs_clarification",
             "clarification": plan["clarification_needed"],
-            "pipeline": _build_pipeline_response(intent_data, context, plan)
+            "pipeline": _build_pipeline_response(intent_data, context, plan, run)
         }
 
-    results = _execute_plan(command_id, plan, start_time)
-    action_service.log_command(command_id, transcript, intent_data, "executed")
+    results = await executor.execute_plan(command_id, plan, start_time, on_step)
+    await action_service.log_command(command_id, transcript, intent_data, "executed")
 
     duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
 
@@ -121,27 +204,125 @@ async def quick_execute(transcript: str) -> dict:
         "transcript": transcript,
         "duration_ms": duration_ms,
         "status": "executed",
-        "pipeline": _build_pipeline_response(intent_data, context, plan),
+        "pipeline": _build_pipeline_response(intent_data, context, plan, run),
         "execution_results": results,
+        "critical_path": executor.critical_path(results),
     }
 
 
-def _gather_context(intent_data: dict, transcript: str) -> dict:
-    entities = intent_data.get("entities", {})
-    description = entities.get("description", "")
-    ticket_id = entities.get("ticket_id")
+async def process_command_stream(transcript: str, mode: str | None = None):
+    """Run process_command, yielding (event, data) pairs as each stage completes.
 
-    context = {
-        "similar_tickets": es_service.search_similar_tickets(description),
-        "target_ticket": es_service.find_ticket_by_id(ticket_id) if ticket_id else None,
-        "past_commands": es_service.search_past_commands(transcript),
-        "past_actions": es_service.search_past_actions(intent_data.get("intent", "")),
-        "stats": es_service.get_ticket_stats(),
+    Events: step1_intent, context (one per sub-query), explanation_delta,
+    step3_plan, then result with the full process_command response, or
+    error if the pipeline failed.
+    """
+    events = asyncio.Queue()
+    task = asyncio.create_task(
+        process_command(transcript, mode, lambda event, data: events.put_nowait((event, data)))
+    )
+    task.add_done_callback(lambda _: events.put_nowait(None))
+
+    try:
+        while (item := await events.get()) is not None:
+            yield item
+        # Cancelled from elsewhere (e.g. shutdown): exception() would raise
+        if task.cancelled():
+            yield "error", {"detail": "Pipeline run was cancelled"}
+        elif task.exception() is not None:
+            yield "error", {"detail": str(task.exception())}
+        else:
+            yield "result", task.result()
+    finally:
+        # Client went away mid-stream: stop the pipeline
+        task.cancel()
+
+
+async def _plan(transcript: str, mode: str | None, emit=None) -> tuple[dict, dict, dict, dict]:
+    """Run the planning stages in the requested mode.
+
+    two_step: intent LLM call, context search, planning LLM call.
+    one_shot: transcript-keyed context search, then one LLM call returning
+    both intent and plan.
+    emit, if given, is called as emit(event, data) as each stage completes.
+    """
+    mode = mode or PIPELINE_MODE
+    usage = {}
+    start = time.perf_counter()
+
+    def emit_result(name, result, timing):
+        emit("context", {"name": name, "result": result, "timing": timing})
+
+    def emit_explanation(text):
+        emit("explanation_delta", {"text": text})
+
+    on_result = emit_result if emit is not None else None
+    on_explanation = emit_explanation if emit is not None else None
+
+    if mode == "one_shot":
+        context = await context_service.gather_transcript_context(transcript, on_result)
+        intent_data, plan = await llm_service.plan_command(transcript, context, usage, on_explanation)
+        if emit is not None:
+            emit("step1_intent", intent_data)
+    else:
+        intent_data, context = await _intent_and_context(transcript, usage, emit, on_result)
+        plan = await llm_service.create_action_plan(
+            transcript, intent_data, context, usage, on_explanation
+        )
+
+    if emit is not None:
+        emit("step3_plan", plan)
+
+    run = {"mode": mode, "duration_ms": int((time.perf_counter() - start) * 1000), **usage}
+    _record_run(run)
+    return intent_data, context, plan, run
+
+
+async def _intent_and_context(transcript: str, usage: dict, emit=None,
+                              on_result=None) -> tuple[dict, dict]:
+    async def intent_call():
+        intent_data = await llm_service.extract_intent(transcript, usage)
+        if emit is not None:
+            emit("step1_intent", intent_data)
+        return intent_data
+
+    if SPECULATIVE_CONTEXT:
+        return await context_service.gather_context_speculative(
+            transcript, intent_call(), on_result
+        )
+
+    intent_data = await intent_call()
+    context = await context_service.gather_context(intent_data, transcript, on_result)
+    return intent_data, context
+
+
+def _record_run(run: dict):
+    stats = mode_stats.setdefault(run["mode"], {
+        "runs": 0, "duration_ms": 0, "llm_calls": 0, "llm_ms": 0,
+        "prompt_tokens": 0, "completion_tokens": 0,
+    })
+    stats["runs"] += 1
+    for key in ("duration_ms", "llm_calls", "llm_ms", "prompt_tokens", "completion_tokens"):
+        stats[key] += run.get(key, 0)
+
+
+def get_mode_stats() -> dict:
+    """Per-mode averages so two_step and one_shot can be compared side by side."""
+    return {
+        "default_mode": PIPELINE_MODE,
+        "in_flight": _in_flight,
+        "modes": {
+            mode: {
+                "runs": stats["runs"],
+                **{f"avg_{key}": round(value / stats["runs"], 1)
+                   for key, value in stats.items() if key != "runs"},
+            }
+            for mode, stats in mode_stats.items()
+        },
     }
-    return context
 
 
-def _build_pipeline_response(intent_data: dict, context: dict, plan: dict) -> dict:
+def _build_pipeline_response(intent_data: dict, context: dict, plan: dict, run: dict) -> dict:
     return {
         "step1_intent": intent_data,
         "step2_context": {
@@ -150,54 +331,10 @@ def _build_pipeline_response(intent_data: dict, context: dict, plan: dict) -> di
             "past_commands_found": len(context["past_commands"]),
             "past_actions_found": len(context["past_actions"]),
             "stats": context.get("stats", {}),
+            "retrieval": context.get("retrieval", {}),
+            "speculation": context.get("speculation"),
+            "compaction": context.get("compaction"),
         },
         "step3_plan": plan,
+        "run": run,
     }
-
-
-def _execute_plan(command_id: str, plan: dict, start_time: datetime) -> list:
-    results = []
-
-    for action in plan.get("actions", []):
-        action_type = action.get("type")
-        params = action.get("params", {})
-
-        try:
-            if action_type == "create_ticket":
-                result = action_service.create_ticket(params)
-            elif action_type in ("update_ticket", "close_ticket"):
-                if action_type == "close_ticket":
-                    params.setdefault("updates", {})["status"] = "resolved"
-                result = action_service.update_ticket(params)
-            elif action_type == "notify_slack":
-                result = slack_service.send_notification(
-                    params.get("channel", "general"),
-                    params.get("message", "")
-                )
-            else:
-                result = {"error": f"Unknown action: {action_type}"}
-
-            duration = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
-            action_service.log_action(
-                command_id, action_type, f"voiceops_{action_type}",
-                "error" not in result, plan.get("reasoning", ""),
-                action.get("description", ""), duration, result
-            )
-
-            results.append({
-                "step": action.get("step"),
-                "type": action_type,
-                "description": action.get("description"),
-                "status": "success" if "error" not in result else "failed",
-                "result": result,
-            })
-
-        except Exception as e:
-            results.append({
-                "step": action.get("step"),
-                "type": action_type,
-                "status": "error",
-                "error": str(e),
-            })
-
-    return results
\ No newline at end of file
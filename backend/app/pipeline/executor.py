@@ -0,0 +1,245 @@
+"""
+Plan executor: runs the steps of an action plan concurrently wherever they
+do not depend on each other.
+Dependencies come from explicit "depends_on" step lists, {{stepN.field}}
+placeholders in params, steps that touch the same ticket, and Slack messages
+that mention a ticket an earlier step changes.
+"""
+
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from app.config import PLAN_MAX_CONCURRENCY
+from app.services import action_service
+from app.services import slack_service
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*step(\d+)\.([\w.]+)\s*\}\}")
+
+TICKET_ACTIONS = ("update_ticket", "close_ticket")
+
+
+def _step_number(action: dict, position: int) -> int:
+    # Planners sometimes emit "step": "2"; keys must be ints to match depends_on and placeholders
+    try:
+        return int(action.get("step") or position + 1)
+    except (TypeError, ValueError):
+        return position + 1
+
+
+def _step_numbers(actions: list) -> list:
+    numbers = [_step_number(action, position) for position, action in enumerate(actions)]
+    if len(set(numbers)) != len(numbers):
+        # Duplicate step numbers from the planner: fall back to plan positions
+        return list(range(1, len(actions) + 1))
+    return numbers
+
+
+def _placeholder_steps(value) -> set:
+    if isinstance(value, str):
+        return {int(step) for step, _ in PLACEHOLDER_RE.findall(value)}
+    if isinstance(value, dict):
+        return set().union(*(_placeholder_steps(v) for v in value.values()))
+    if isinstance(value, list):
+        return set().union(*(_placeholder_steps(v) for v in value))
+    return set()
+
+
+def infer_dependencies(actions: list) -> dict:
+    """Map each step number to the earlier steps it must wait for.
+
+    Only earlier steps count, so the graph is always acyclic.
+    """
+    steps = _step_numbers(actions)
+    dependencies = {}
+    # ticket_id -> last earlier step that updated or closed it
+    last_touched = {}
+
+    for step, action in zip(steps, actions):
+        params = action.get("params", {})
+        wanted = {int(dep) for dep in action.get("depends_on") or [] if str(dep).strip().isdigit()}
+        wanted |= _placeholder_steps(params)
+
+        ticket_id = params.get("ticket_id")
+        if action.get("type") in TICKET_ACTIONS and ticket_id:
+            if ticket_id in last_touched:
+                wanted.add(last_touched[ticket_id])
+        if action.get("type") == "notify_slack":
+            message = params.get("message", "")
+            wanted |= {touched for tid, touched in last_touched.items() if tid in message}
+
+        earlier = set(steps[:steps.index(step)])
+        dependencies[step] = sorted(wanted & earlier)
+        if action.get("type") in TICKET_ACTIONS and ticket_id:
+            last_touched[ticket_id] = step
+    return dependencies
+
+
+def _lookup(result: dict, path: str):
+    value = result
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _resolve(value, outputs: dict):
+    """Substitute {{stepN.field}} placeholders with earlier step results."""
+    if isinstance(value, dict):
+        return {k: _resolve(v, outputs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve(v, outputs) for v in value]
+    if not isinstance(value, str):
+        return value
+
+    whole = PLACEHOLDER_RE.fullmatch(value.strip())
+    if whole and int(whole.group(1)) in outputs:
+        # A lone placeholder keeps the referenced value's type
+        return _lookup(outputs[int(whole.group(1))], whole.group(2))
+
+    def substitute(match):
+        step = int(match.group(1))
+        if step not in outputs:
+            return match.group(0)
+        found = _lookup(outputs[step], match.group(2))
+        return match.group(0) if found is None else str(found)
+
+    return PLACEHOLDER_RE.sub(substitute, value)
+
+
+async def _run_action(action_type: str, params: dict) -> dict:
+    if action_type == "create_ticket":
+        return await action_service.create_ticket(params)
+    if action_type in TICKET_ACTIONS:
+        if action_type == "close_ticket":
+            params.setdefault("updates", {})["status"] = "resolved"
+        return await action_service.update_ticket(params)
+    if action_type == "notify_slack":
+        return await slack_service.send_notification(
+            params.get("channel", "general"),
+            params.get("message", "")
+        )
+    return {"error": f"Unknown action: {action_type}"}
+
+
+async def execute_plan(command_id: str, plan: dict, start_time: datetime, on_step=None) -> list:
+    """Execute a plan's actions, returning one result per step in plan order.
+
+    Independent steps run concurrently, at most PLAN_MAX_CONCURRENCY at a
+    time; independent create_ticket steps share one bulk creation. Each
+    result records depends_on and its start/end times. on_step, if given,
+    is called with each result as its step finishes.
+    """
+    actions = plan.get("actions", [])
+    steps = _step_numbers(actions)
+    dependencies = infer_dependencies(actions)
+    semaphore = asyncio.Semaphore(PLAN_MAX_CONCURRENCY)
+    clock = time.perf_counter()
+    outputs = {}
+
+    def offset_ms() -> int:
+        return int((time.perf_counter() - clock) * 1000)
+
+    # Creates with no dependencies are batched into one Jira bulk call and one _bulk index
+    independent_creates = [
+        step for step, action in zip(steps, actions)
+        if action.get("type") == "create_ticket" and not dependencies[step]
+    ]
+    batch = None
+    if len(independent_creates) > 1:
+        async def create_batch():
+            async with semaphore:
+                started = (datetime.now(timezone.utc), offset_ms())
+                params = [actions[steps.index(step)].get("params", {}) for step in independent_creates]
+                created = await action_service.create_tickets(params)
+                return started, dict(zip(independent_creates, created))
+        batch = asyncio.create_task(create_batch())
+
+    async def run_step(step: int, action: dict) -> dict:
+        action_type = action.get("type")
+        entry = {
+            "step": step,
+            "type": action_type,
+            "description": action.get("description"),
+            "depends_on": dependencies[step],
+        }
+
+        await asyncio.gather(*(tasks[dep] for dep in dependencies[step]), return_exceptions=True)
+        blocked = [dep for dep in dependencies[step] if dep not in outputs]
+        if blocked:
+            now = datetime.now(timezone.utc).isoformat()
+            return {**entry, "status": "skipped", "error": f"Depends on step(s) {blocked} which did not succeed",
+                    "started_at": now, "finished_at": now, "start_offset_ms": offset_ms(),
+                    "end_offset_ms": offset_ms(), "duration_ms": 0}
+
+        try:
+            if batch is not None and step in independent_creates:
+                (started_at, start_offset), created = await batch
+                result = created[step]
+            else:
+                async with semaphore:
+                    started_at, start_offset = datetime.now(timezone.utc), offset_ms()
+                    params = _resolve(action.get("params", {}), outputs)
+                    result = await _run_action(action_type, params)
+        except Exception as e:
+            return {**entry, "status": "error", "error": str(e)}
+
+        finished_at, end_offset = datetime.now(timezone.utc), offset_ms()
+        if "error" not in result:
+            outputs[step] = result
+
+        if "error" in result:
+            status = "failed"
+        elif result.get("status") == "queued":
+            # Handed to a delivery queue (Slack): not known to have succeeded yet
+            status = "queued"
+        else:
+            status = "success"
+
+        duration = int((finished_at - start_time).total_seconds() * 1000)
+        await action_service.log_action(
+            command_id, action_type, f"voiceops_{action_type}",
+            None if status == "queued" else status == "success", plan.get("reasoning", ""),
+            action.get("description", ""), duration, result
+        )
+
+        return {
+            **entry,
+            "status": status,
+            "result": result,
+            "started_at": started_at.isoformat(),
+            "finished_at": finished_at.isoformat(),
+            "start_offset_ms": start_offset,
+            "end_offset_ms": end_offset,
+            "duration_ms": end_offset - start_offset,
+        }
+
+    async def report(step: int, action: dict) -> dict:
+        entry = await run_step(step, action)
+        if on_step is not None:
+            on_step(entry)
+        return entry
+
+    tasks = {}
+    for step, action in zip(steps, actions):
+        tasks[step] = asyncio.create_task(report(step, action))
+    return list(await asyncio.gather(*tasks.values()))
+
+
+def critical_path(results: list) -> dict:
+    """The dependency chain that ended last, i.e. what bounded total execution time."""
+    timed = {r["step"]: r for r in results if "end_offset_ms" in r}
+    if not timed:
+        return {"steps": [], "duration_ms": 0}
+
+    current = max(timed.values(), key=lambda r: r["end_offset_ms"])
+    path = [current["step"]]
+    while True:
+        upstream = [timed[dep] for dep in current.get("depends_on", []) if dep in timed]
+        if not upstream:
+            break
+        current = max(upstream, key=lambda r: r["end_offset_ms"])
+        path.append(current["step"])
+
+    return {"steps": path[::-1], "duration_ms": timed[path[0]]["end_offset_ms"]}
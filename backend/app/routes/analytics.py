@@ -1,45 +1,150 @@
-from fastapi import APIRouter, Query
+import asyncio
+import logging
+from typing import Optional
+from elasticsearch import BadRequestError
+from fastapi import APIRouter, HTTPException, Query
 from app.config import es_client
 from app.services import elasticsearch_service as es_service
 from app.services import metrics_service
 from app.services import jira_service
+from app.services import audit_buffer
+from app.services import intent_cache
+from app.services import intent_classifier
+from app.services import slack_service
+from app.services import rollup_service
 from app.config import SLACK_WEBHOOK_URL
 
 router = APIRouter(prefix="/api", tags=["analytics"])
+logger = logging.getLogger("voiceops")
+
+# Reported when action analytics fall back to scanning voiceops-actions
+RAW_FRESHNESS = {"source": "voiceops-actions", "lag_seconds": 0}
+
+
+async def _action_stats() -> tuple[dict, dict]:
+    """Action stats and their freshness: from the rollup once it has been
+    built, otherwise (or if the rollup cannot be read) from voiceops-actions."""
+    freshness = await rollup_service.get_freshness()
+    if freshness:
+        try:
+            return await rollup_service.get_action_stats(), freshness
+        except Exception as e:
+            logger.warning("Rollup action stats failed, using raw stats: %s", e)
+    return await es_service.get_action_stats(), RAW_FRESHNESS
 
 
 @router.get("/analytics")
 async def get_analytics():
+    counts, ticket_stats, (action_stats, freshness) = await asyncio.gather(
+        es_service.get_index_counts(),
+        es_service.get_ticket_stats(),
+        _action_stats(),
+    )
     return {
         "tickets": {
-            "total": es_service.get_index_counts()["voiceops-tickets"],
-            **es_service.get_ticket_stats(),
+            "total": counts["voiceops-tickets"],
+            **ticket_stats,
         },
-        "actions": es_service.get_action_stats(),
+        "actions": action_stats,
+        "freshness": freshness,
     }
 
 
 @router.get("/health")
 async def health_check():
     try:
-        info = es_service.get_cluster_info()
+        info = await es_service.get_cluster_info()
         return {
             "status": "healthy",
             "elasticsearch": "connected",
             "cluster_name": info.get("cluster_name", "unknown"),
             "slack_configured": bool(SLACK_WEBHOOK_URL),
             "jira_configured": jira_service.is_configured(),
-            "indices": es_service.get_index_counts(),
+            "indices": await es_service.get_index_counts(),
         }
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
+@router.get("/audit-buffer")
+async def get_audit_buffer_stats():
+    """
+    Write-behind audit buffer depth, backpressure and flush lag
+    """
+    return audit_buffer.get_stats()
+
+
+@router.get("/slack/queue")
+async def get_slack_queue_stats():
+    """
+    Slack delivery queue depth, rate limiting and coalescing stats
+    """
+    return slack_service.get_stats()
+
+
+@router.get("/rollup")
+async def get_rollup_stats():
+    """
+    Action rollup checkpoint, update runs and freshness
+    """
+    return {**rollup_service.get_stats(), "freshness": await rollup_service.get_freshness()}
+
+
+@router.get("/slack/deliveries/{delivery_id}")
+async def get_slack_delivery(delivery_id: str):
+    """
+    Delivery status of one queued Slack message (kept per worker process,
+    so with several workers only the one that queued it knows the status)
+    """
+    delivery = slack_service.get_delivery(delivery_id)
+    if delivery is None:
+        raise HTTPException(status_code=404, detail="Unknown delivery_id")
+    return delivery
+
+
+@router.get("/consistency")
+async def get_consistency_stats():
+    """
+    Refresh policy per index and how often reads depended on it
+    """
+    return es_service.get_consistency_stats()
+
+
+@router.get("/stats-cache")
+async def get_stats_cache():
+    """
+    Aggregation cache hit rate and freshness
+    """
+    return es_service.get_stats_cache_info()
+
+
+@router.get("/intent-cache")
+async def get_intent_cache_stats():
+    """
+    Intent extraction cache hit/miss/eviction stats
+    """
+    return intent_cache.get_stats()
+
+
+@router.get("/intent-classifier")
+async def get_intent_classifier_stats():
+    """
+    How many commands the local classifier handled without the LLM
+    """
+    return intent_classifier.get_stats()
+
+
 @router.get("/impact")
-async def get_impact_metrics():
+async def get_impact_metrics(
+    start: Optional[str] = Query(default=None, description="Inclusive lower bound on timestamp (ISO date or date math, e.g. now-7d/d)"),
+    end: Optional[str] = Query(default=None, description="Exclusive upper bound on timestamp"),
+):
     """
     Get impact metrics showing time saved and efficiency gains
     """
-    return metrics_service.get_impact_summary()
+    try:
+        return await metrics_service.get_impact_summary(start, end)
+    except BadRequestError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {e.message}")
 
 @router.get("/agent-info")
 async def get_agent_info():
@@ -96,7 +201,7 @@ async def esql_recent_actions(limit: int = Query(default=10, le=100)):
     """
     
     try:
-        result = es_client.esql.query(query=query)
+        result = await es_client.esql.query(query=query)
         return {
             "query": query,
             "columns": result.get("columns", []),
@@ -112,7 +217,22 @@ async def esql_action_stats():
     """
     ES|QL Query: Aggregate action statistics
     """
-    query = """
+    freshness = await rollup_service.get_freshness()
+    if freshness:
+        query = """
+        FROM voiceops-actions-rollup
+        | WHERE kind == "bucket" AND granularity == "day"
+        | STATS 
+            total_actions = SUM(count),
+            duration_sum = SUM(duration_sum),
+            max_duration = MAX(duration_max),
+            success_count = SUM(CASE(success == true, count, 0))
+        | EVAL avg_duration = duration_sum / total_actions
+        | EVAL success_rate = ROUND(success_count * 100.0 / total_actions, 2)
+        | KEEP total_actions, avg_duration, max_duration, success_count, success_rate
+    """
+    else:
+        query = """
         FROM voiceops-actions
         | STATS 
             total_actions = COUNT(*),
@@ -123,11 +243,12 @@ async def esql_action_stats():
     """
     
     try:
-        result = es_client.esql.query(query=query)
+        result = await es_client.esql.query(query=query)
         return {
             "query": query,
             "columns": result.get("columns", []),
             "values": result.get("values", []),
+            "freshness": freshness or RAW_FRESHNESS,
         }
     except Exception as e:
         return {"error": str(e), "query": query}
@@ -145,7 +266,7 @@ async def esql_tickets_by_priority():
     """
     
     try:
-        result = es_client.esql.query(query=query)
+        result = await es_client.esql.query(query=query)
         return {
             "query": query,
             "columns": result.get("columns", []),
@@ -169,7 +290,7 @@ async def esql_slow_actions(threshold_ms: int = Query(default=2000)):
     """
     
     try:
-        result = es_client.esql.query(query=query)
+        result = await es_client.esql.query(query=query)
         return {
             "query": query,
             "threshold_ms": threshold_ms,
@@ -185,7 +306,22 @@ async def esql_daily_summary():
     """
     ES|QL Query: Daily action summary (time-series analysis)
     """
-    query = """
+    freshness = await rollup_service.get_freshness()
+    if freshness:
+        query = """
+        FROM voiceops-actions-rollup
+        | WHERE kind == "bucket" AND granularity == "day"
+        | STATS 
+            actions = SUM(count),
+            duration_sum = SUM(duration_sum)
+          BY day = bucket
+        | EVAL avg_duration = duration_sum / actions
+        | KEEP actions, avg_duration, day
+        | SORT day DESC
+        | LIMIT 14
+    """
+    else:
+        query = """
         FROM voiceops-actions
         | STATS 
             actions = COUNT(*),
@@ -196,11 +332,12 @@ async def esql_daily_summary():
     """
     
     try:
-        result = es_client.esql.query(query=query)
+        result = await es_client.esql.query(query=query)
         return {
             "query": query,
             "columns": result.get("columns", []),
             "values": result.get("values", []),
+            "freshness": freshness or RAW_FRESHNESS,
         }
     except Exception as e:
         return {"error": str(e), "query": query}
@@ -211,7 +348,7 @@ async def esql_custom_query(query: str):
     Execute a custom ES|QL query (for demo purposes)
     """
     try:
-        result = es_client.esql.query(query=query)
+        result = await es_client.esql.query(query=query)
         return {
             "query": query,
             "columns": result.get("columns", []),
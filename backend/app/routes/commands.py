@@ -1,6 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import json
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from app.models import VoiceCommand, ConfirmAction
 from app.pipeline import agent
+from app.services import job_queue
+from app.services import pending_store
 from app.services import speech_service
 
 router = APIRouter(prefix="/api", tags=["commands"])
@@ -9,15 +13,30 @@ router = APIRouter(prefix="/api", tags=["commands"])
 @router.post("/process-command")
 async def process_command(command: VoiceCommand):
     try:
-        return await agent.process_command(command.transcript)
+        return await agent.process_command(command.transcript, command.mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/process-command/stream")
+async def process_command_stream(command: VoiceCommand):
+    """Server-sent events for each pipeline stage; the final "result" event
+    carries the same payload as /api/process-command."""
+    async def frames():
+        async for event, data in agent.process_command_stream(command.transcript, command.mode):
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/confirm-action")
 async def confirm_action(confirm: ConfirmAction):
     try:
-        result = await agent.confirm_action(confirm.command_id, confirm.approved)
+        result = await agent.confirm_action(confirm.command_id, confirm.approved, confirm.background)
         if not result.get("success") and result.get("error"):
             raise HTTPException(status_code=404, detail=result["error"])
         return result
@@ -30,16 +49,73 @@ async def confirm_action(confirm: ConfirmAction):
 @router.post("/quick-execute")
 async def quick_execute(command: VoiceCommand):
     try:
-        return await agent.quick_execute(command.transcript)
+        return await agent.quick_execute(command.transcript, command.mode, command.background)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/transcribe")
-async def transcribe_audio(audio: UploadFile = File(...)):
+@router.get("/jobs")
+async def jobs():
+    return await job_queue.get_stats()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str):
+    """Server-sent status and step events for a job, ending with "done"
+    (the same payload as /api/jobs/{job_id})."""
+    if await job_queue.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def frames():
+        async for event, data in job_queue.watch(job_id):
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/pending-actions")
+async def pending_actions():
+    return await pending_store.get_stats()
+
+
+@router.get("/pipeline-modes")
+async def pipeline_modes():
+    return agent.get_mode_stats()
+
+
+@router.post("/transcribe", openapi_extra={"requestBody": {"content": {
+    "multipart/form-data": {"schema": {"type": "object", "required": ["audio"],
+                                       "properties": {"audio": {"type": "string", "format": "binary"}}}},
+    "audio/*": {"schema": {"type": "string", "format": "binary"}},
+}}})
+async def transcribe_audio(request: Request):
+    # The body is read here rather than through File(...) so size limits
+    # apply while it streams in, not after it has been buffered
     try:
-        audio_bytes = await audio.read()
-        transcript = await speech_service.transcribe_audio(audio_bytes, audio.filename or "audio.webm")
-        return {"transcript": transcript}
+        audio = await speech_service.receive_upload(request)
+    except speech_service.AudioRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    try:
+        return await speech_service.transcribe_upload(audio)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    finally:
+        await audio.close()
+
+
+@router.get("/transcribe/stats")
+async def transcribe_stats():
+    return speech_service.get_stats()
\ No newline at end of file
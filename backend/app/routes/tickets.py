@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, HTTPException
 from app.models import TicketUpdate
 from app.services import elasticsearch_service as es_service
 from app.services import jira_service
@@ -8,7 +9,7 @@ router = APIRouter(prefix="/api", tags=["tickets"])
 
 @router.get("/tickets")
 async def get_tickets():
-    tickets = es_service.get_all_tickets()
+    tickets = await es_service.get_all_tickets()
     return {"tickets": tickets, "total": len(tickets)}
 
 
@@ -16,28 +17,40 @@ async def get_tickets():
 async def update_ticket(update: TicketUpdate):
     jira_result = None
     if jira_service.is_configured():
-        jira_result = jira_service.update_issue(update.ticket_id, update.updates)
+        jira_result = await jira_service.update_issue(update.ticket_id, update.updates)
 
-    es_result = es_service.update_document("voiceops-tickets", update.ticket_id, update.updates)
+    es_result = await es_service.update_document("voiceops-tickets", update.ticket_id, update.updates)
 
     return {"elasticsearch": es_result, "jira": jira_result}
 
 
 @router.get("/tickets/jira/{issue_key}")
 async def get_jira_issue(issue_key: str):
-    return jira_service.get_issue(issue_key)
+    return await jira_service.get_issue(issue_key)
 
 
 @router.get("/tickets/jira-search")
 async def search_jira(query: str):
-    return jira_service.search_issues(query)
+    return await jira_service.search_issues(query)
 
 
 @router.get("/audit-log")
 async def get_audit_log():
-    actions = es_service.get_all_actions()
+    actions = await es_service.get_all_actions()
     return {"actions": actions, "total": len(actions)}
 
+@router.get("/tickets/jira-cache")
+async def jira_cache():
+    return jira_service.get_metadata_stats()
+
+
+@router.post("/tickets/jira-cache/invalidate")
+async def invalidate_jira_cache(kind: Optional[str] = None):
+    if kind is not None and kind not in jira_service.METADATA_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown kind '{kind}'. Use one of {list(jira_service.METADATA_KINDS)}")
+    return jira_service.invalidate_metadata(kind)
+
+
 @router.get("/tickets/jira-test")
 async def test_jira():
     from app.config import JIRA_DOMAIN, JIRA_EMAIL, JIRA_API_TOKEN, JIRA_PROJECT_KEY
@@ -52,7 +65,7 @@ async def test_jira():
 
     # Try creating a test ticket
     if jira_service.is_configured():
-        test_result = jira_service.create_issue(
+        test_result = await jira_service.create_issue(
             summary="[TEST] VoiceOps Agent Connection Test",
             description="This is a test ticket from VoiceOps Agent. Safe to delete.",
             priority="low",
@@ -66,27 +79,7 @@ async def test_jira():
 
 @router.get("/tickets/jira-projects")
 async def list_jira_projects():
-    import requests
-    from requests.auth import HTTPBasicAuth
-    from app.config import JIRA_DOMAIN, JIRA_EMAIL, JIRA_API_TOKEN
-
     try:
-        response = requests.get(
-            f"https://{JIRA_DOMAIN}/rest/api/3/project",
-            auth=HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN),
-            headers={"Accept": "application/json"},
-            timeout=10,
-        )
-        response.raise_for_status()
-        projects = response.json()
-
-        return [
-            {
-                "key": p["key"],
-                "name": p["name"],
-                "id": p["id"],
-            }
-            for p in projects
-        ]
+        return await jira_service.list_projects()
     except Exception as e:
         return {"error": str(e)}
\ No newline at end of file
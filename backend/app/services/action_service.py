@@ -1,28 +1,54 @@
 import uuid
 from datetime import datetime, timezone
+from elasticsearch import ConflictError
 from app.services import elasticsearch_service as es_service
 from app.services import jira_service
+from app.services import audit_buffer
 
 
+# Generated (non-Jira) ticket IDs: PREFIX-<hex>; a taken ID is re-rolled on create
+TICKET_ID_HEX_CHARS = 6
+TICKET_ID_ATTEMPTS = 3
+
 PROJECT_PREFIXES = {
     "AUTH-BACKEND": "AUTH",
     "CORE-PLATFORM": "CORE",
     "FRONTEND": "FE",
 }
 
+KNOWN_TEAMS = {
+    "AUTH-BACKEND": {
+        "keywords": ["login", "auth", "OAuth", "password"],
+        "people": ["sarah.chen", "james.wu"],
+    },
+    "CORE-PLATFORM": {
+        "keywords": ["infrastructure", "database", "platform"],
+        "people": ["maria.garcia"],
+    },
+    "FRONTEND": {
+        "keywords": ["UI", "browser", "dashboard"],
+        "people": ["alex.kim"],
+    },
+}
 
-def create_ticket(params: dict) -> dict:
-    project = params.get("project", "UNKNOWN")
+
+def _jira_fields(params: dict) -> dict:
+    return {
+        "summary": params.get("summary", ""),
+        "description": params.get("description", ""),
+        "priority": params.get("priority", "medium"),
+        "labels": params.get("labels", []),
+    }
+
+
+def _generated_id(project: str) -> str:
     prefix = PROJECT_PREFIXES.get(project, project[:4])
-    es_ticket_id = f"{prefix}-{uuid.uuid4().hex[:3].upper()}"
+    return f"{prefix}-{uuid.uuid4().hex[:TICKET_ID_HEX_CHARS].upper()}"
 
-    # Create in Jira
-    jira_result = jira_service.create_issue(
-        summary=params.get("summary", ""),
-        description=params.get("description", ""),
-        priority=params.get("priority", "medium"),
-        labels=params.get("labels", []),
-    )
+
+def _ticket_document(params: dict, jira_result: dict) -> dict:
+    project = params.get("project", "UNKNOWN")
+    es_ticket_id = _generated_id(project)
 
     jira_key = jira_result.get("jira_key")
     jira_url = jira_result.get("jira_url")
@@ -30,7 +56,7 @@ def create_ticket(params: dict) -> dict:
     # Use Jira key as ticket_id if available, otherwise use generated ID
     ticket_id = jira_key or es_ticket_id
 
-    doc = {
+    return {
         "ticket_id": ticket_id,
         "project": project,
         "summary": params.get("summary", ""),
@@ -45,27 +71,85 @@ def create_ticket(params: dict) -> dict:
         "jira_url": jira_url,
     }
 
-    es_service.index_document("voiceops-tickets", doc)
+
+async def create_ticket(params: dict) -> dict:
+    # Create in Jira
+    jira_result = await jira_service.create_issue(**_jira_fields(params))
+
+    doc = _ticket_document(params, jira_result)
+    await _index_ticket(doc)
 
     return {
-        "ticket_id": ticket_id,
+        "ticket_id": doc["ticket_id"],
         "action": "created",
         "jira": jira_result,
         "data": doc,
     }
 
 
-def update_ticket(params: dict) -> dict:
+async def _index_ticket(doc: dict):
+    """Index a new ticket, re-rolling a generated ID that is already taken.
+
+    A Jira key is authoritative, so a conflict on one is raised as is.
+    """
+    for attempt in range(TICKET_ID_ATTEMPTS):
+        try:
+            return await es_service.index_document("voiceops-tickets", doc)
+        except ConflictError:
+            if doc["jira_key"] or attempt == TICKET_ID_ATTEMPTS - 1:
+                raise
+            doc["ticket_id"] = _generated_id(doc["project"])
+
+
+async def create_tickets(params_list: list) -> list:
+    """Create several tickets with one Jira bulk call and one _bulk index request.
+
+    Returns one create_ticket-shaped result per params, in order; a ticket
+    whose document failed to index gets an "error" key instead.
+    """
+    jira_results = await jira_service.create_issues([_jira_fields(params) for params in params_list])
+    docs = [_ticket_document(params, jira_result) for params, jira_result in zip(params_list, jira_results)]
+
+    indexed = await es_service.bulk_index([("voiceops-tickets", doc) for doc in docs])
+    failed = {item.get("_id"): item.get("error") for item in indexed["failed"]}
+    for doc in docs:
+        error = failed.get(doc["ticket_id"])
+        if doc["jira_key"] or not isinstance(error, dict) or error.get("type") != "version_conflict_engine_exception":
+            continue
+        # Generated ID collided with an existing ticket: retry this one with a new ID
+        del failed[doc["ticket_id"]]
+        doc["ticket_id"] = _generated_id(doc["project"])
+        try:
+            await _index_ticket(doc)
+        except ConflictError as e:
+            failed[doc["ticket_id"]] = str(e)
+
+    results = []
+    for doc, jira_result in zip(docs, jira_results):
+        result = {
+            "ticket_id": doc["ticket_id"],
+            "action": "created",
+            "jira": jira_result,
+            "data": doc,
+        }
+        if doc["ticket_id"] in failed:
+            result["action"] = "failed"
+            result["error"] = str(failed[doc["ticket_id"]])
+        results.append(result)
+    return results
+
+
+async def update_ticket(params: dict) -> dict:
     ticket_id = params.get("ticket_id")
     updates = params.get("updates", {})
 
     # Update in Jira if it looks like a Jira key
     jira_result = None
     if ticket_id and jira_service.is_configured():
-        jira_result = jira_service.update_issue(ticket_id, updates)
+        jira_result = await jira_service.update_issue(ticket_id, updates)
 
     # Update in Elasticsearch
-    es_result = es_service.update_document("voiceops-tickets", ticket_id, updates)
+    es_result = await es_service.update_document("voiceops-tickets", ticket_id, updates)
 
     return {
         "ticket_id": ticket_id,
@@ -76,9 +160,9 @@ def update_ticket(params: dict) -> dict:
     }
 
 
-def log_action(command_id: str, action_type: str, tool_used: str,
-               success: bool, reasoning: str, explanation: str,
-               duration_ms: int, details: dict = None):
+async def log_action(command_id: str, action_type: str, tool_used: str,
+                     success: bool | None, reasoning: str, explanation: str,
+                     duration_ms: int, details: dict = None):
     doc = {
         "action_id": f"act-{uuid.uuid4().hex[:8]}",
         "command_id": command_id,
@@ -92,11 +176,11 @@ def log_action(command_id: str, action_type: str, tool_used: str,
         "user": "voiceops-user",
         "details": details or {},
     }
-    es_service.index_document("voiceops-actions", doc)
+    await audit_buffer.add("voiceops-actions", doc)
     return doc
 
 
-def log_command(command_id: str, transcript: str, intent_data: dict, status: str):
+async def log_command(command_id: str, transcript: str, intent_data: dict, status: str):
     doc = {
         "command_id": command_id,
         "raw_transcript": transcript,
@@ -106,4 +190,4 @@ def log_command(command_id: str, transcript: str, intent_data: dict, status: str
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "user": "voiceops-user",
     }
-    es_service.index_document("voiceops-commands", doc)
\ No newline at end of file
+    await audit_buffer.add("voiceops-commands", doc)
\ No newline at end of file
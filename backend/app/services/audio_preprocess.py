@@ -0,0 +1,345 @@
+"""
+Audio preprocessing before speech-to-text.
+Decodes the upload (WAV natively, anything else through ffmpeg), downmixes
+to mono, resamples to 16 kHz, trims leading and trailing silence with an
+energy-based VAD and re-encodes compactly (Opus, else FLAC, else 16-bit
+WAV). Recordings longer than STT_LONG_AUDIO_SECONDS are also split at
+pauses into overlapping chunks that can be transcribed in parallel. The
+DSP is vectorized NumPy and runs on a small thread pool so it never blocks
+the event loop. If any stage fails, or the result is not smaller than the
+original, the original audio is used.
+"""
+
+import asyncio
+import io
+import shutil
+import struct
+import subprocess
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.config import (
+    AUDIO_TARGET_RATE,
+    AUDIO_VAD_THRESHOLD_DB,
+    AUDIO_VAD_PADDING_MS,
+    AUDIO_ENCODE_BITRATE,
+    AUDIO_PREPROCESS_WORKERS,
+    STT_LONG_AUDIO_SECONDS,
+    STT_CHUNK_SECONDS,
+    STT_CHUNK_OVERLAP_MS,
+)
+
+FRAME_MS = 20
+
+# Keeps the VAD threshold well below speech level when a recording has
+# little or no silence to estimate the noise floor from
+_VAD_HEADROOM_DB = 20
+
+_FFMPEG_TIMEOUT_SECONDS = 30
+
+_executor = ThreadPoolExecutor(max_workers=AUDIO_PREPROCESS_WORKERS, thread_name_prefix="audio-preprocess")
+
+_stats = {"runs": 0, "applied": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0, "ms": 0}
+
+
+def _ffmpeg(args: list, data: bytes) -> bytes:
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", *args], input=data, capture_output=True, timeout=_FFMPEG_TIMEOUT_SECONDS,
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise ValueError(result.stderr.decode(errors="replace").strip() or "ffmpeg produced no output")
+    return result.stdout
+
+
+def _pcm(raw: bytes, tag: int, channels: int, bits: int) -> np.ndarray:
+    dtype = {(1, 8): np.uint8, (1, 16): "<i2", (1, 32): "<i4", (3, 32): "<f4", (3, 64): "<f8"}.get((tag, bits))
+    if dtype is None:
+        raise ValueError(f"Unsupported WAV encoding (format {tag}, {bits}-bit)")
+    frame_bytes = bits // 8 * channels
+    raw = raw[:len(raw) - len(raw) % frame_bytes]
+    samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+    if tag == 1:
+        samples = (samples - 128) / 128 if bits == 8 else samples / 2 ** (bits - 1)
+    return samples.reshape(-1, channels)
+
+
+def parse_wav(data: bytes) -> tuple[np.ndarray, int]:
+    """Samples (frames x channels, float32 in [-1, 1]) and sample rate of a WAV file.
+
+    Tolerates the placeholder data size ffmpeg writes when streaming WAV to a pipe.
+    """
+    if data[:4] not in (b"RIFF", b"RF64") or data[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+
+    pos, fmt = 12, None
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            tag, channels, rate = struct.unpack_from("<HHI", data, body)
+            bits = struct.unpack_from("<H", data, body + 14)[0]
+            if tag == 0xFFFE:  # WAVE_FORMAT_EXTENSIBLE: the real tag leads the subformat GUID
+                tag = struct.unpack_from("<H", data, body + 24)[0]
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            end = body + size if 0 < size <= len(data) - body else len(data)
+            tag, channels, rate, bits = fmt
+            return _pcm(data[body:end], tag, channels, bits), rate
+        pos = body + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def decode(data: bytes) -> tuple[np.ndarray, int]:
+    try:
+        return parse_wav(data)
+    except ValueError:
+        if shutil.which("ffmpeg") is None:
+            raise ValueError("ffmpeg is not installed; only WAV can be decoded")
+    return parse_wav(_ffmpeg(["-i", "pipe:0", "-f", "wav", "-acodec", "pcm_s16le", "pipe:1"], data))
+
+
+def _lowpass(x: np.ndarray, cutoff: float, taps: int = 127, block: int = 1 << 16) -> np.ndarray:
+    """Windowed-sinc FIR low-pass (cutoff in cycles/sample), applied block-wise
+    by FFT overlap-save so memory stays proportional to the block, not the audio."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    h /= h.sum()
+
+    fft_size = 1 << (block + taps - 2).bit_length()
+    step = fft_size - taps + 1
+    spectrum = np.fft.rfft(h, fft_size)
+    padded = np.concatenate([np.zeros(taps - 1, np.float32), x, np.zeros(fft_size, np.float32)])
+
+    full = np.empty(len(x) + taps - 1, np.float32)
+    for start in range(0, len(full), step):
+        segment = np.fft.irfft(np.fft.rfft(padded[start:start + fft_size]) * spectrum, fft_size)
+        valid = segment[taps - 1:]
+        full[start:start + step] = valid[:len(full) - start]
+    delay = (taps - 1) // 2
+    return full[delay:delay + len(x)]
+
+
+def resample(x: np.ndarray, rate: int, target: int) -> np.ndarray:
+    if rate == target or len(x) == 0:
+        return x
+    if target < rate:
+        # Band-limit to just under the new Nyquist frequency to avoid aliasing
+        x = _lowpass(x, 0.45 * target / rate)
+    positions = np.arange(len(x) * target // rate) * (rate / target)
+    return np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+
+
+def frame_energy_db(x: np.ndarray, rate: int) -> np.ndarray:
+    """RMS energy in dBFS of consecutive FRAME_MS frames."""
+    frame = rate * FRAME_MS // 1000
+    count = len(x) // frame
+    frames = x[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+
+def speech_frames(energy_db: np.ndarray) -> np.ndarray:
+    """Boolean mask of frames loud enough to be speech.
+
+    The threshold sits AUDIO_VAD_THRESHOLD_DB above the noise floor (10th
+    percentile), capped _VAD_HEADROOM_DB below the loud frames (95th
+    percentile) so a recording with no silence in it is left alone.
+    """
+    if len(energy_db) == 0:
+        return np.zeros(0, bool)
+    noise_floor, loud = np.percentile(energy_db, [10, 95])
+    threshold = min(noise_floor + AUDIO_VAD_THRESHOLD_DB, loud - _VAD_HEADROOM_DB)
+    return energy_db > threshold
+
+
+def trim_silence(x: np.ndarray, rate: int) -> tuple[np.ndarray, int]:
+    """Drop leading and trailing silence, keeping AUDIO_VAD_PADDING_MS around speech.
+
+    Returns the trimmed samples and the number of samples removed. Audio
+    with no detectable speech is returned unchanged.
+    """
+    speech = np.flatnonzero(speech_frames(frame_energy_db(x, rate)))
+    if len(speech) == 0:
+        return x, 0
+    frame = rate * FRAME_MS // 1000
+    padding = rate * AUDIO_VAD_PADDING_MS // 1000
+    start = max(0, speech[0] * frame - padding)
+    end = min(len(x), (speech[-1] + 1) * frame + padding)
+    return x[start:end], len(x) - (end - start)
+
+
+def split_at_silence(x: np.ndarray, rate: int) -> list:
+    """Sample ranges of about STT_CHUNK_SECONDS each, overlapping by STT_CHUNK_OVERLAP_MS.
+
+    Each cut goes at the quietest point within +/-25% of the target length,
+    so chunk boundaries fall in pauses between words wherever there are any.
+    """
+    energy = frame_energy_db(x, rate)
+    frame = rate * FRAME_MS // 1000
+    # Smoothed over 200 ms so a cut lands in a pause, not in the gap between syllables
+    window = max(1, 200 // FRAME_MS)
+    smooth = np.convolve(energy, np.ones(window) / window, mode="same")
+    target = int(STT_CHUNK_SECONDS * 1000 / FRAME_MS)
+
+    cuts = [0]
+    # Stop once the rest fits in one chunk of at most 1.5x the target
+    while len(energy) - cuts[-1] > target * 3 // 2:
+        low = cuts[-1] + target * 3 // 4
+        high = cuts[-1] + target * 5 // 4
+        cuts.append(low + int(np.argmin(smooth[low:high])))
+
+    bounds = [cut * frame for cut in cuts] + [len(x)]
+    half_overlap = rate * STT_CHUNK_OVERLAP_MS // 2000
+    return [
+        (max(0, start - half_overlap), min(len(x), end + half_overlap))
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+
+def _wav_bytes(x: np.ndarray, rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.clip(x, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def encode(x: np.ndarray, rate: int) -> tuple[bytes, str]:
+    """Encode mono samples; returns (audio bytes, file extension)."""
+    pcm = _wav_bytes(x, rate)
+    if shutil.which("ffmpeg") is None:
+        return pcm, ".wav"
+    try:
+        return _ffmpeg(["-i", "pipe:0", "-c:a", "libopus", "-b:a", AUDIO_ENCODE_BITRATE,
+                        "-application", "voip", "-f", "ogg", "pipe:1"], pcm), ".ogg"
+    except (ValueError, subprocess.TimeoutExpired):
+        pass
+    try:
+        # ffmpeg built without libopus: lossless, still about half of WAV
+        return _ffmpeg(["-i", "pipe:0", "-c:a", "flac", "-f", "flac", "pipe:1"], pcm), ".flac"
+    except (ValueError, subprocess.TimeoutExpired):
+        return pcm, ".wav"
+
+
+def preprocess(data: bytes) -> dict:
+    """Run the full pipeline synchronously; see run() for the result shape."""
+    timings = {}
+    clock = time.perf_counter()
+
+    def lap(name: str):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[name] = round((now - clock) * 1000, 1)
+        clock = now
+
+    samples, rate = decode(data)
+    lap("decode_ms")
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    original_seconds = len(mono) / rate if rate else 0.0
+    mono = resample(mono, rate, AUDIO_TARGET_RATE)
+    trimmed, removed = trim_silence(mono, AUDIO_TARGET_RATE)
+    ranges = [(0, len(trimmed))]
+    if len(trimmed) > STT_LONG_AUDIO_SECONDS * AUDIO_TARGET_RATE:
+        ranges = split_at_silence(trimmed, AUDIO_TARGET_RATE)
+    lap("dsp_ms")
+
+    segments, ext = [], None
+    for start, end in ranges:
+        audio, ext = encode(trimmed[start:end], AUDIO_TARGET_RATE)
+        segments.append({
+            "audio": audio,
+            "start_seconds": round(start / AUDIO_TARGET_RATE, 2),
+            "end_seconds": round(end / AUDIO_TARGET_RATE, 2),
+        })
+    lap("encode_ms")
+
+    return {
+        "segments": segments,
+        "ext": ext,
+        "original_sample_rate": rate,
+        "original_channels": int(samples.shape[1]),
+        "original_seconds": round(original_seconds, 2),
+        "seconds": round(len(trimmed) / AUDIO_TARGET_RATE, 2),
+        "trimmed_ms": int(removed * 1000 / AUDIO_TARGET_RATE),
+        **timings,
+    }
+
+
+def split(data: bytes) -> list:
+    """Decode and split long audio into overlapping WAV chunks at its own sample rate.
+
+    The chunking path for when AUDIO_PREPROCESS is off: no resampling,
+    trimming or re-encoding beyond writing each chunk as 16-bit PCM.
+    """
+    samples, rate = decode(data)
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    return [
+        {
+            "audio": _wav_bytes(mono[start:end], rate),
+            "start_seconds": round(start / rate, 2),
+            "end_seconds": round(end / rate, 2),
+        }
+        for start, end in split_at_silence(mono, rate)
+    ]
+
+
+async def run_split(data: bytes) -> list:
+    """split() off the event loop, on the preprocessing workers."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, split, data)
+
+
+async def run(data: bytes) -> dict:
+    """Preprocess audio off the event loop.
+
+    Always returns a report with original_bytes, processed_bytes, bytes_saved
+    and total_ms. When applied is True it also carries the processed
+    "segments" (one, or several overlapping chunks for long audio; each with
+    "audio", "start_seconds" and "end_seconds") and their "ext"; otherwise
+    a "reason" the original should be sent instead.
+    """
+    start = time.perf_counter()
+    _stats["runs"] += 1
+    _stats["bytes_in"] += len(data)
+    report = {"applied": False, "original_bytes": len(data)}
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(_executor, preprocess, data)
+    except Exception as e:
+        report["reason"] = f"Preprocessing failed: {e}"
+    else:
+        size = sum(len(segment["audio"]) for segment in result["segments"])
+        # Chunked audio is worth sending even when not smaller, for the parallelism
+        if size < len(data) or len(result["segments"]) > 1:
+            report.update(result, applied=True)
+        else:
+            report.update({k: v for k, v in result.items() if k != "segments"},
+                          reason="Processed audio was not smaller than the original")
+
+    processed = sum(len(s["audio"]) for s in report["segments"]) if report["applied"] else len(data)
+    report["processed_bytes"] = processed
+    report["bytes_saved"] = len(data) - processed
+    report["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    _stats["applied" if report["applied"] else "skipped"] += 1
+    _stats["bytes_out"] += processed
+    _stats["ms"] += report["total_ms"]
+    return report
+
+
+def close():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_stats() -> dict:
+    return {
+        **_stats,
+        "ms": round(_stats["ms"], 1),
+        "avg_ms": round(_stats["ms"] / _stats["runs"], 1) if _stats["runs"] else 0.0,
+        "bytes_saved": _stats["bytes_in"] - _stats["bytes_out"],
+        "workers": AUDIO_PREPROCESS_WORKERS,
+    }
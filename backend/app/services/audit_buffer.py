@@ -0,0 +1,149 @@
+"""
+Write-behind buffer for audit logging.
+Action and command documents are queued in-process and written to
+Elasticsearch in _bulk batches, flushed when the batch is full, when the
+oldest document reaches its maximum age, and at shutdown.
+"""
+
+import asyncio
+import logging
+import time
+from app.config import AUDIT_FLUSH_MAX_DOCS, AUDIT_FLUSH_MAX_AGE_MS, AUDIT_BUFFER_MAX_DOCS
+from app.services import elasticsearch_service as es_service
+
+logger = logging.getLogger("voiceops")
+
+# Pending (index, document, enqueued_at) entries, oldest first
+_buffer: list = []
+_flush_lock = asyncio.Lock()
+_wakeup = asyncio.Event()
+_flusher: asyncio.Task | None = None
+
+_stats = {
+    "enqueued": 0,
+    "flushed": 0,
+    "failed": 0,
+    "flushes": 0,
+    "failed_flushes": 0,
+    "backpressure_waits": 0,
+    "high_water_mark": 0,
+    "last_flush_lag_ms": 0,
+    "max_flush_lag_ms": 0,
+    "last_flush_at": None,
+}
+
+
+async def add(index: str, document: dict):
+    """Queue a document for indexing; only blocks when the buffer is full."""
+    if _flusher is None:
+        # No background flusher running (e.g. scripts): write through
+        await es_service.index_document(index, document)
+        return
+
+    while len(_buffer) >= AUDIT_BUFFER_MAX_DOCS:
+        _stats["backpressure_waits"] += 1
+        await flush()
+
+    _buffer.append((index, document, time.monotonic()))
+    _stats["enqueued"] += 1
+    _stats["high_water_mark"] = max(_stats["high_water_mark"], len(_buffer))
+
+    if len(_buffer) == 1 or len(_buffer) >= AUDIT_FLUSH_MAX_DOCS:
+        _wakeup.set()
+
+
+async def flush():
+    async with _flush_lock:
+        if not _buffer:
+            return
+
+        batch = _buffer[:AUDIT_FLUSH_MAX_DOCS]
+        del _buffer[:len(batch)]
+
+        try:
+            result = await es_service.bulk_index([(index, doc) for index, doc, _ in batch])
+        except Exception:
+            # Put the batch back in front so it is retried on the next flush
+            _buffer[:0] = batch
+            _stats["failed_flushes"] += 1
+            raise
+
+        now = time.monotonic()
+        lag_ms = int((now - batch[0][2]) * 1000)
+        _stats["flushes"] += 1
+        _stats["flushed"] += result["indexed"]
+        _stats["failed"] += len(result["failed"])
+        _stats["last_flush_lag_ms"] = lag_ms
+        _stats["max_flush_lag_ms"] = max(_stats["max_flush_lag_ms"], lag_ms)
+        _stats["last_flush_at"] = time.time()
+
+
+def _flush_due() -> bool:
+    if not _buffer:
+        return False
+    if len(_buffer) >= AUDIT_FLUSH_MAX_DOCS:
+        return True
+    return (time.monotonic() - _buffer[0][2]) * 1000 >= AUDIT_FLUSH_MAX_AGE_MS
+
+
+async def _run():
+    while True:
+        timeout = None
+        if _buffer:
+            age_ms = (time.monotonic() - _buffer[0][2]) * 1000
+            timeout = max(AUDIT_FLUSH_MAX_AGE_MS - age_ms, 0) / 1000
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+        while _flush_due():
+            try:
+                await flush()
+            except Exception:
+                # Back off for one age window before retrying the failed batch
+                await asyncio.sleep(AUDIT_FLUSH_MAX_AGE_MS / 1000)
+                break
+
+
+def start():
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.create_task(_run())
+
+
+async def stop():
+    """Stop the background flusher and write out everything still buffered.
+
+    If a flush fails (e.g. Elasticsearch is down) the remaining documents are
+    dropped and logged rather than raised, so the rest of shutdown still runs.
+    """
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        try:
+            await _flusher
+        except asyncio.CancelledError:
+            pass
+        _flusher = None
+
+    while _buffer:
+        try:
+            await flush()
+        except Exception as e:
+            logger.error("Dropping %d buffered audit document(s) at shutdown: %s", len(_buffer), e)
+            _stats["failed"] += len(_buffer)
+            _buffer.clear()
+            return
+
+
+def get_stats() -> dict:
+    oldest_age_ms = int((time.monotonic() - _buffer[0][2]) * 1000) if _buffer else 0
+    return {
+        **_stats,
+        "buffered": len(_buffer),
+        "capacity": AUDIT_BUFFER_MAX_DOCS,
+        "oldest_age_ms": oldest_age_ms,
+        "running": _flusher is not None,
+    }
@@ -0,0 +1,176 @@
+"""
+Token-budgeted context serializer for the planning prompt.
+Renders retrieved context as one compact line per item instead of indented
+JSON, then drops or truncates the lowest-relevance items until the text fits
+CONTEXT_TOKEN_BUDGET.
+"""
+
+import json
+import math
+from app.config import CONTEXT_TOKEN_BUDGET
+
+# Free-text fields are cut to this many characters when an item is truncated
+TRUNCATED_TEXT_CHARS = 80
+
+SECTIONS = [
+    ("target_ticket", "TARGET TICKET"),
+    ("similar_tickets", "SIMILAR TICKETS"),
+    ("past_commands", "PAST COMMANDS"),
+    ("past_actions", "PAST ACTIONS"),
+    ("stats", "STATS"),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count (~4 characters per token for English/JSON)."""
+    return math.ceil(len(text) / 4)
+
+
+def _clip(text, limit: int | None) -> str:
+    text = " ".join(str(text or "").split())
+    if limit is not None and len(text) > limit:
+        return text[:limit - 1].rstrip() + "…"
+    return text
+
+
+def _ticket_line(ticket: dict, limit: int | None) -> str:
+    fields = [
+        ticket.get("ticket_id"),
+        ticket.get("status"),
+        ticket.get("priority"),
+        ticket.get("project"),
+        ticket.get("assignee"),
+    ]
+    if "relevance_score" in ticket:
+        fields.append(f"score {ticket['relevance_score']:.2f}")
+    if ticket.get("labels"):
+        fields.append("labels " + ",".join(ticket["labels"]))
+    fields.append(_clip(ticket.get("summary"), limit))
+    if ticket.get("description"):
+        fields.append(_clip(ticket["description"], limit))
+    return "- " + " | ".join(str(f) for f in fields if f)
+
+
+def _command_line(command: dict, limit: int | None) -> str:
+    entities = {k: v for k, v in (command.get("entities") or {}).items() if v}
+    line = f'- "{_clip(command.get("raw_transcript"), limit)}" -> {command.get("intent")}'
+    if entities:
+        line += " " + json.dumps(entities, separators=(",", ":"))
+    if command.get("status"):
+        line += f" ({command['status']})"
+    return line
+
+
+def _action_line(action: dict, limit: int | None) -> str:
+    ticket_id = (action.get("details") or {}).get("ticket_id")
+    fields = [
+        action.get("action_type"),
+        "ok" if action.get("success") else "failed",
+        ticket_id,
+        f"{action['duration_ms']}ms" if action.get("duration_ms") is not None else None,
+        _clip(action.get("explanation"), limit),
+    ]
+    return "- " + " | ".join(str(f) for f in fields if f)
+
+
+def _stats_line(stats: dict, limit: int | None) -> str:
+    return "- " + "; ".join(
+        f"{name}: " + ", ".join(f"{key}={count}" for key, count in buckets.items())
+        for name, buckets in stats.items() if buckets
+    )
+
+
+def _items(context: dict) -> list:
+    """Context items as dicts with section, relevance and render(limit).
+
+    Relevance: the target ticket is pinned (never dropped); similar tickets
+    rank by normalized search score; past commands and actions by result
+    rank; aggregate stats come last.
+    """
+    items = []
+    if context.get("target_ticket"):
+        ticket = context["target_ticket"]
+        items.append({"section": "target_ticket", "relevance": math.inf,
+                      "render": lambda limit, t=ticket: _ticket_line(t, limit)})
+
+    tickets = context.get("similar_tickets") or []
+    top_score = max((t.get("relevance_score") or 0 for t in tickets), default=0) or 1
+    for ticket in tickets:
+        items.append({"section": "similar_tickets",
+                      "relevance": 0.5 + 0.5 * (ticket.get("relevance_score") or 0) / top_score,
+                      "render": lambda limit, t=ticket: _ticket_line(t, limit)})
+
+    for rank, command in enumerate(context.get("past_commands") or []):
+        items.append({"section": "past_commands", "relevance": 0.4 / (rank + 1),
+                      "render": lambda limit, c=command: _command_line(c, limit)})
+
+    for rank, action in enumerate(context.get("past_actions") or []):
+        items.append({"section": "past_actions", "relevance": 0.3 / (rank + 1),
+                      "render": lambda limit, a=action: _action_line(a, limit)})
+
+    if any(context.get("stats") or {}):
+        stats = context["stats"]
+        items.append({"section": "stats", "relevance": 0.1,
+                      "render": lambda limit, s=stats: _stats_line(s, limit)})
+
+    for item in items:
+        item["line"] = item["render"](None)
+    return items
+
+
+def _render(items: list) -> str:
+    lines = []
+    for section, title in SECTIONS:
+        section_lines = [item["line"] for item in items if item["section"] == section]
+        lines.append(f"{title}:")
+        lines.extend(section_lines or ["- none"])
+    return "\n".join(lines) + "\n"
+
+
+def legacy_render(context: dict) -> str:
+    """The previous indented-JSON context block, kept for before/after token counts."""
+    return f"""SIMILAR TICKETS: {json.dumps(context.get('similar_tickets', []), indent=2, default=str)}
+TARGET TICKET: {json.dumps(context.get('target_ticket'), indent=2, default=str)}
+PAST COMMANDS: {json.dumps(context.get('past_commands', []), indent=2, default=str)}
+PAST ACTIONS: {json.dumps(context.get('past_actions', []), indent=2, default=str)}
+STATS: {json.dumps(context.get('stats', {}), indent=2, default=str)}
+"""
+
+
+def compact(context: dict, budget: int = CONTEXT_TOKEN_BUDGET) -> tuple[str, dict]:
+    """Serialize context within budget tokens; returns (text, compaction stats).
+
+    Items are shed lowest relevance first: free-text fields are first cut
+    to TRUNCATED_TEXT_CHARS item by item, and only if that is not enough
+    are whole items dropped. The pinned target ticket is never dropped.
+    """
+    items = _items(context)
+    text = _render(items)
+    truncated, dropped = [], []
+    by_relevance = sorted(items, key=lambda i: i["relevance"])
+
+    for item in by_relevance:
+        if estimate_tokens(text) <= budget:
+            break
+        shorter = item["render"](TRUNCATED_TEXT_CHARS)
+        if len(shorter) < len(item["line"]):
+            item["line"] = shorter
+            truncated.append(item["section"])
+            text = _render(items)
+
+    for item in by_relevance:
+        if estimate_tokens(text) <= budget or item["relevance"] == math.inf:
+            break
+        items.remove(item)
+        dropped.append(item["section"])
+        text = _render(items)
+
+    return text, {
+        "budget_tokens": budget,
+        # The old JSON prompt rendering of the same, already field-projected, context;
+        # savings from the CONTEXT_SOURCE_FIELDS projection itself are not included
+        "tokens_legacy_render": estimate_tokens(legacy_render(context)),
+        "tokens_after": estimate_tokens(text),
+        "truncated": truncated,
+        "dropped": dropped,
+    }
@@ -0,0 +1,267 @@
+"""
+Context retrieval engine: gathers everything the planner needs from
+Elasticsearch in a single round-trip (one _msearch, with the realtime ticket
+GET running alongside it) instead of one request per query.
+"""
+
+import asyncio
+import re
+import time
+from app.services import elasticsearch_service as es_service
+from app.services import intent_classifier
+
+# Share of description terms that must appear in the transcript for the
+# speculative transcript-keyed similar-ticket search to be kept
+SPECULATIVE_COVERAGE = 0.8
+
+# Value used for a sub-query that was skipped or failed
+CONTEXT_DEFAULTS = {
+    "similar_tickets": [],
+    "target_ticket": None,
+    "past_commands": [],
+    "past_actions": [],
+    "stats": {},
+}
+
+
+def build_subqueries(intent_data: dict, transcript: str) -> dict:
+    """Map each context key to its sub-query.
+
+    Searches are (index, body, parser) tuples sent through _msearch; direct
+    document lookups are zero-argument coroutine functions run alongside it.
+    """
+    entities = intent_data.get("entities", {})
+    description = entities.get("description", "")
+    ticket_id = entities.get("ticket_id")
+    intent = intent_data.get("intent", "")
+
+    subqueries = {}
+    if description:
+        subqueries["similar_tickets"] = (
+            "voiceops-tickets",
+            es_service.similar_tickets_query(description),
+            es_service.parse_scored_sources,
+        )
+    if ticket_id:
+        subqueries["target_ticket"] = lambda: es_service.find_ticket_by_id(ticket_id)
+    subqueries["past_commands"] = (
+        "voiceops-commands",
+        es_service.past_commands_query(transcript),
+        es_service.parse_sources,
+    )
+    if intent:
+        subqueries["past_actions"] = (
+            "voiceops-actions",
+            es_service.past_actions_query(intent),
+            es_service.parse_sources,
+        )
+    subqueries["stats"] = _stats_subquery()
+    return subqueries
+
+
+def _stats_subquery():
+    # Served from the write-invalidated stats cache when fresh, otherwise
+    # fetched in the _msearch and cached on the way back
+    if es_service.stats_cached("ticket_stats"):
+        return es_service.get_ticket_stats
+    return (
+        "voiceops-tickets",
+        es_service.ticket_stats_query(),
+        es_service.caching_parser("ticket_stats", es_service.parse_ticket_stats),
+    )
+
+
+async def run_subqueries(subqueries: dict, on_result=None) -> tuple[dict, dict]:
+    """Execute sub-queries in one round-trip and return (results, timings).
+
+    A sub-query that errors falls back to its CONTEXT_DEFAULTS value so the
+    planner always receives the same context shape. on_result, if given, is
+    called as on_result(name, result, timing) as soon as each result lands.
+    """
+    if not subqueries:
+        return {}, {"round_trip_ms": 0, "queries": {}}
+
+    searches = {name: q for name, q in subqueries.items() if not callable(q)}
+    lookups = {name: q for name, q in subqueries.items() if callable(q)}
+
+    start = time.perf_counter()
+    results, queries = {}, {}
+    for part in asyncio.as_completed([
+        _run_searches(searches),
+        *(_run_lookup(name, fetch) for name, fetch in lookups.items()),
+    ]):
+        part_results, part_queries = await part
+        results.update(part_results)
+        queries.update(part_queries)
+        if on_result is not None:
+            for name, result in part_results.items():
+                on_result(name, result, part_queries[name])
+    round_trip_ms = int((time.perf_counter() - start) * 1000)
+
+    return results, {"round_trip_ms": round_trip_ms, "queries": queries}
+
+
+async def _run_searches(searches: dict) -> tuple[dict, dict]:
+    if not searches:
+        return {}, {}
+
+    names = list(searches)
+    results, queries = {}, {}
+    try:
+        responses = await es_service.multi_search(
+            [(searches[name][0], searches[name][1]) for name in names]
+        )
+    except Exception as e:
+        for name in names:
+            results[name] = CONTEXT_DEFAULTS[name]
+            queries[name] = {"status": "error", "error": str(e)}
+        return results, queries
+
+    for name, response in zip(names, responses):
+        parse = searches[name][2]
+        if "error" in response:
+            results[name] = CONTEXT_DEFAULTS[name]
+            queries[name] = {"status": "error", "error": _error_reason(response["error"])}
+            continue
+        try:
+            results[name] = parse(response)
+            queries[name] = {"status": "ok", "took_ms": response.get("took")}
+        except Exception as e:
+            results[name] = CONTEXT_DEFAULTS[name]
+            queries[name] = {"status": "error", "error": str(e)}
+    return results, queries
+
+
+async def _run_lookup(name: str, fetch) -> tuple[dict, dict]:
+    start = time.perf_counter()
+    try:
+        result = await fetch()
+    except Exception as e:
+        return {name: CONTEXT_DEFAULTS[name]}, {name: {"status": "error", "error": str(e)}}
+    took_ms = int((time.perf_counter() - start) * 1000)
+    return {name: result}, {name: {"status": "ok", "took_ms": took_ms}}
+
+
+def _error_reason(error) -> str:
+    if isinstance(error, dict):
+        return str(error.get("reason") or error.get("type") or error)
+    return str(error)
+
+
+async def gather_context(intent_data: dict, transcript: str, on_result=None) -> dict:
+    results, timings = await run_subqueries(build_subqueries(intent_data, transcript), on_result)
+
+    context = {name: results.get(name, default) for name, default in CONTEXT_DEFAULTS.items()}
+    context["retrieval"] = timings
+    return context
+
+
+def build_speculative_subqueries(transcript: str) -> dict:
+    """Sub-queries that only need the raw transcript, so they can run before intent is known."""
+    return {
+        "similar_tickets": (
+            "voiceops-tickets",
+            es_service.similar_tickets_query(transcript),
+            es_service.parse_scored_sources,
+        ),
+        "past_commands": (
+            "voiceops-commands",
+            es_service.past_commands_query(transcript),
+            es_service.parse_sources,
+        ),
+        "stats": _stats_subquery(),
+    }
+
+
+def _terms(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+def _transcript_covers(transcript: str, description: str) -> bool:
+    wanted = _terms(description)
+    if not wanted:
+        return True
+    return len(wanted & _terms(transcript)) / len(wanted) >= SPECULATIVE_COVERAGE
+
+
+async def gather_context_speculative(transcript: str, intent_call, on_result=None) -> tuple[dict, dict]:
+    """Overlap transcript-keyed retrieval with the intent LLM call.
+
+    Once intent arrives, only the intent-dependent sub-queries are sent, plus
+    a similar-ticket refetch when the extracted description is not covered
+    by the transcript. Returns (intent_data, context).
+    """
+    def report_speculative(name, result, timing):
+        on_result(name, result, {**timing, "speculative": True})
+
+    on_speculative = report_speculative if on_result is not None else None
+
+    speculative = asyncio.create_task(
+        run_subqueries(build_speculative_subqueries(transcript), on_speculative)
+    )
+    try:
+        intent_data = await intent_call
+    except BaseException:
+        speculative.cancel()
+        raise
+    spec_results, spec_timings = await speculative
+
+    full = build_subqueries(intent_data, transcript)
+    followup = {name: full[name] for name in ("target_ticket", "past_actions") if name in full}
+
+    hits, refetched, missed = [], [], []
+    for name in spec_results:
+        failed = spec_timings["queries"][name]["status"] != "ok"
+        stale = name == "similar_tickets" and not _transcript_covers(
+            transcript, intent_data.get("entities", {}).get("description", "")
+        )
+        if failed or stale:
+            # A failed speculative query is a miss even when there is nothing to refetch
+            if name in full:
+                followup[name] = full[name]
+                refetched.append(name)
+            else:
+                missed.append(name)
+        else:
+            hits.append(name)
+
+    results, timings = await run_subqueries(followup, on_result)
+    merged = {**spec_results, **results}
+
+    context = {name: merged.get(name, default) for name, default in CONTEXT_DEFAULTS.items()}
+    context["retrieval"] = {
+        "round_trip_ms": timings["round_trip_ms"],
+        "speculative_round_trip_ms": spec_timings["round_trip_ms"],
+        "queries": {**spec_timings["queries"], **timings["queries"]},
+    }
+    context["speculation"] = {
+        "hits": hits,
+        "refetched": refetched,
+        "missed": missed,
+        "fetched_after_intent": [name for name in followup if name not in refetched],
+    }
+    return intent_data, context
+
+
+async def gather_transcript_context(transcript: str, on_result=None) -> dict:
+    """Context for one-shot planning, where no LLM intent exists yet.
+
+    Uses the transcript-keyed sub-queries plus the ticket ID and intent
+    guessed by the local classifier for the lookups that need them.
+    """
+    guess = intent_classifier.classify(transcript)
+    subqueries = build_speculative_subqueries(transcript)
+
+    ticket_id = guess["entities"]["ticket_id"]
+    if ticket_id:
+        subqueries["target_ticket"] = lambda: es_service.find_ticket_by_id(ticket_id)
+    subqueries["past_actions"] = (
+        "voiceops-actions",
+        es_service.past_actions_query(guess["intent"]),
+        es_service.parse_sources,
+    )
+
+    results, timings = await run_subqueries(subqueries, on_result)
+    context = {name: results.get(name, default) for name, default in CONTEXT_DEFAULTS.items()}
+    context["retrieval"] = timings
+    return context
@@ -1,24 +1,178 @@
-from app.config import es_client
+import asyncio
+import time
+from collections import OrderedDict
+from elasticsearch import ConflictError, NotFoundError
+from app.config import es_client, REFRESH_POLICY, ES_REFRESH_INTERVAL_MS, STATS_CACHE_TTL_SECONDS
 
+# Indices whose documents are keyed by a field of their own instead of an auto _id
+DOCUMENT_ID_FIELDS = {"voiceops-tickets": "ticket_id"}
 
-def search_similar_tickets(description: str, size: int = 5) -> list:
-    if not description:
-        return []
+# Attempts for a read-modify-write update that loses a seq_no race
+UPDATE_MAX_RETRIES = 3
 
-    result = es_client.search(
-        index="voiceops-tickets",
-        body={
-            "query": {
-                "multi_match": {
-                    "query": description,
-                    "fields": ["summary^2", "description", "labels"],
-                    "fuzziness": "AUTO"
-                }
-            },
-            "size": size
+# _source fields fetched for planner context; the rest of each document
+# (action details, reasoning, Jira metadata) never reaches the prompt
+CONTEXT_SOURCE_FIELDS = {
+    "voiceops-tickets": [
+        "ticket_id", "project", "summary", "description", "priority",
+        "assignee", "team", "status", "labels", "created_at",
+    ],
+    "voiceops-commands": ["raw_transcript", "intent", "entities", "status"],
+    "voiceops-actions": [
+        "action_type", "success", "explanation", "duration_ms", "timestamp", "details.ticket_id",
+    ],
+}
+
+# refresh= request parameter for each consistency mode
+REFRESH_MODES = {"none": False, "wait_for": "wait_for", "immediate": True}
+
+# Recently written (index, _id) -> monotonic write time, for read-your-write metrics
+_recent_writes: OrderedDict = OrderedDict()
+_RECENT_WRITES_MAX = 10000
+_consistency_stats: dict = {}
+
+# Aggregation caches and the indices whose writes invalidate them
+STATS_INDICES = {
+    "ticket_stats": ["voiceops-tickets"],
+    "action_stats": ["voiceops-actions"],
+    "impact": ["voiceops-actions"],
+    "index_counts": ["voiceops-tickets", "voiceops-commands", "voiceops-actions"],
+}
+# index -> write generation, bumped on every write through this module
+_generations: dict = {}
+# index -> monotonic time of the last write made without a refresh
+_unrefreshed_writes: dict = {}
+_stats_cache: dict = {}
+_stats_cache_counters = {"hits": 0, "misses": 0}
+
+
+def _refresh_mode(index: str) -> str:
+    mode = REFRESH_POLICY.get(index, "wait_for")
+    return mode if mode in REFRESH_MODES else "wait_for"
+
+
+def _index_stats(index: str) -> dict:
+    return _consistency_stats.setdefault(index, {
+        "writes": {mode: 0 for mode in REFRESH_MODES},
+        "reads": 0,
+        "ryw_reads": 0,
+    })
+
+
+def _note_write(index: str, doc_id: str, mode: str):
+    _generations[index] = _generations.get(index, 0) + 1
+    if mode == "none":
+        _unrefreshed_writes[index] = time.monotonic()
+    _index_stats(index)["writes"][mode] += 1
+    _recent_writes[(index, doc_id)] = time.monotonic()
+    _recent_writes.move_to_end((index, doc_id))
+    while len(_recent_writes) > _RECENT_WRITES_MAX:
+        _recent_writes.popitem(last=False)
+
+
+def _note_reads(result: dict):
+    """Count hits that were written within the refresh interval, i.e. reads
+    that were only correct because of the refresh policy."""
+    now = time.monotonic()
+    for hit in result.get("hits", {}).get("hits", []):
+        stats = _index_stats(hit["_index"])
+        stats["reads"] += 1
+        written_at = _recent_writes.get((hit["_index"], hit["_id"]))
+        if written_at is not None and (now - written_at) * 1000 < ES_REFRESH_INTERVAL_MS:
+            stats["ryw_reads"] += 1
+
+
+async def _search(index: str, body: dict) -> dict:
+    result = await es_client.search(index=index, body=body)
+    _note_reads(result)
+    return result
+
+
+def _generation(name: str) -> tuple:
+    return tuple(_generations.get(index, 0) for index in STATS_INDICES[name])
+
+
+def stats_cached(name: str) -> bool:
+    entry = _stats_cache.get(name)
+    return bool(entry) and entry["generation"] == _generation(name) and time.monotonic() < entry["expires_at"]
+
+
+def _store_stats(name: str, generation: tuple, started_at: float, value):
+    expires_at = time.monotonic() + STATS_CACHE_TTL_SECONDS
+    # A write made without refresh shortly before the aggregation ran may not be
+    # counted yet; only trust the result until that write becomes searchable
+    for index in STATS_INDICES[name]:
+        written_at = _unrefreshed_writes.get(index)
+        if written_at is not None and started_at - written_at < ES_REFRESH_INTERVAL_MS / 1000:
+            expires_at = min(expires_at, written_at + ES_REFRESH_INTERVAL_MS / 1000)
+    _stats_cache[name] = {"generation": generation, "expires_at": expires_at, "value": value}
+    _stats_cache_counters["misses"] += 1
+
+
+def caching_parser(name: str, parse):
+    """Wrap a parser so its result is cached against the write generation at call time."""
+    generation, started_at = _generation(name), time.monotonic()
+
+    def parse_and_store(result: dict):
+        value = parse(result)
+        _store_stats(name, generation, started_at, value)
+        return value
+    return parse_and_store
+
+
+async def _cached_stats(name: str, compute):
+    if stats_cached(name):
+        _stats_cache_counters["hits"] += 1
+        return _stats_cache[name]["value"]
+
+    generation, started_at = _generation(name), time.monotonic()
+    value = await compute()
+    _store_stats(name, generation, started_at, value)
+    return value
+
+
+def similar_tickets_query(description: str, size: int = 5) -> dict:
+    return {
+        "query": {
+            "multi_match": {
+                "query": description,
+                "fields": ["summary^2", "description", "labels"],
+                "fuzziness": "AUTO"
+            }
+        },
+        "_source": CONTEXT_SOURCE_FIELDS["voiceops-tickets"],
+        "size": size
+    }
+
+
+def past_commands_query(transcript: str, size: int = 3) -> dict:
+    return {
+        "query": {"match": {"raw_transcript": transcript}},
+        "_source": CONTEXT_SOURCE_FIELDS["voiceops-commands"],
+        "size": size,
+    }
+
+
+def past_actions_query(action_type: str, size: int = 3) -> dict:
+    return {
+        "query": {"match": {"action_type": action_type}},
+        "_source": CONTEXT_SOURCE_FIELDS["voiceops-actions"],
+        "size": size,
+    }
+
+
+def ticket_stats_query() -> dict:
+    return {
+        "size": 0,
+        "aggs": {
+            "by_project": {"terms": {"field": "project"}},
+            "by_priority": {"terms": {"field": "priority"}},
+            "by_status": {"terms": {"field": "status"}}
         }
-    )
+    }
+
 
+def parse_scored_sources(result: dict) -> list:
     tickets = []
     for hit in result["hits"]["hits"]:
         ticket = hit["_source"]
@@ -27,59 +181,91 @@ def search_similar_tickets(description: str, size: int = 5) -> list:
     return tickets
 
 
-def find_ticket_by_id(ticket_id: str) -> dict | None:
-    result = es_client.search(
+def parse_sources(result: dict) -> list:
+    return [hit["_source"] for hit in result["hits"]["hits"]]
+
+
+def parse_ticket_stats(result: dict) -> dict:
+    aggs = result["aggregations"]
+    return {
+        "by_project": {b["key"]: b["doc_count"] for b in aggs["by_project"]["buckets"]},
+        "by_priority": {b["key"]: b["doc_count"] for b in aggs["by_priority"]["buckets"]},
+        "by_status": {b["key"]: b["doc_count"] for b in aggs["by_status"]["buckets"]},
+    }
+
+
+async def search_similar_tickets(description: str, size: int = 5) -> list:
+    if not description:
+        return []
+
+    result = await _search(
         index="voiceops-tickets",
-        body={"query": {"term": {"ticket_id": ticket_id}}, "size": 1}
+        body=similar_tickets_query(description, size)
     )
-    if result["hits"]["hits"]:
-        return result["hits"]["hits"][0]["_source"]
-    return None
+    return parse_scored_sources(result)
 
 
-def search_past_commands(transcript: str, size: int = 3) -> list:
-    result = es_client.search(
+async def find_ticket_by_id(ticket_id: str) -> dict | None:
+    # Realtime GET: sees the latest write without waiting for a refresh
+    try:
+        result = await es_client.get(index="voiceops-tickets", id=ticket_id)
+    except NotFoundError:
+        return None
+    return result["_source"]
+
+
+async def search_past_commands(transcript: str, size: int = 3) -> list:
+    result = await _search(
         index="voiceops-commands",
-        body={"query": {"match": {"raw_transcript": transcript}}, "size": size}
+        body=past_commands_query(transcript, size)
     )
-    return [hit["_source"] for hit in result["hits"]["hits"]]
+    return parse_sources(result)
 
 
-def search_past_actions(action_type: str, size: int = 3) -> list:
+async def search_past_actions(action_type: str, size: int = 3) -> list:
     if not action_type:
         return []
-    result = es_client.search(
+    result = await _search(
         index="voiceops-actions",
-        body={"query": {"match": {"action_type": action_type}}, "size": size}
+        body=past_actions_query(action_type, size)
     )
-    return [hit["_source"] for hit in result["hits"]["hits"]]
+    return parse_sources(result)
 
 
-def get_ticket_stats() -> dict:
+async def get_ticket_stats() -> dict:
     try:
-        result = es_client.search(
-            index="voiceops-tickets",
-            body={
-                "size": 0,
-                "aggs": {
-                    "by_project": {"terms": {"field": "project"}},
-                    "by_priority": {"terms": {"field": "priority"}},
-                    "by_status": {"terms": {"field": "status"}}
-                }
-            }
-        )
-        aggs = result["aggregations"]
-        return {
-            "by_project": {b["key"]: b["doc_count"] for b in aggs["by_project"]["buckets"]},
-            "by_priority": {b["key"]: b["doc_count"] for b in aggs["by_priority"]["buckets"]},
-            "by_status": {b["key"]: b["doc_count"] for b in aggs["by_status"]["buckets"]},
-        }
+        return await _cached_stats("ticket_stats", _compute_ticket_stats)
     except Exception:
         return {}
 
 
-def get_all_tickets(size: int = 50) -> list:
-    result = es_client.search(
+async def _compute_ticket_stats() -> dict:
+    result = await _search(
+        index="voiceops-tickets",
+        body=ticket_stats_query()
+    )
+    return parse_ticket_stats(result)
+
+
+async def multi_search(searches: list) -> list:
+    """Run (index, body) pairs as a single _msearch round-trip.
+
+    Returns the raw per-search responses in request order; failed
+    sub-searches carry an "error" key instead of hits.
+    """
+    operations = []
+    for index, body in searches:
+        operations.append({"index": index})
+        operations.append(body)
+    result = await es_client.msearch(searches=operations)
+    for response in result["responses"]:
+        if "error" not in response:
+            _note_reads(response)
+    return result["responses"]
+
+
+async def get_all_tickets(size: int = 50) -> list:
+    result = await _search(
         index="voiceops-tickets",
         body={
             "query": {"match_all": {}},
@@ -90,8 +276,8 @@ def get_all_tickets(size: int = 50) -> list:
     return [hit["_source"] for hit in result["hits"]["hits"]]
 
 
-def get_all_actions(size: int = 50) -> list:
-    result = es_client.search(
+async def get_all_actions(size: int = 50) -> list:
+    result = await _search(
         index="voiceops-actions",
         body={
             "query": {"match_all": {}},
@@ -102,64 +288,205 @@ def get_all_actions(size: int = 50) -> list:
     return [hit["_source"] for hit in result["hits"]["hits"]]
 
 
-def get_action_stats() -> dict:
+async def get_action_stats() -> dict:
     try:
-        result = es_client.search(
-            index="voiceops-actions",
-            body={
-                "size": 0,
-                "aggs": {
-                    "by_type": {"terms": {"field": "action_type"}},
-                    "by_tool": {"terms": {"field": "tool_used"}},
-                    "avg_duration": {"avg": {"field": "duration_ms"}}
-                }
-            }
-        )
-        aggs = result["aggregations"]
-        return {
-            "total": result["hits"]["total"]["value"],
-            "by_type": {b["key"]: b["doc_count"] for b in aggs["by_type"]["buckets"]},
-            "by_tool": {b["key"]: b["doc_count"] for b in aggs["by_tool"]["buckets"]},
-            "avg_duration_ms": aggs["avg_duration"].get("value", 0),
-        }
+        return await _cached_stats("action_stats", _compute_action_stats)
     except Exception:
         return {}
 
 
-def index_document(index: str, document: dict):
-    es_client.index(index=index, document=document)
-    es_client.indices.refresh(index=index)
+async def _compute_action_stats() -> dict:
+    result = await _search(
+        index="voiceops-actions",
+        body={
+            "size": 0,
+            "aggs": {
+                "by_type": {"terms": {"field": "action_type"}},
+                "by_tool": {"terms": {"field": "tool_used"}},
+                "avg_duration": {"avg": {"field": "duration_ms"}}
+            }
+        }
+    )
+    aggs = result["aggregations"]
+    return {
+        "total": result["hits"]["total"]["value"],
+        "by_type": {b["key"]: b["doc_count"] for b in aggs["by_type"]["buckets"]},
+        "by_tool": {b["key"]: b["doc_count"] for b in aggs["by_tool"]["buckets"]},
+        "avg_duration_ms": aggs["avg_duration"].get("value", 0),
+    }
 
 
-def update_document(index: str, ticket_id: str, updates: dict) -> dict:
-    result = es_client.search(
-        index=index,
-        body={"query": {"term": {"ticket_id": ticket_id}}, "size": 1}
-    )
-    if not result["hits"]["hits"]:
-        return {"error": f"Document {ticket_id} not found"}
+# Bucket count for the per-type impact aggregation; far above the number of
+# action types, so every type gets an exact count of its own
+IMPACT_MAX_ACTION_TYPES = 500
 
-    doc_id = result["hits"]["hits"][0]["_id"]
-    old_data = result["hits"]["hits"][0]["_source"]
 
-    es_client.update(index=index, id=doc_id, body={"doc": updates})
-    es_client.indices.refresh(index=index)
+def impact_query(start: str | None = None, end: str | None = None) -> dict:
+    """Counts per action type plus success and duration stats in one request.
 
+    start/end bound timestamp (inclusive/exclusive) and accept ISO dates or
+    date math such as "now-7d/d".
+    """
+    timestamp = {key: value for key, value in (("gte", start), ("lt", end)) if value}
     return {
-        "ticket_id": ticket_id,
-        "action": "updated",
-        "changes": updates,
-        "previous": {k: old_data.get(k) for k in updates.keys()}
+        "size": 0,
+        "track_total_hits": True,
+        "query": {"range": {"timestamp": timestamp}} if timestamp else {"match_all": {}},
+        "aggs": {
+            "by_type": {"terms": {"field": "action_type", "size": IMPACT_MAX_ACTION_TYPES, "missing": "unknown"}},
+            "succeeded": {"filter": {"term": {"success": True}}},
+            "duration": {"stats": {"field": "duration_ms"}},
+            "first_action": {"min": {"field": "timestamp"}},
+            "last_action": {"max": {"field": "timestamp"}},
+        },
     }
 
 
-def get_index_counts() -> dict:
+def parse_impact_stats(result: dict) -> dict:
+    aggs = result["aggregations"]
+    duration = aggs["duration"]
     return {
-        "voiceops-tickets": es_client.count(index="voiceops-tickets")["count"],
-        "voiceops-commands": es_client.count(index="voiceops-commands")["count"],
-        "voiceops-actions": es_client.count(index="voiceops-actions")["count"],
+        "total": result["hits"]["total"]["value"],
+        "by_type": {b["key"]: b["doc_count"] for b in aggs["by_type"]["buckets"]},
+        # Documents of types beyond the IMPACT_MAX_ACTION_TYPES largest
+        "other": aggs["by_type"].get("sum_other_doc_count", 0),
+        "succeeded": aggs["succeeded"]["doc_count"],
+        "duration_ms": {
+            "sum": duration.get("sum") or 0,
+            "avg": duration.get("avg"),
+            "min": duration.get("min"),
+            "max": duration.get("max"),
+        },
+        "first_action": aggs["first_action"].get("value_as_string") or aggs["first_action"].get("value"),
+        "last_action": aggs["last_action"].get("value_as_string") or aggs["last_action"].get("value"),
     }
 
 
-def get_cluster_info() -> dict:
-    return es_client.info()
\ No newline at end of file
+async def get_impact_stats(start: str | None = None, end: str | None = None) -> dict:
+    async def compute():
+        result = await _search(index="voiceops-actions", body=impact_query(start, end))
+        return parse_impact_stats(result)
+
+    if start or end:
+        return await compute()
+    # Only the all-time figures are cached; ranges vary per request
+    return await _cached_stats("impact", compute)
+
+
+async def index_document(index: str, document: dict):
+    mode = _refresh_mode(index)
+    doc_id = document.get(DOCUMENT_ID_FIELDS[index]) if index in DOCUMENT_ID_FIELDS else None
+    result = await es_client.index(
+        index=index,
+        id=doc_id,
+        document=document,
+        op_type="create" if doc_id else None,
+        refresh=REFRESH_MODES[mode],
+    )
+    _note_write(index, result["_id"], mode)
+
+
+async def bulk_index(documents: list) -> dict:
+    """Index (index, document) pairs with a single _bulk request.
+
+    Keyed indices use the create op, so like index_document an existing
+    document with the same ID is reported as failed rather than overwritten.
+    """
+    operations = []
+    for index, document in documents:
+        action = {"_index": index}
+        op_type = "index"
+        if index in DOCUMENT_ID_FIELDS:
+            action["_id"] = document.get(DOCUMENT_ID_FIELDS[index])
+            op_type = "create"
+        operations.append({op_type: action})
+        operations.append(document)
+
+    # One refresh parameter per request: use the strictest policy in the batch
+    modes = {_refresh_mode(index) for index, _ in documents}
+    mode = next((m for m in ("immediate", "wait_for") if m in modes), "none")
+    result = await es_client.bulk(operations=operations, refresh=REFRESH_MODES[mode])
+
+    failed = []
+    for item in result["items"]:
+        item = next(iter(item.values()))
+        if item.get("error"):
+            failed.append(item)
+        else:
+            _note_write(item["_index"], item["_id"], mode)
+    return {"indexed": len(documents) - len(failed), "failed": failed}
+
+
+async def update_document(index: str, ticket_id: str, updates: dict) -> dict:
+    mode = _refresh_mode(index)
+
+    for _ in range(UPDATE_MAX_RETRIES):
+        try:
+            current = await es_client.get(index=index, id=ticket_id)
+        except NotFoundError:
+            return {"error": f"Document {ticket_id} not found"}
+
+        old_data = current["_source"]
+        try:
+            await es_client.update(
+                index=index,
+                id=ticket_id,
+                doc=updates,
+                if_seq_no=current["_seq_no"],
+                if_primary_term=current["_primary_term"],
+                refresh=REFRESH_MODES[mode],
+            )
+        except ConflictError:
+            # Someone else updated the document since our GET; re-read and retry
+            continue
+
+        _note_write(index, ticket_id, mode)
+        return {
+            "ticket_id": ticket_id,
+            "action": "updated",
+            "changes": updates,
+            "previous": {k: old_data.get(k) for k in updates.keys()}
+        }
+
+    return {"error": f"Document {ticket_id} was modified concurrently, gave up after {UPDATE_MAX_RETRIES} attempts"}
+
+
+async def get_index_counts() -> dict:
+    return await _cached_stats("index_counts", _compute_index_counts)
+
+
+async def _compute_index_counts() -> dict:
+    indices = STATS_INDICES["index_counts"]
+    counts = await asyncio.gather(*(es_client.count(index=index) for index in indices))
+    return {index: count["count"] for index, count in zip(indices, counts)}
+
+
+async def get_cluster_info() -> dict:
+    return await es_client.info()
+
+
+def get_consistency_stats() -> dict:
+    stats = {}
+    for index, counts in _consistency_stats.items():
+        stats[index] = {
+            "policy": _refresh_mode(index),
+            **counts,
+            "ryw_ratio": round(counts["ryw_reads"] / counts["reads"], 4) if counts["reads"] else 0.0,
+        }
+    return {"refresh_interval_ms": ES_REFRESH_INTERVAL_MS, "indices": stats}
+
+
+def get_stats_cache_info() -> dict:
+    now = time.monotonic()
+    return {
+        **_stats_cache_counters,
+        "ttl_seconds": STATS_CACHE_TTL_SECONDS,
+        "generations": dict(_generations),
+        "entries": {
+            name: {
+                "fresh": stats_cached(name),
+                "expires_in_s": round(max(entry["expires_at"] - now, 0), 1),
+            }
+            for name, entry in _stats_cache.items()
+        },
+    }
@@ -0,0 +1,168 @@
+"""
+LRU + TTL cache in front of intent extraction.
+Transcripts are normalized (case, punctuation, filler words, spoken numbers)
+so repeated voice commands reuse the deterministic temperature-0 result.
+An optional near-duplicate tier matches on word/bigram shingle Jaccard similarity.
+"""
+
+import copy
+import re
+import time
+from collections import OrderedDict
+from app.config import (
+    INTENT_CACHE_MAX_ENTRIES,
+    INTENT_CACHE_TTL_SECONDS,
+    INTENT_CACHE_NEAR_DUPLICATES,
+    INTENT_CACHE_SIMILARITY,
+)
+
+FILLER_WORDS = {
+    "um", "uh", "umm", "uhh", "er", "ah", "hmm", "like", "please", "hey", "okay",
+    "ok", "so", "just", "actually", "basically", "could", "can", "would", "you",
+    "go", "ahead", "and", "the", "a", "an", "dash", "hyphen", "number",
+}
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30,
+    "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+
+# Entities that name what a command acts on; a near-duplicate must mention them too
+IDENTIFYING_ENTITIES = ("ticket_id", "assignee", "channel")
+
+# Normalized key -> (stored_at, intent_data, shingles, identifiers), least recently used first
+_entries: OrderedDict = OrderedDict()
+_stats = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+
+def _extends(value: int, n: int) -> bool:
+    """Whether number word n continues value ("twenty" + "three", "one hundred" + "five")."""
+    if value >= 100 and value % 100 == 0:
+        return n < 100
+    return value >= 20 and value % 10 == 0 and n < 10
+
+
+def merge_numbers(tokens: list) -> list:
+    """Turn spoken numbers into digits: "one hundred twenty three" -> "123"."""
+    merged = []
+    value = None
+    for token in tokens:
+        if token == "hundred" and value is not None:
+            value *= 100
+            continue
+        if token in NUMBER_WORDS:
+            n = NUMBER_WORDS[token]
+            if value is not None and _extends(value, n):
+                value += n
+                continue
+            if value is not None:
+                merged.append(str(value))
+            value = n
+            continue
+        if value is not None:
+            merged.append(str(value))
+            value = None
+        merged.append(token)
+    if value is not None:
+        merged.append(str(value))
+    return merged
+
+
+def normalize(transcript: str) -> str:
+    tokens = re.findall(r"[a-z0-9]+", transcript.lower())
+    # Numbers are kept verbatim: "AUTH-012" and "AUTH-12" are different tickets
+    tokens = merge_numbers(tokens)
+    return " ".join(t for t in tokens if t not in FILLER_WORDS)
+
+
+def _shingles(key: str) -> set:
+    tokens = key.split()
+    return set(tokens) | {" ".join(pair) for pair in zip(tokens, tokens[1:])}
+
+
+def _identifiers(key: str) -> frozenset:
+    """Numbers and the word before each one ("auth 12"), i.e. ticket references and counts."""
+    tokens = key.split()
+    numbered = {f"{a} {b}" for a, b in zip(tokens, tokens[1:]) if b.isdigit()}
+    return frozenset({t for t in tokens if t.isdigit()} | numbered)
+
+
+def _mentions_entities(key: str, intent_data: dict) -> bool:
+    """Whether key mentions every identifying entity extracted for a cached command."""
+    tokens = set(key.split())
+    entities = intent_data.get("entities") or {}
+    for name in IDENTIFYING_ENTITIES:
+        value = entities.get(name)
+        if value and not tokens & set(re.findall(r"[a-z0-9]+", str(value).lower())):
+            return False
+    return True
+
+
+def _expired(stored_at: float) -> bool:
+    return time.monotonic() - stored_at > INTENT_CACHE_TTL_SECONDS
+
+
+def get(transcript: str) -> dict | None:
+    key = normalize(transcript)
+    entry = _entries.get(key)
+    if entry is not None:
+        if _expired(entry[0]):
+            del _entries[key]
+            _stats["expirations"] += 1
+        else:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return copy.deepcopy(entry[1])
+
+    if INTENT_CACHE_NEAR_DUPLICATES:
+        match = _near_duplicate(key)
+        if match is not None:
+            _entries.move_to_end(match)
+            _stats["near_hits"] += 1
+            return copy.deepcopy(_entries[match][1])
+
+    _stats["misses"] += 1
+    return None
+
+
+def _near_duplicate(key: str) -> str | None:
+    shingles, identifiers = _shingles(key), _identifiers(key)
+    if not shingles:
+        return None
+
+    best, best_score = None, INTENT_CACHE_SIMILARITY
+    for other, (stored_at, intent_data, other_shingles, other_identifiers) in _entries.items():
+        # Never conflate commands that differ in tickets, counts, assignees or channels,
+        # since the cached entities would be returned verbatim
+        if other_identifiers != identifiers or _expired(stored_at):
+            continue
+        if not _mentions_entities(key, intent_data):
+            continue
+        score = len(shingles & other_shingles) / len(shingles | other_shingles)
+        if score >= best_score:
+            best, best_score = other, score
+    return best
+
+
+def put(transcript: str, intent_data: dict):
+    key = normalize(transcript)
+    _entries[key] = (time.monotonic(), copy.deepcopy(intent_data), _shingles(key), _identifiers(key))
+    _entries.move_to_end(key)
+    while len(_entries) > INTENT_CACHE_MAX_ENTRIES:
+        _entries.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def get_stats() -> dict:
+    lookups = _stats["hits"] + _stats["near_hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "entries": len(_entries),
+        "max_entries": INTENT_CACHE_MAX_ENTRIES,
+        "ttl_seconds": INTENT_CACHE_TTL_SECONDS,
+        "near_duplicates": INTENT_CACHE_NEAR_DUPLICATES,
+        "hit_rate": round((_stats["hits"] + _stats["near_hits"]) / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,338 @@
+"""
+Local fast-path intent classifier.
+A multinomial Naive Bayes model trained at import time on example commands,
+plus regex/keyword entity extraction built from the project and team tables.
+Returns extract_intent-compatible output with a confidence score so the LLM
+is only called for commands the local model is unsure about.
+"""
+
+import math
+import re
+from collections import Counter
+from app.config import JIRA_PROJECT_KEY, INTENT_LOCAL_THRESHOLD
+from app.services.action_service import PROJECT_PREFIXES, KNOWN_TEAMS
+from app.services.intent_cache import merge_numbers
+
+TRAINING_EXAMPLES = {
+    "create_ticket": [
+        "create a ticket for the login page crashing",
+        "open a new ticket about database timeouts",
+        "file a bug for the dashboard not loading",
+        "log an issue with password reset emails",
+        "make a ticket for oauth token refresh failing",
+        "raise a critical ticket for the checkout outage",
+        "new ticket users cannot sign in",
+        "report a bug in the browser ui",
+        "create a high priority issue for slow queries",
+        "add a ticket to fix the broken dashboard chart",
+    ],
+    "update_ticket": [
+        "update AUTH-12 priority to high",
+        "change the priority of VO-5 to critical",
+        "assign CORE-3 to maria",
+        "set FE-7 to in progress",
+        "move AUTH-4 to in progress",
+        "reassign VO-9 to alex",
+        "mark FE-2 as high priority",
+        "add label regression to AUTH-8",
+        "change the summary of CORE-1",
+        "bump VO-3 to urgent",
+        "reopen AUTH-4",
+        "reopen FE-3 the bug is back",
+    ],
+    "close_ticket": [
+        "close AUTH-12",
+        "resolve VO-5",
+        "mark FE-7 as done",
+        "close ticket CORE-3 it is fixed",
+        "AUTH-4 is resolved close it",
+        "close out VO-9",
+        "mark VO-2 resolved",
+        "we fixed FE-1 please close it",
+        "complete ticket AUTH-6",
+        "close CORE-2 as done",
+    ],
+    "find_similar": [
+        "find tickets similar to the login timeout",
+        "are there any similar issues about password reset",
+        "search for duplicates of the dashboard bug",
+        "have we seen this database error before",
+        "look for related tickets about oauth",
+        "find similar problems with checkout",
+        "any existing tickets about slow queries",
+        "check for duplicate tickets on browser crashes",
+        "search past issues like this one",
+        "show me tickets related to sso",
+    ],
+    "notify_slack": [
+        "notify the frontend team about the outage",
+        "send a slack message to #incidents",
+        "tell the auth team login is down",
+        "post in #general that deploy is done",
+        "ping the platform channel about the database migration",
+        "alert #oncall about the checkout failure",
+        "message the backend team that the fix is live",
+        "let the frontend channel know the dashboard is fixed",
+        "slack #devops the build is broken",
+        "notify everyone in #announcements about maintenance",
+    ],
+    "query_status": [
+        "what is the status of AUTH-12",
+        "how many open tickets do we have",
+        "show me critical tickets",
+        "what is going on with VO-5",
+        "list open bugs for frontend",
+        "give me a summary of tickets by priority",
+        "who is working on CORE-3",
+        "how many tickets are in progress",
+        "status report for the auth team",
+        "which tickets are unassigned",
+    ],
+    "run_workflow": [
+        "run the incident workflow for the checkout outage",
+        "start the release workflow",
+        "kick off the on-call escalation",
+        "trigger the deployment checklist",
+        "run the postmortem workflow for yesterday's outage",
+        "execute the onboarding workflow for alex",
+        "start incident response for the database outage",
+        "run the weekly triage workflow",
+        "kick off the rollback procedure",
+        "launch the security incident playbook",
+    ],
+}
+
+# Entities an intent cannot do without; missing ones halve the confidence
+REQUIRED_ENTITIES = {
+    "update_ticket": ["ticket_id"],
+    "close_ticket": ["ticket_id"],
+    "notify_slack": ["channel"],
+    "create_ticket": ["description"],
+}
+
+# Command verbs and the intents they can start; the first one in a command
+# must agree with the predicted intent before the LLM is skipped
+VERB_INTENTS = {
+    **dict.fromkeys(["create", "file", "log", "make", "raise", "report"], {"create_ticket"}),
+    "open": {"create_ticket"},
+    "add": {"create_ticket", "update_ticket"},
+    **dict.fromkeys(["update", "change", "assign", "reassign", "set", "move", "bump", "reopen"], {"update_ticket"}),
+    "mark": {"update_ticket", "close_ticket"},
+    **dict.fromkeys(["close", "resolve", "complete"], {"close_ticket"}),
+    **dict.fromkeys(["find", "search", "look", "check", "any", "have", "are"], {"find_similar"}),
+    "show": {"find_similar", "query_status"},
+    **dict.fromkeys(["notify", "send", "tell", "post", "ping", "alert", "message", "let", "slack"], {"notify_slack"}),
+    **dict.fromkeys(["what", "how", "list", "give", "who", "which", "status"], {"query_status"}),
+    **dict.fromkeys(["run", "start", "kick", "trigger", "execute", "launch"], {"run_workflow"}),
+}
+
+TICKET_PREFIXES = set(PROJECT_PREFIXES.values()) | {JIRA_PROJECT_KEY}
+TICKET_ID_RE = re.compile(
+    r"\b(?:(?-i:([A-Z][A-Z0-9]{1,9}))-(\d+)|(" + "|".join(sorted(TICKET_PREFIXES)) + r")[-\s]?(\d+))\b",
+    re.IGNORECASE,
+)
+CHANNEL_RE = re.compile(r"#([\w-]+)")
+TEAM_CHANNEL_RE = re.compile(r"\b(?:the\s+)?([a-z][\w-]*)\s+(?:team|channel)\b", re.IGNORECASE)
+# Words that can precede "team"/"channel" without naming one ("the team channel")
+GENERIC_CHANNEL_WORDS = {"team", "channel", "our", "my", "your", "their", "this", "that", "whole", "slack", "same"}
+
+PRIORITY_WORDS = {
+    "critical": "critical", "urgent": "critical", "sev1": "critical", "p0": "critical", "blocker": "critical",
+    "high": "high", "p1": "high", "important": "high",
+    "medium": "medium", "normal": "medium", "p2": "medium",
+    "low": "low", "minor": "low", "p3": "low", "trivial": "low",
+}
+
+STATUS_PHRASES = [
+    (re.compile(r"\bin[\s-]progress\b|\bstart(ed)? working\b", re.IGNORECASE), "in_progress"),
+    (re.compile(r"\bre-?open\b", re.IGNORECASE), "open"),
+    (re.compile(r"\bresolved?\b|\bfixed\b|\bdone\b", re.IGNORECASE), "resolved"),
+    (re.compile(r"\bclosed?\b", re.IGNORECASE), "closed"),
+]
+
+COMMAND_PREFIX_RE = re.compile(
+    r"^\s*(?:please\s+)?(?:(?:create|open|file|log|make|raise|add|report)\s+"
+    r"(?:a\s+|an\s+)?(?:new\s+)?(?:\w+\s+priority\s+|critical\s+|urgent\s+)?"
+    r"(?:ticket|bug|issue|incident)\s+(?:for|about|on|with|regarding|that)?\s*)",
+    re.IGNORECASE,
+)
+
+STOPWORDS = {"a", "an", "the", "to", "of", "for", "is", "it", "in", "on", "and", "that", "this", "we", "please"}
+
+_stats = {"local": 0, "fallback": 0, "disagreed": 0}
+
+
+def _features(text: str) -> list:
+    text = TICKET_ID_RE.sub(" ticketref ", text)
+    text = CHANNEL_RE.sub(" channelref ", text)
+    # Second pass catches spoken IDs once number words are digits
+    text = " ".join(merge_numbers(re.findall(r"[a-z0-9]+", text.lower())))
+    text = TICKET_ID_RE.sub(" ticketref ", text)
+    tokens = [t for t in re.findall(r"[a-z]+", text) if t not in STOPWORDS]
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _train(examples: dict) -> tuple:
+    priors, likelihoods, vocabulary = {}, {}, set()
+    counts = {intent: Counter() for intent in examples}
+    for intent, texts in examples.items():
+        for text in texts:
+            counts[intent].update(_features(text))
+        vocabulary |= set(counts[intent])
+
+    total_docs = sum(len(texts) for texts in examples.values())
+    for intent, texts in examples.items():
+        priors[intent] = math.log(len(texts) / total_docs)
+        total = sum(counts[intent].values()) + len(vocabulary)
+        likelihoods[intent] = {
+            token: math.log((counts[intent][token] + 1) / total) for token in vocabulary
+        }
+    return priors, likelihoods, vocabulary
+
+
+_priors, _likelihoods, _vocabulary = _train(TRAINING_EXAMPLES)
+
+
+def _predict(text: str) -> tuple[str, float]:
+    features = [f for f in _features(text) if f in _vocabulary]
+    scores = {
+        intent: _priors[intent] + sum(_likelihoods[intent][f] for f in features)
+        for intent in _priors
+    }
+    best = max(scores, key=scores.get)
+    # Softmax over log scores gives the posterior of the winning intent
+    norm = sum(math.exp(score - scores[best]) for score in scores.values())
+    posterior = 1 / norm if features else 0.0
+    return best, posterior
+
+
+def _ticket_id(transcript: str) -> str | None:
+    match = TICKET_ID_RE.search(transcript)
+    if not match:
+        # Spoken IDs: "close auth twelve" -> "close auth 12"
+        spoken = " ".join(merge_numbers(re.findall(r"[a-z0-9]+", transcript.lower())))
+        match = TICKET_ID_RE.search(spoken)
+    if not match:
+        return None
+    prefix = match.group(1) or match.group(3)
+    number = match.group(2) or match.group(4)
+    return f"{prefix.upper()}-{number}"
+
+
+def _priority(words: list) -> str | None:
+    for word in words:
+        if word in PRIORITY_WORDS:
+            return PRIORITY_WORDS[word]
+    return None
+
+
+def _project(words: list, ticket_id: str | None) -> str | None:
+    if ticket_id:
+        prefix = ticket_id.split("-")[0]
+        for project, project_prefix in PROJECT_PREFIXES.items():
+            if project_prefix == prefix:
+                return project
+    for project, team in KNOWN_TEAMS.items():
+        names = {project.lower(), *project.lower().split("-")}
+        if names & set(words) or any(k.lower() in words for k in team["keywords"]):
+            return project
+    return None
+
+
+def _assignee(words: list) -> str | None:
+    for team in KNOWN_TEAMS.values():
+        for person in team["people"]:
+            if person in words or person.split(".")[0] in words:
+                return person
+    return None
+
+
+def _channel(transcript: str) -> str | None:
+    match = CHANNEL_RE.search(transcript)
+    if match:
+        return match.group(1).lower()
+    for match in TEAM_CHANNEL_RE.finditer(transcript):
+        if match.group(1).lower() not in GENERIC_CHANNEL_WORDS:
+            return match.group(1).lower()
+    return None
+
+
+def _new_status(transcript: str, intent: str) -> str | None:
+    if intent == "close_ticket":
+        return "closed"
+    if intent != "update_ticket":
+        return None
+    for pattern, status in STATUS_PHRASES:
+        if pattern.search(transcript):
+            return status
+    return None
+
+
+def classify(transcript: str) -> dict:
+    """Classify a command locally; "confidence" is in [0, 1]."""
+    intent, confidence = _predict(transcript)
+    words = re.findall(r"[a-z0-9.]+", transcript.lower())
+    ticket_id = _ticket_id(transcript)
+
+    entities = {
+        "project": _project(words, ticket_id),
+        "description": COMMAND_PREFIX_RE.sub("", transcript).strip(" .!?") or transcript.strip(),
+        "priority": _priority(words),
+        "assignee": _assignee(words),
+        "channel": _channel(transcript) if intent == "notify_slack" else None,
+        "ticket_id": ticket_id,
+        "new_status": _new_status(transcript, intent),
+    }
+
+    for name in REQUIRED_ENTITIES.get(intent, []):
+        if not entities[name]:
+            confidence *= 0.5
+
+    return {
+        "intent": intent,
+        "entities": entities,
+        "confidence": round(confidence, 4),
+        "source": "local",
+    }
+
+
+def _agrees(transcript: str, result: dict) -> bool:
+    """Check the prediction against the command verb and the ticket ID.
+
+    The model is trained on few examples and can be confidently wrong when a
+    command mentions another intent's words ("create a ticket to close
+    AUTH-5"), so the first command verb must allow the predicted intent, and
+    a ticket ID must be present exactly when the intent acts on a ticket.
+    """
+    intent = result["intent"]
+    verb = next((VERB_INTENTS[w] for w in re.findall(r"[a-z]+", transcript.lower()) if w in VERB_INTENTS), None)
+    if verb is None or intent not in verb:
+        return False
+    has_ticket = bool(result["entities"]["ticket_id"])
+    if intent in ("update_ticket", "close_ticket"):
+        return has_ticket
+    if intent == "create_ticket":
+        return not has_ticket
+    return True
+
+
+def try_classify(transcript: str) -> dict | None:
+    """Return the local result if it clears INTENT_LOCAL_THRESHOLD and agrees
+    with the command's verb and ticket ID, else None."""
+    result = classify(transcript)
+    if result["confidence"] >= INTENT_LOCAL_THRESHOLD:
+        if _agrees(transcript, result):
+            _stats["local"] += 1
+            return result
+        _stats["disagreed"] += 1
+    _stats["fallback"] += 1
+    return None
+
+
+def get_stats() -> dict:
+    total = _stats["local"] + _stats["fallback"]
+    return {
+        **_stats,
+        "threshold": INTENT_LOCAL_THRESHOLD,
+        "local_rate": round(_stats["local"] / total, 4) if total else 0.0,
+    }
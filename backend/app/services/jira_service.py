@@ -1,11 +1,32 @@
-import requests
-from requests.auth import HTTPBasicAuth
-from app.config import JIRA_DOMAIN, JIRA_EMAIL, JIRA_API_TOKEN, JIRA_PROJECT_KEY
+import asyncio
+import importlib.util
+import time
+from collections import OrderedDict
+import httpx
+from app.config import (
+    JIRA_DOMAIN,
+    JIRA_EMAIL,
+    JIRA_API_TOKEN,
+    JIRA_PROJECT_KEY,
+    JIRA_MAX_CONNECTIONS,
+    JIRA_MAX_KEEPALIVE_CONNECTIONS,
+    JIRA_KEEPALIVE_EXPIRY_SECONDS,
+    JIRA_TIMEOUT_SECONDS,
+    JIRA_CONNECT_TIMEOUT_SECONDS,
+    JIRA_METADATA_TTL_SECONDS,
+    JIRA_USER_NEGATIVE_TTL_SECONDS,
+    JIRA_REFRESH_AHEAD_RATIO,
+)
+
+# httpx only speaks HTTP/2 when the h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 BASE_URL = f"https://{JIRA_DOMAIN}/rest/api/3"
-AUTH = HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
 HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
 
+# Jira accepts at most 50 issues per /issue/bulk request
+BULK_CREATE_MAX_ISSUES = 50
+
 PRIORITY_MAP = {
     "critical": "Highest",
     "high": "High",
@@ -13,83 +34,203 @@ PRIORITY_MAP = {
     "low": "Low",
 }
 
-# Cache for issue types (avoid repeated API calls)
-_issue_type_cache = None
+# Metadata cache: (kind, *key) -> (fetched_at, ttl, value). Kinds are
+# issue_type, priorities, transitions (by issue type + status) and users
+METADATA_KINDS = ("issue_type", "priorities", "transitions", "users")
+_metadata: dict = {}
+_metadata_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "refreshes": 0, "invalidations": 0}
+# In-flight refresh-ahead tasks by cache key
+_refreshing: dict = {}
+
+# Issue key -> (issue type, status) learned from Jira responses, used to
+# find cached transitions without asking Jira for the issue's state
+_issue_states: OrderedDict = OrderedDict()
+_ISSUE_STATES_MAX = 1000
+
+# Shared keep-alive client, created on first use inside the running event loop
+_client: httpx.AsyncClient | None = None
 
 
 def is_configured() -> bool:
     return bool(JIRA_DOMAIN and JIRA_EMAIL and JIRA_API_TOKEN)
 
 
-def _get_default_issue_type() -> str | None:
-    """Get the first valid issue type for the project (excluding subtasks)."""
-    global _issue_type_cache
-    
-    if _issue_type_cache:
-        return _issue_type_cache
-    
-    try:
-        response = requests.get(
-            f"{BASE_URL}/project/{JIRA_PROJECT_KEY}",
-            auth=AUTH,
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            auth=(JIRA_EMAIL, JIRA_API_TOKEN),
             headers=HEADERS,
-            timeout=10,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=JIRA_MAX_CONNECTIONS,
+                max_keepalive_connections=JIRA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=JIRA_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(JIRA_TIMEOUT_SECONDS, connect=JIRA_CONNECT_TIMEOUT_SECONDS),
         )
-        response.raise_for_status()
-        project = response.json()
-        
-        # Prefer these types in order
-        preferred_types = ["Task", "Story", "Bug", "Issue"]
-        available_types = [it["name"] for it in project.get("issueTypes", []) if not it.get("subtask")]
-        
-        # Return first matching preferred type
-        for pref in preferred_types:
-            if pref in available_types:
-                _issue_type_cache = pref
-                return pref
-        
-        # Otherwise return first available non-subtask type
-        if available_types:
-            _issue_type_cache = available_types[0]
-            return available_types[0]
-            
+    return _client
+
+
+async def close():
+    global _client
+    for task in list(_refreshing.values()):
+        task.cancel()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _lookup(key: tuple, refresh=None) -> tuple[bool, object]:
+    """Return (hit, value) for a fresh entry.
+
+    Once an entry is past JIRA_REFRESH_AHEAD_RATIO of its TTL, refresh (a
+    coroutine function) is started in the background so hot keys are
+    reloaded before they expire instead of on a request's critical path.
+    """
+    entry = _metadata.get(key)
+    if entry is None:
+        return False, None
+    fetched_at, ttl, value = entry
+    age = time.monotonic() - fetched_at
+    if age >= ttl:
+        del _metadata[key]
+        return False, None
+    if refresh is not None and age >= ttl * JIRA_REFRESH_AHEAD_RATIO and key not in _refreshing:
+        _refreshing[key] = asyncio.create_task(_refresh_ahead(key, refresh))
+    return True, value
+
+
+async def _refresh_ahead(key: tuple, refresh):
+    try:
+        await refresh()
+        _metadata_stats["refreshes"] += 1
+    except Exception:
+        pass  # The entry just expires and is fetched on demand
+    finally:
+        _refreshing.pop(key, None)
+
+
+def _store(key: tuple, value, ttl: float = JIRA_METADATA_TTL_SECONDS):
+    _metadata[key] = (time.monotonic(), ttl, value)
+    return value
+
+
+async def _cached(key: tuple, fetch, negative_ttl: float | None = None):
+    """Serve key from the metadata cache, loading it with fetch() on a miss.
+
+    A None result is cached for negative_ttl when given; errors are not cached.
+    """
+    async def load():
+        value = await fetch()
+        if value is None and negative_ttl is not None:
+            return _store(key, value, negative_ttl)
+        return _store(key, value)
+
+    hit, value = _lookup(key, load)
+    if hit:
+        _metadata_stats["negative_hits" if value is None else "hits"] += 1
+        return value
+    _metadata_stats["misses"] += 1
+    return await load()
+
+
+def _learn_state(issue_key: str, fields: dict) -> tuple | None:
+    issue_type = (fields.get("issuetype") or {}).get("name")
+    status = (fields.get("status") or {}).get("name")
+    if not (issue_type and status):
         return None
+    _issue_states[issue_key] = (issue_type, status)
+    _issue_states.move_to_end(issue_key)
+    while len(_issue_states) > _ISSUE_STATES_MAX:
+        _issue_states.popitem(last=False)
+    return issue_type, status
+
+
+def invalidate_metadata(kind: str | None = None) -> dict:
+    """Drop cached metadata of one kind (or everything when kind is None)."""
+    keys = [key for key in _metadata if kind is None or key[0] == kind]
+    for key in keys:
+        del _metadata[key]
+    states = 0
+    if kind in (None, "transitions"):
+        states = len(_issue_states)
+        _issue_states.clear()
+    _metadata_stats["invalidations"] += 1
+    return {"kind": kind or "all", "entries_removed": len(keys), "issue_states_removed": states}
+
+
+def get_metadata_stats() -> dict:
+    lookups = _metadata_stats["hits"] + _metadata_stats["negative_hits"] + _metadata_stats["misses"]
+    return {
+        **_metadata_stats,
+        "entries": {kind: sum(1 for key in _metadata if key[0] == kind) for kind in METADATA_KINDS},
+        "issue_states": len(_issue_states),
+        "refreshing": len(_refreshing),
+        "ttl_seconds": JIRA_METADATA_TTL_SECONDS,
+        "negative_ttl_seconds": JIRA_USER_NEGATIVE_TTL_SECONDS,
+        "hit_rate": round((lookups - _metadata_stats["misses"]) / lookups, 4) if lookups else 0.0,
+    }
+
+
+async def _fetch_issue_type() -> str | None:
+    response = await _get_client().get(f"/project/{JIRA_PROJECT_KEY}")
+    response.raise_for_status()
+    project = response.json()
+
+    # Prefer these types in order
+    preferred_types = ["Task", "Story", "Bug", "Issue"]
+    available_types = [it["name"] for it in project.get("issueTypes", []) if not it.get("subtask")]
+
+    # Return first matching preferred type
+    for pref in preferred_types:
+        if pref in available_types:
+            return pref
+
+    # Otherwise return first available non-subtask type
+    if available_types:
+        return available_types[0]
+
+    return None
+
+
+async def _get_default_issue_type() -> str | None:
+    """Get the first valid issue type for the project (excluding subtasks)."""
+    try:
+        return await _cached(("issue_type",), _fetch_issue_type)
     except Exception:
         return "Task"  # Fallback
 
 
-def _priority_exists(priority_name: str) -> bool:
+async def _fetch_priorities() -> set:
+    response = await _get_client().get("/priority")
+    response.raise_for_status()
+    return {p["name"] for p in response.json()}
+
+
+async def _priority_exists(priority_name: str) -> bool:
     """Check if a priority exists in this Jira instance."""
     try:
-        response = requests.get(
-            f"{BASE_URL}/priority",
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
-        )
-        response.raise_for_status()
-        priorities = response.json()
-        return any(p["name"] == priority_name for p in priorities)
+        return priority_name in await _cached(("priorities",), _fetch_priorities)
     except Exception:
         return False
 
 
-def create_issue(
+async def _issue_payload(
     summary: str,
     description: str,
     priority: str = "medium",
     labels: list = None,
     assignee_email: str = None,
     issue_type: str = None,
-) -> dict:
-    if not is_configured():
-        return {"status": "skipped", "reason": "Jira not configured"}
-
+) -> tuple[dict | None, str | None]:
+    """Build the create payload; returns (None, None) when no issue type is usable."""
     # Get valid issue type for this project
-    valid_issue_type = issue_type or _get_default_issue_type()
-    
+    valid_issue_type = issue_type or await _get_default_issue_type()
+
     if not valid_issue_type:
-        return {"status": "failed", "error": "Could not determine valid issue type for project"}
+        return None, None
 
     payload = {
         "fields": {
@@ -109,37 +250,56 @@ def create_issue(
 
     # Only add priority if valid
     jira_priority = PRIORITY_MAP.get(priority, "Medium")
-    if _priority_exists(jira_priority):
+    if await _priority_exists(jira_priority):
         payload["fields"]["priority"] = {"name": jira_priority}
 
     if labels:
         payload["fields"]["labels"] = labels
 
     if assignee_email:
-        account_id = _find_user(assignee_email)
+        account_id = await _find_user(assignee_email)
         if account_id:
             payload["fields"]["assignee"] = {"accountId": account_id}
 
+    return payload, valid_issue_type
+
+
+def _created(data: dict, summary: str, issue_type: str) -> dict:
+    return {
+        "status": "created",
+        "jira_key": data["key"],
+        "jira_id": data["id"],
+        "jira_url": f"https://{JIRA_DOMAIN}/browse/{data['key']}",
+        "summary": summary,
+        "issue_type": issue_type,
+    }
+
+
+async def create_issue(
+    summary: str,
+    description: str,
+    priority: str = "medium",
+    labels: list = None,
+    assignee_email: str = None,
+    issue_type: str = None,
+) -> dict:
+    if not is_configured():
+        return {"status": "skipped", "reason": "Jira not configured"}
+
+    payload, valid_issue_type = await _issue_payload(
+        summary, description, priority, labels, assignee_email, issue_type
+    )
+    if not payload:
+        return {"status": "failed", "error": "Could not determine valid issue type for project"}
+
     try:
-        response = requests.post(
-            f"{BASE_URL}/issue",
+        response = await _get_client().post(
+            "/issue",
             json=payload,
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
         )
         response.raise_for_status()
-        data = response.json()
-
-        return {
-            "status": "created",
-            "jira_key": data["key"],
-            "jira_id": data["id"],
-            "jira_url": f"https://{JIRA_DOMAIN}/browse/{data['key']}",
-            "summary": summary,
-            "issue_type": valid_issue_type,
-        }
-    except requests.exceptions.HTTPError as e:
+        return _created(response.json(), summary, valid_issue_type)
+    except httpx.HTTPStatusError as e:
         error_detail = ""
         try:
             error_detail = e.response.json()
@@ -150,20 +310,79 @@ def create_issue(
         return {"status": "error", "error": str(e)}
 
 
-def update_issue(issue_key: str, updates: dict) -> dict:
+async def create_issues(issues: list) -> list:
+    """Create several issues via /issue/bulk, BULK_CREATE_MAX_ISSUES per request.
+
+    issues are create_issue keyword dicts. Returns one create_issue-shaped
+    result per issue, in the same order; failures are reported per issue.
+    """
+    if not is_configured():
+        return [{"status": "skipped", "reason": "Jira not configured"} for _ in issues]
+
+    # Warm the shared metadata once instead of once per concurrent payload
+    await _get_default_issue_type()
+    await _priority_exists(PRIORITY_MAP["medium"])
+    prepared = await asyncio.gather(*(_issue_payload(**issue) for issue in issues))
+
+    results = [None] * len(issues)
+    pending = []
+    for position, (payload, _) in enumerate(prepared):
+        if payload:
+            pending.append(position)
+        else:
+            results[position] = {"status": "failed", "error": "Could not determine valid issue type for project"}
+
+    for start in range(0, len(pending), BULK_CREATE_MAX_ISSUES):
+        chunk = pending[start:start + BULK_CREATE_MAX_ISSUES]
+        try:
+            response = await _get_client().post(
+                "/issue/bulk",
+                json={"issueUpdates": [prepared[position][0] for position in chunk]},
+            )
+            data = response.json()
+        except Exception as e:
+            for position in chunk:
+                results[position] = {"status": "error", "error": str(e)}
+            continue
+
+        # 201 when everything was created; 400 can still carry created issues
+        # next to per-element errors, so only other statuses fail the whole chunk
+        if response.status_code not in (200, 201, 400):
+            for position in chunk:
+                results[position] = {"status": "failed", "error": str(data)}
+            continue
+
+        errors = {e.get("failedElementNumber"): e for e in data.get("errors", [])}
+        created = iter(data.get("issues", []))
+        for element, position in enumerate(chunk):
+            issue = issues[position]
+            if element in errors:
+                detail = errors[element].get("elementErrors", errors[element])
+                results[position] = {"status": "failed", "error": str(detail)}
+                continue
+            created_issue = next(created, None)
+            if created_issue is None:
+                results[position] = {"status": "failed", "error": str(data)}
+            else:
+                results[position] = _created(created_issue, issue.get("summary", ""), prepared[position][1])
+
+    return results
+
+
+async def update_issue(issue_key: str, updates: dict) -> dict:
     if not is_configured():
         return {"status": "skipped", "reason": "Jira not configured"}
 
     fields = {}
 
     if "status" in updates:
-        transition_result = _transition_issue(issue_key, updates["status"])
+        transition_result = await _transition_issue(issue_key, updates["status"])
         if transition_result.get("status") != "success":
             return transition_result
 
     if "priority" in updates:
         jira_priority = PRIORITY_MAP.get(updates["priority"], "Medium")
-        if _priority_exists(jira_priority):
+        if await _priority_exists(jira_priority):
             fields["priority"] = {"name": jira_priority}
 
     if "summary" in updates:
@@ -174,12 +393,9 @@ def update_issue(issue_key: str, updates: dict) -> dict:
 
     if fields:
         try:
-            response = requests.put(
-                f"{BASE_URL}/issue/{issue_key}",
+            response = await _get_client().put(
+                f"/issue/{issue_key}",
                 json={"fields": fields},
-                auth=AUTH,
-                headers=HEADERS,
-                timeout=10,
             )
             response.raise_for_status()
         except Exception as e:
@@ -193,7 +409,7 @@ def update_issue(issue_key: str, updates: dict) -> dict:
     }
 
 
-def add_comment(issue_key: str, comment: str) -> dict:
+async def add_comment(issue_key: str, comment: str) -> dict:
     if not is_configured():
         return {"status": "skipped", "reason": "Jira not configured"}
 
@@ -209,12 +425,9 @@ def add_comment(issue_key: str, comment: str) -> dict:
     }
 
     try:
-        response = requests.post(
-            f"{BASE_URL}/issue/{issue_key}/comment",
+        response = await _get_client().post(
+            f"/issue/{issue_key}/comment",
             json=payload,
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
         )
         response.raise_for_status()
         return {"status": "commented", "jira_key": issue_key}
@@ -222,20 +435,16 @@ def add_comment(issue_key: str, comment: str) -> dict:
         return {"status": "failed", "error": str(e)}
 
 
-def get_issue(issue_key: str) -> dict:
+async def get_issue(issue_key: str) -> dict:
     if not is_configured():
         return {"status": "skipped", "reason": "Jira not configured"}
 
     try:
-        response = requests.get(
-            f"{BASE_URL}/issue/{issue_key}",
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
-        )
+        response = await _get_client().get(f"/issue/{issue_key}")
         response.raise_for_status()
         data = response.json()
         fields = data["fields"]
+        _learn_state(data["key"], fields)
 
         return {
             "status": "found",
@@ -248,7 +457,7 @@ def get_issue(issue_key: str) -> dict:
             "labels": fields.get("labels", []),
             "jira_url": f"https://{JIRA_DOMAIN}/browse/{data['key']}",
         }
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             return {"status": "not_found", "jira_key": issue_key}
         return {"status": "failed", "error": str(e)}
@@ -256,19 +465,16 @@ def get_issue(issue_key: str) -> dict:
         return {"status": "error", "error": str(e)}
 
 
-def search_issues(query: str, max_results: int = 5) -> dict:
+async def search_issues(query: str, max_results: int = 5) -> dict:
     if not is_configured():
         return {"status": "skipped", "reason": "Jira not configured"}
 
     jql = f'project = {JIRA_PROJECT_KEY} AND text ~ "{query}" ORDER BY created DESC'
 
     try:
-        response = requests.get(
-            f"{BASE_URL}/search",
+        response = await _get_client().get(
+            "/search",
             params={"jql": jql, "maxResults": max_results},
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
         )
         response.raise_for_status()
         data = response.json()
@@ -276,6 +482,7 @@ def search_issues(query: str, max_results: int = 5) -> dict:
         issues = []
         for issue in data.get("issues", []):
             fields = issue["fields"]
+            _learn_state(issue["key"], fields)
             issues.append({
                 "jira_key": issue["key"],
                 "summary": fields.get("summary"),
@@ -289,25 +496,62 @@ def search_issues(query: str, max_results: int = 5) -> dict:
         return {"status": "error", "error": str(e)}
 
 
-def _find_user(email: str) -> str | None:
+async def list_projects() -> list:
+    response = await _get_client().get("/project")
+    response.raise_for_status()
+    return [{"key": p["key"], "name": p["name"], "id": p["id"]} for p in response.json()]
+
+
+async def _fetch_user(email: str) -> str | None:
+    response = await _get_client().get(
+        "/user/search",
+        params={"query": email},
+    )
+    response.raise_for_status()
+    users = response.json()
+    if users:
+        return users[0]["accountId"]
+    return None
+
+
+async def _find_user(email: str) -> str | None:
     try:
-        response = requests.get(
-            f"{BASE_URL}/user/search",
-            params={"query": email},
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
+        return await _cached(
+            ("users", email.lower()), lambda: _fetch_user(email),
+            negative_ttl=JIRA_USER_NEGATIVE_TTL_SECONDS,
         )
-        response.raise_for_status()
-        users = response.json()
-        if users:
-            return users[0]["accountId"]
     except Exception:
-        pass
-    return None
+        return None
 
 
-def _transition_issue(issue_key: str, target_status: str) -> dict:
+async def _fetch_transitions(issue_key: str) -> list:
+    """Fetch the issue's state and available transitions in one request."""
+    response = await _get_client().get(
+        f"/issue/{issue_key}",
+        params={"fields": "issuetype,status", "expand": "transitions"},
+    )
+    response.raise_for_status()
+    data = response.json()
+    transitions = data.get("transitions", [])
+    state = _learn_state(issue_key, data.get("fields", {}))
+    if state:
+        _store(("transitions", *state), transitions)
+    return transitions
+
+
+async def _get_transitions(issue_key: str) -> tuple[list, bool]:
+    """Transitions for the issue and whether they came from the cache."""
+    state = _issue_states.get(issue_key)
+    if state:
+        hit, transitions = _lookup(("transitions", *state), lambda: _fetch_transitions(issue_key))
+        if hit:
+            _metadata_stats["hits"] += 1
+            return transitions, True
+    _metadata_stats["misses"] += 1
+    return await _fetch_transitions(issue_key), False
+
+
+async def _transition_issue(issue_key: str, target_status: str) -> dict:
     status_map = {
         "in_progress": "In Progress",
         "resolved": "Done",
@@ -317,33 +561,40 @@ def _transition_issue(issue_key: str, target_status: str) -> dict:
     target = status_map.get(target_status, target_status)
 
     try:
-        response = requests.get(
-            f"{BASE_URL}/issue/{issue_key}/transitions",
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
-        )
-        response.raise_for_status()
-        transitions = response.json().get("transitions", [])
-
-        transition_id = None
-        for t in transitions:
-            if t["name"].lower() == target.lower() or t["to"]["name"].lower() == target.lower():
-                transition_id = t["id"]
-                break
-
-        if not transition_id:
-            available = [t["name"] for t in transitions]
-            return {"status": "failed", "error": f"No transition to '{target}'. Available: {available}"}
-
-        response = requests.post(
-            f"{BASE_URL}/issue/{issue_key}/transitions",
-            json={"transition": {"id": transition_id}},
-            auth=AUTH,
-            headers=HEADERS,
-            timeout=10,
-        )
-        response.raise_for_status()
+        transitions, cached = await _get_transitions(issue_key)
+        while True:
+            transition = None
+            for t in transitions:
+                if t["name"].lower() == target.lower() or t["to"]["name"].lower() == target.lower():
+                    transition = t
+                    break
+
+            if not transition:
+                if cached:
+                    # The issue may have moved on since its state was learned
+                    _issue_states.pop(issue_key, None)
+                    transitions, cached = await _fetch_transitions(issue_key), False
+                    continue
+                available = [t["name"] for t in transitions]
+                return {"status": "failed", "error": f"No transition to '{target}'. Available: {available}"}
+
+            response = await _get_client().post(
+                f"/issue/{issue_key}/transitions",
+                json={"transition": {"id": transition["id"]}},
+            )
+            if response.status_code in (400, 409) and cached:
+                _issue_states.pop(issue_key, None)
+                transitions, cached = await _fetch_transitions(issue_key), False
+                continue
+            response.raise_for_status()
+            break
+
+        state = _issue_states.get(issue_key)
+        if state:
+            _learn_state(issue_key, {
+                "issuetype": {"name": state[0]},
+                "status": {"name": transition["to"]["name"]},
+            })
         return {"status": "success"}
     except Exception as e:
         return {"status": "failed", "error": str(e)}
@@ -0,0 +1,338 @@
+"""
+Background job queue for plan execution.
+Jobs are persisted in SQLite and claimed atomically by a bounded pool of
+JOB_WORKERS tasks per process, so any worker process can pick up a job and
+a restart resumes whatever was still queued. Running jobs send heartbeats;
+one whose heartbeat goes stale (its process died mid-plan) is marked
+interrupted rather than re-run, since some of its steps may already have
+happened.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from app.config import JOB_QUEUE_ENABLED, JOB_WORKERS, JOB_STORE_PATH, JOB_POLL_SECONDS, JOB_HEARTBEAT_SECONDS, JOB_RETENTION_SECONDS
+
+TERMINAL_STATUSES = ("succeeded", "failed", "interrupted")
+
+# Heartbeats older than this mean the owning process is gone
+_STALE_SECONDS = JOB_HEARTBEAT_SECONDS * 3
+
+# Identifies this process (and this boot of it) as the owner of running jobs
+_owner = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# kind -> async handler(payload, on_step) returning the job result
+_handlers: dict = {}
+
+# job_id -> steps reported so far, for jobs running in this process
+_running: dict = {}
+_workers: list = []
+_supervisor: asyncio.Task | None = None
+# The SQLite store is created by start(), not on import
+_store_ready = False
+_wakeup = asyncio.Event()
+_stopping = False
+# Replaced on every local change so watchers can wait for the next one
+_changed = asyncio.Event()
+
+_stats = {"submitted": 0, "succeeded": 0, "failed": 0, "interrupted": 0, "recovered": 0}
+
+
+def handler(kind: str):
+    """Register the coroutine function that runs jobs of this kind."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    # "with sqlite3.connect()" only commits; the connection is closed here
+    with contextlib.closing(sqlite3.connect(JOB_STORE_PATH, timeout=5)) as db:
+        db.row_factory = sqlite3.Row
+        with db:
+            yield db
+
+
+def _init_store():
+    global _store_ready
+    with _connect() as db:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, command_id TEXT, status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, steps TEXT, result TEXT, error TEXT, owner TEXT, heartbeat REAL, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+    _store_ready = True
+
+
+def _notify():
+    global _changed
+    _changed.set()
+    _changed = asyncio.Event()
+
+
+def _iso(timestamp: float | None) -> str | None:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+def _to_job(row: sqlite3.Row) -> dict:
+    job = {
+        "job_id": row["job_id"],
+        "kind": row["kind"],
+        "command_id": row["command_id"],
+        "status": row["status"],
+        "created_at": _iso(row["created_at"]),
+        "started_at": _iso(row["started_at"]),
+        "finished_at": _iso(row["finished_at"]),
+        "steps": json.loads(row["steps"]) if row["steps"] else [],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+    }
+    if row["job_id"] in _running:
+        # Steps of a job running here are newer in memory than in the store
+        job["steps"] = list(_running[row["job_id"]])
+    return job
+
+
+def _insert(job_id: str, kind: str, command_id: str, payload: str):
+    with _connect() as db:
+        db.execute(
+            "INSERT INTO jobs (job_id, kind, command_id, status, payload, created_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, command_id, payload, time.time()),
+        )
+
+
+def _claim() -> sqlite3.Row | None:
+    # A single UPDATE ... RETURNING, so two processes can never claim the same job
+    now = time.time()
+    with _connect() as db:
+        return db.execute(
+            "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, started_at = ? "
+            "WHERE job_id = (SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+            "AND status = 'queued' RETURNING *",
+            (_owner, now, now),
+        ).fetchone()
+
+
+def _finish(job_id: str, status: str, steps: list, result: dict | None, error: str | None):
+    with _connect() as db:
+        db.execute(
+            "UPDATE jobs SET status = ?, steps = ?, result = ?, error = ?, finished_at = ? "
+            "WHERE job_id = ? AND owner = ?",
+            (status, json.dumps(steps, default=str), json.dumps(result, default=str) if result else None,
+             error, time.time(), job_id, _owner),
+        )
+
+
+def _requeue(job_id: str):
+    with _connect() as db:
+        db.execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, heartbeat = NULL, started_at = NULL "
+            "WHERE job_id = ? AND owner = ?",
+            (job_id, _owner),
+        )
+
+
+def _heartbeat(progress: dict):
+    now = time.time()
+    with _connect() as db:
+        for job_id, steps in progress.items():
+            db.execute(
+                "UPDATE jobs SET heartbeat = ?, steps = ? WHERE job_id = ? AND owner = ? AND status = 'running'",
+                (now, json.dumps(steps, default=str), job_id, _owner),
+            )
+
+
+def _recover() -> int:
+    """Mark running jobs whose owner stopped sending heartbeats as interrupted."""
+    with _connect() as db:
+        return db.execute(
+            "UPDATE jobs SET status = 'interrupted', finished_at = ?, "
+            "error = 'Worker stopped while the job was running; completed steps are listed' "
+            "WHERE status = 'running' AND owner != ? AND heartbeat < ?",
+            (time.time(), _owner, time.time() - _STALE_SECONDS),
+        ).rowcount
+
+
+def _prune() -> int:
+    with _connect() as db:
+        return db.execute(
+            f"DELETE FROM jobs WHERE status IN {TERMINAL_STATUSES} AND finished_at < ?",
+            (time.time() - JOB_RETENTION_SECONDS,),
+        ).rowcount
+
+
+def _get(job_id: str) -> sqlite3.Row | None:
+    with _connect() as db:
+        return db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+
+
+def _counts() -> dict:
+    with _connect() as db:
+        rows = db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+    return {status: count for status, count in rows}
+
+
+async def submit(kind: str, command_id: str, payload: dict) -> str:
+    """Persist a job and return its job_id; a worker picks it up right away."""
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+    if not _store_ready:
+        raise RuntimeError("Job queue is not running (set JOB_QUEUE_ENABLED or BACKGROUND_EXECUTION)")
+    job_id = f"job-{uuid.uuid4().hex[:12]}"
+    await asyncio.to_thread(_insert, job_id, kind, command_id, json.dumps(payload, default=str))
+    _stats["submitted"] += 1
+    _wakeup.set()
+    return job_id
+
+
+async def _run(row: sqlite3.Row):
+    job_id = row["job_id"]
+    steps = _running[job_id] = []
+    _notify()
+
+    def on_step(entry: dict):
+        steps.append(entry)
+        _notify()
+
+    status, result, error = "succeeded", None, None
+    try:
+        result = await _handlers[row["kind"]](json.loads(row["payload"]), on_step)
+    except asyncio.CancelledError:
+        status, error = "interrupted", "Shut down while the job was running; completed steps are listed"
+        raise
+    except Exception as e:
+        status, error = "failed", str(e) or type(e).__name__
+    finally:
+        _stats[status] += 1
+        await asyncio.shield(asyncio.to_thread(_finish, job_id, status, steps, result, error))
+        del _running[job_id]
+        _notify()
+
+
+async def _worker():
+    while not _stopping:
+        # Cleared before claiming, so a submit during the claim is not missed
+        _wakeup.clear()
+        row = await asyncio.to_thread(_claim)
+        if row is not None and _stopping:
+            # Claimed just as shutdown began: hand it back untouched
+            await asyncio.to_thread(_requeue, row["job_id"])
+            return
+        if row is None:
+            try:
+                # Polling also picks up jobs submitted by other processes
+                await asyncio.wait_for(_wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        if row["kind"] not in _handlers:
+            await asyncio.to_thread(_finish, row["job_id"], "failed", [], None, f"Unknown job kind '{row['kind']}'")
+            continue
+        await _run(row)
+
+
+async def _supervise():
+    while True:
+        try:
+            if _running:
+                await asyncio.to_thread(_heartbeat, {job_id: list(steps) for job_id, steps in _running.items()})
+            _stats["recovered"] += await asyncio.to_thread(_recover)
+            await asyncio.to_thread(_prune)
+        except sqlite3.Error:
+            pass  # Retried on the next tick
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
+
+def start():
+    global _supervisor, _stopping
+    if _supervisor is None and JOB_QUEUE_ENABLED:
+        _init_store()
+        _stopping = False
+        _supervisor = asyncio.create_task(_supervise())
+        _workers.extend(asyncio.create_task(_worker()) for _ in range(JOB_WORKERS))
+
+
+async def stop(timeout: float):
+    """Wait up to timeout seconds for running jobs, then interrupt the rest.
+
+    Queued jobs stay queued in the store and run after the next start.
+    """
+    global _supervisor, _stopping
+    if _supervisor is None:
+        return
+
+    _stopping = True
+    deadline = time.monotonic() + timeout
+    while _running and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+    for task in [*_workers, _supervisor]:
+        task.cancel()
+    await asyncio.gather(*_workers, _supervisor, return_exceptions=True)
+    _workers.clear()
+    _supervisor = None
+
+
+async def get_job(job_id: str) -> dict | None:
+    if not _store_ready:
+        return None
+    row = await asyncio.to_thread(_get, job_id)
+    return _to_job(row) if row else None
+
+
+async def watch(job_id: str):
+    """Yield (event, data) pairs as a job progresses.
+
+    Events: status whenever the status changes, step for each finished
+    plan step, then done with the full job once it reaches a terminal
+    status. Jobs running in another process are followed by polling.
+    """
+    status, sent_steps = None, 0
+    while True:
+        changed = _changed
+        job = await get_job(job_id)
+        if job is None:
+            yield "error", {"detail": "Job not found"}
+            return
+
+        if job["status"] != status:
+            status = job["status"]
+            yield "status", {"job_id": job_id, "status": status}
+        for entry in job["steps"][sent_steps:]:
+            yield "step", entry
+        sent_steps = max(sent_steps, len(job["steps"]))
+
+        if status in TERMINAL_STATUSES:
+            yield "done", job
+            return
+
+        try:
+            await asyncio.wait_for(changed.wait(), JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def get_stats() -> dict:
+    if not _store_ready:
+        return {**_stats, "enabled": False, "store_path": JOB_STORE_PATH}
+    counts = await asyncio.to_thread(_counts)
+    return {
+        "enabled": True,
+        **_stats,
+        "jobs": {status: counts.get(status, 0) for status in ("queued", "running", *TERMINAL_STATUSES)},
+        "running_here": len(_running),
+        "workers": len(_workers),
+        "store_path": JOB_STORE_PATH,
+    }
@@ -1,5 +1,11 @@
 import json
-from app.config import llm_client, LLM_MODEL
+import re
+import time
+from app.config import llm_client, LLM_MODEL, INTENT_LOCAL_CLASSIFIER
+from app.services import context_compactor
+from app.services import intent_cache
+from app.services import intent_classifier
+from app.services.action_service import KNOWN_TEAMS
 
 INTENT_SYSTEM_PROMPT = """Extract intent and entities from this voice command.
 
@@ -19,6 +25,22 @@ Return ONLY valid JSON:
     }
 }"""
 
+PLANNING_GUIDE = """For create_ticket params: project, summary, description, priority, assignee, team, labels
+For update_ticket params: ticket_id, updates (object with fields to change)
+For notify_slack params: channel, message
+
+Steps without dependencies run in parallel. If a step needs an earlier step's result,
+reference it in params as {{stepN.field}} (e.g. "{{step1.ticket_id}}" or "{{step1.jira.jira_url}}")
+or list the steps it must wait for in "depends_on": [N].
+
+Known teams:
+""" + "\n".join(
+    f"- {project}: {', '.join(team['keywords'])}. People: {', '.join(team['people'])}"
+    for project, team in KNOWN_TEAMS.items()
+) + """
+
+Always reference evidence from search results. Multiple actions encouraged when appropriate."""
+
 PLANNING_SYSTEM_PROMPT = """You are VoiceOps Agent. Create an action plan that will be executed for real.
 
 Return ONLY valid JSON:
@@ -29,7 +51,8 @@ Return ONLY valid JSON:
             "step": 1,
             "type": "create_ticket | update_ticket | notify_slack",
             "description": "What this step does",
-            "params": {}
+            "params": {},
+            "depends_on": []
         }
     ],
     "explanation": "Human-friendly summary of the entire plan",
@@ -38,16 +61,42 @@ Return ONLY valid JSON:
     "clarification_needed": "Question if ambiguous, or null"
 }
 
-For create_ticket params: project, summary, description, priority, assignee, team, labels
-For update_ticket params: ticket_id, updates (object with fields to change)
-For notify_slack params: channel, message
+""" + PLANNING_GUIDE
 
-Known teams:
-- AUTH-BACKEND: login, auth, OAuth, password. People: sarah.chen, james.wu
-- CORE-PLATFORM: infrastructure, database, platform. People: maria.garcia
-- FRONTEND: UI, browser, dashboard. People: alex.kim
 
-Always reference evidence from search results. Multiple actions encouraged when appropriate."""
+COMBINED_SYSTEM_PROMPT = """You are VoiceOps Agent. Understand this voice command and create an action plan that will be executed for real.
+
+Valid intents: create_ticket, update_ticket, close_ticket, find_similar, notify_slack, query_status, run_workflow
+
+Return ONLY valid JSON:
+{
+    "intent": "one of the intents above",
+    "entities": {
+        "project": "string or null",
+        "description": "string describing the issue",
+        "priority": "critical/high/medium/low or null",
+        "assignee": "string or null",
+        "channel": "slack channel name or null",
+        "ticket_id": "existing ticket ID if mentioned, or null",
+        "new_status": "open/in_progress/resolved/closed or null"
+    },
+    "reasoning": "Why you chose these actions. Reference ticket IDs from search results.",
+    "actions": [
+        {
+            "step": 1,
+            "type": "create_ticket | update_ticket | notify_slack",
+            "description": "What this step does",
+            "params": {},
+            "depends_on": []
+        }
+    ],
+    "explanation": "Human-friendly summary of the entire plan",
+    "confidence": "high/medium/low",
+    "duplicate_warning": "Warning if similar ticket exists, or null",
+    "clarification_needed": "Question if ambiguous, or null"
+}
+
+""" + PLANNING_GUIDE
 
 
 def parse_llm_json(raw: str) -> dict:
@@ -60,35 +109,146 @@ def parse_llm_json(raw: str) -> dict:
     return json.loads(raw)
 
 
-def extract_intent(transcript: str) -> dict:
-    response = llm_client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": INTENT_SYSTEM_PROMPT},
-            {"role": "user", "content": transcript}
-        ],
-        temperature=0,
-    )
-    return parse_llm_json(response.choices[0].message.content)
+class _StringFieldStream:
+    """Incrementally decode one top-level JSON string field from streamed LLM output."""
+
+    ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str):
+        self.pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self.buffer = ""
+        self.pos = None
+        self.done = False
+
+    def feed(self, text: str) -> str:
+        """Add raw output; return any newly decoded characters of the field."""
+        self.buffer += text
+        if self.done:
+            return ""
+        if self.pos is None:
+            match = self.pattern.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+            if char == '"':
+                self.done = True
+                break
+            if char != "\\":
+                out.append(char)
+                self.pos += 1
+                continue
+            # Escape sequence: wait for the rest of it if it is split across chunks
+            if self.pos + 1 >= len(self.buffer):
+                break
+            code = self.buffer[self.pos + 1]
+            if code == "u":
+                if self.pos + 6 > len(self.buffer):
+                    break
+                out.append(chr(int(self.buffer[self.pos + 2:self.pos + 6], 16)))
+                self.pos += 6
+            else:
+                out.append(self.ESCAPES.get(code, code))
+                self.pos += 2
+        return "".join(out)
+
+
+async def _complete(system_prompt: str, user_content: str, usage: dict | None = None,
+                    on_explanation=None) -> str:
+    """Run one chat completion, adding call count, latency and tokens to usage.
+
+    With on_explanation the completion is streamed and the plan's
+    "explanation" field is passed to it piece by piece as it is generated.
+    """
+    start = time.perf_counter()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
 
+    if on_explanation is None:
+        response = await llm_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0,
+        )
+        content, response_usage = response.choices[0].message.content, response.usage
+    else:
+        stream = await llm_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=0,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts, response_usage = [], None
+        explanation = _StringFieldStream("explanation")
+        async for chunk in stream:
+            if chunk.usage:
+                response_usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                delta = explanation.feed(parts[-1])
+                if delta:
+                    on_explanation(delta)
+        content = "".join(parts)
 
-def create_action_plan(transcript: str, intent_data: dict, context: dict) -> dict:
+    if usage is not None:
+        usage["llm_calls"] = usage.get("llm_calls", 0) + 1
+        usage["llm_ms"] = usage.get("llm_ms", 0) + int((time.perf_counter() - start) * 1000)
+        if response_usage:
+            usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + response_usage.prompt_tokens
+            usage["completion_tokens"] = usage.get("completion_tokens", 0) + response_usage.completion_tokens
+    return content
+
+
+def _context_prompt(context: dict) -> str:
+    """Compact, token-budgeted context block; stores the compaction stats on context."""
+    text, context["compaction"] = context_compactor.compact(context)
+    return text
+
+
+async def extract_intent(transcript: str, usage: dict | None = None) -> dict:
+    cached = intent_cache.get(transcript)
+    if cached is not None:
+        return cached
+
+    if INTENT_LOCAL_CLASSIFIER:
+        local = intent_classifier.try_classify(transcript)
+        if local is not None:
+            return local
+
+    content = await _complete(INTENT_SYSTEM_PROMPT, transcript, usage)
+    intent_data = parse_llm_json(content)
+    intent_cache.put(transcript, intent_data)
+    return intent_data
+
+
+async def create_action_plan(transcript: str, intent_data: dict, context: dict,
+                             usage: dict | None = None, on_explanation=None) -> dict:
     context_prompt = f"""
 USER COMMAND: "{transcript}"
 INTENT: {json.dumps(intent_data, indent=2)}
-SIMILAR TICKETS: {json.dumps(context.get('similar_tickets', []), indent=2)}
-TARGET TICKET: {json.dumps(context.get('target_ticket'), indent=2)}
-PAST COMMANDS: {json.dumps(context.get('past_commands', []), indent=2)}
-PAST ACTIONS: {json.dumps(context.get('past_actions', []), indent=2)}
-STATS: {json.dumps(context.get('stats', {}), indent=2)}
-"""
-
-    response = llm_client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": PLANNING_SYSTEM_PROMPT},
-            {"role": "user", "content": context_prompt}
-        ],
-        temperature=0,
-    )
-    return parse_llm_json(response.choices[0].message.content)
\ No newline at end of file
+{_context_prompt(context)}"""
+
+    content = await _complete(PLANNING_SYSTEM_PROMPT, context_prompt, usage, on_explanation)
+    return parse_llm_json(content)
+
+
+async def plan_command(transcript: str, context: dict, usage: dict | None = None,
+                       on_explanation=None) -> tuple[dict, dict]:
+    """One-shot mode: extract intent and create the plan in a single LLM call."""
+    context_prompt = f"""
+USER COMMAND: "{transcript}"
+{_context_prompt(context)}"""
+
+    content = await _complete(COMBINED_SYSTEM_PROMPT, context_prompt, usage, on_explanation)
+    result = parse_llm_json(content)
+    intent_data = {
+        "intent": result.pop("intent", None),
+        "entities": result.pop("entities", {}) or {},
+    }
+    return intent_data, result
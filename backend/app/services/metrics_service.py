@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from app.services import elasticsearch_service as es_service
 
 TIME_SAVED_PER_ACTION = {
@@ -10,48 +10,62 @@ TIME_SAVED_PER_ACTION = {
     "search_tickets": 90,        # 1.5 minutes to search manually
     "link_tickets": 150,         # 2.5 minutes to link across systems
 }
+DEFAULT_TIME_SAVED = 60
 
 
-def calculate_time_saved() -> dict:
-    """Calculate total time saved by using VoiceOps"""
-    actions = es_service.get_all_actions(size=1000)
-    
-    total_seconds_saved = 0
-    action_counts = {}
-    
-    for action in actions:
-        action_type = action.get("action_type", "unknown")
-        time_saved = TIME_SAVED_PER_ACTION.get(action_type, 60) 
-        total_seconds_saved += time_saved
-        action_counts[action_type] = action_counts.get(action_type, 0) + 1
-    
+def calculate_time_saved(stats: dict) -> dict:
+    """Time saved from per-type action counts (see es_service.get_impact_stats)"""
+    action_counts = stats["by_type"]
+    total_seconds_saved = sum(
+        TIME_SAVED_PER_ACTION.get(action_type, DEFAULT_TIME_SAVED) * count
+        for action_type, count in action_counts.items()
+    )
+    # Types too rare to get a bucket of their own are valued at the default
+    total_seconds_saved += stats["other"] * DEFAULT_TIME_SAVED
+    total_actions = stats["total"]
+
     hours = total_seconds_saved // 3600
     minutes = (total_seconds_saved % 3600) // 60
-    
+
     return {
         "total_seconds_saved": total_seconds_saved,
         "formatted": f"{hours}h {minutes}m",
         "action_counts": action_counts,
-        "total_actions": len(actions),
-        "avg_time_saved_per_action": round(total_seconds_saved / max(len(actions), 1), 1),
+        "total_actions": total_actions,
+        "avg_time_saved_per_action": round(total_seconds_saved / max(total_actions, 1), 1),
     }
 
 
-def get_impact_summary() -> dict:
-    """Get overall impact metrics for the dashboard"""
-    time_saved = calculate_time_saved()
-    action_stats = es_service.get_action_stats()
-    
+def _days_covered(stats: dict) -> float:
+    """Days between the first and last action in range, at least one."""
+    try:
+        first = datetime.fromisoformat(str(stats["first_action"]).replace("Z", "+00:00"))
+        last = datetime.fromisoformat(str(stats["last_action"]).replace("Z", "+00:00"))
+    except ValueError:
+        return 1.0
+    return max((last - first).total_seconds() / 86400, 1.0)
+
+
+async def get_impact_summary(start: str | None = None, end: str | None = None) -> dict:
+    """Get overall impact metrics for the dashboard, optionally for a time range"""
+    stats = await es_service.get_impact_stats(start, end)
+    time_saved = calculate_time_saved(stats)
+    total_actions = time_saved["total_actions"]
+    actual_seconds = int(stats["duration_ms"]["sum"]) // 1000
+
     return {
+        "range": {"start": start, "end": end},
         "time_saved": time_saved,
         "automation_stats": {
-            "total_automated_actions": time_saved["total_actions"],
-            "actions_per_day": round(time_saved["total_actions"] / 7, 1),  
-            "success_rate": "94%",  
+            "total_automated_actions": total_actions,
+            "actions_per_day": round(total_actions / _days_covered(stats), 1) if total_actions else 0.0,
+            "success_rate": f"{round(stats['succeeded'] * 100 / total_actions)}%" if total_actions else "n/a",
+            "successful_actions": stats["succeeded"],
+            "duration_ms": stats["duration_ms"],
         },
         "efficiency_gain": {
             "manual_time_estimate": f"{time_saved['total_seconds_saved'] // 60} minutes",
-            "actual_time": f"{action_stats.get('avg_duration_ms', 0) * time_saved['total_actions'] // 1000} seconds",
-            "efficiency_multiplier": f"{time_saved['total_seconds_saved'] // max((action_stats.get('avg_duration_ms', 1000) * time_saved['total_actions'] // 1000), 1)}x faster",
+            "actual_time": f"{actual_seconds} seconds",
+            "efficiency_multiplier": f"{time_saved['total_seconds_saved'] // max(actual_seconds, 1)}x faster",
         }
-    }
\ No newline at end of file
+    }
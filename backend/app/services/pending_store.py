@@ -0,0 +1,169 @@
+"""
+Pending-action store for plans awaiting user confirmation.
+Only what confirm_action needs (transcript, intent, plan, start time) is
+kept, serialized as compact JSON, and every entry expires after
+PENDING_TTL_SECONDS. The "memory" backend is a per-process LRU; the "sqlite"
+backend is a shared file so any worker can confirm a plan made by another.
+"""
+
+import asyncio
+import contextlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from datetime import datetime
+from app.config import PENDING_STORE, PENDING_STORE_PATH, PENDING_TTL_SECONDS, PENDING_MAX_ENTRIES
+
+_stats = {"stored": 0, "taken": 0, "restored": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+
+def _serialize(pending: dict) -> str:
+    return json.dumps({
+        "transcript": pending["transcript"],
+        "intent_data": pending["intent_data"],
+        "plan": pending["plan"],
+        "start_time": pending["start_time"].isoformat(),
+    }, separators=(",", ":"), default=str)
+
+
+def _deserialize(data: str) -> dict:
+    pending = json.loads(data)
+    pending["start_time"] = datetime.fromisoformat(pending["start_time"])
+    return pending
+
+
+class MemoryPendingStore:
+    """In-process LRU + TTL store; entries are only visible to this worker."""
+
+    def __init__(self):
+        # command_id -> (expires_at, serialized), oldest first
+        self.entries: OrderedDict = OrderedDict()
+
+    def _sweep(self):
+        now = time.time()
+        while self.entries and next(iter(self.entries.values()))[0] <= now:
+            self.entries.popitem(last=False)
+            _stats["expired"] += 1
+
+    async def put(self, command_id: str, data: str):
+        self._sweep()
+        self.entries[command_id] = (time.time() + PENDING_TTL_SECONDS, data)
+        self.entries.move_to_end(command_id)
+        while len(self.entries) > PENDING_MAX_ENTRIES:
+            self.entries.popitem(last=False)
+            _stats["evicted"] += 1
+
+    async def take(self, command_id: str) -> str | None:
+        self._sweep()
+        entry = self.entries.pop(command_id, None)
+        return entry[1] if entry else None
+
+    async def size(self) -> int:
+        self._sweep()
+        return len(self.entries)
+
+
+class SQLitePendingStore:
+    """File-backed store shared by every worker on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pending_actions ("
+                "command_id TEXT PRIMARY KEY, expires_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS pending_expiry ON pending_actions (expires_at)")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # "with sqlite3.connect()" only commits; the connection is closed here
+        with contextlib.closing(sqlite3.connect(self.path, timeout=5)) as db:
+            with db:
+                yield db
+
+    def _sweep(self, db: sqlite3.Connection):
+        expired = db.execute("DELETE FROM pending_actions WHERE expires_at <= ?", (time.time(),)).rowcount
+        _stats["expired"] += expired
+
+    def _put(self, command_id: str, data: str):
+        with self._connect() as db:
+            self._sweep(db)
+            db.execute(
+                "INSERT OR REPLACE INTO pending_actions VALUES (?, ?, ?)",
+                (command_id, time.time() + PENDING_TTL_SECONDS, data),
+            )
+            overflow = db.execute(
+                "DELETE FROM pending_actions WHERE command_id IN ("
+                "SELECT command_id FROM pending_actions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (PENDING_MAX_ENTRIES,),
+            ).rowcount
+            _stats["evicted"] += overflow
+
+    def _take(self, command_id: str) -> str | None:
+        # DELETE ... RETURNING makes the take atomic across workers, so a
+        # plan can only be confirmed once
+        with self._connect() as db:
+            row = db.execute(
+                "DELETE FROM pending_actions WHERE command_id = ? AND expires_at > ? RETURNING data",
+                (command_id, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _size(self) -> int:
+        with self._connect() as db:
+            self._sweep(db)
+            return db.execute("SELECT COUNT(*) FROM pending_actions").fetchone()[0]
+
+    async def put(self, command_id: str, data: str):
+        await asyncio.to_thread(self._put, command_id, data)
+
+    async def take(self, command_id: str) -> str | None:
+        return await asyncio.to_thread(self._take, command_id)
+
+    async def size(self) -> int:
+        return await asyncio.to_thread(self._size)
+
+
+def _create_store():
+    if PENDING_STORE == "sqlite":
+        return SQLitePendingStore(PENDING_STORE_PATH)
+    return MemoryPendingStore()
+
+
+store = _create_store()
+
+
+async def put(command_id: str, pending: dict):
+    await store.put(command_id, _serialize(pending))
+    _stats["stored"] += 1
+
+
+async def take(command_id: str) -> dict | None:
+    """Remove and return a pending action; None if unknown, expired or already taken."""
+    data = await store.take(command_id)
+    if data is None:
+        _stats["misses"] += 1
+        return None
+    _stats["taken"] += 1
+    return _deserialize(data)
+
+
+async def restore(command_id: str, pending: dict):
+    """Put back a taken action, e.g. when its background job could not be queued."""
+    await store.put(command_id, _serialize(pending))
+    _stats["restored"] += 1
+
+
+async def get_stats() -> dict:
+    pending = await store.size()  # Sweeps first, so "expired" is current
+    return {
+        **_stats,
+        "backend": PENDING_STORE,
+        "pending": pending,
+        "ttl_seconds": PENDING_TTL_SECONDS,
+        "max_entries": PENDING_MAX_ENTRIES,
+    }
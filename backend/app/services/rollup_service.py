@@ -0,0 +1,445 @@
+"""
+Rollup of voiceops-actions into hourly and daily buckets.
+Each bucket document in voiceops-actions-rollup holds, per action_type /
+tool_used / success, the action count, duration sum/min/max and a duration
+histogram. Updates are incremental from a checkpointed cursor: every run
+recomputes the hours from the cursor up to now (the current hour is partial
+and gets recomputed next time) plus the days they fall in. Bucket documents
+have deterministic IDs, so recomputing any window is idempotent. Actions
+that arrive more than ROLLUP_LATENESS_SECONDS late are only picked up by a
+backfill. With several workers only the one holding the updater lease
+(a lock document in the rollup index) runs updates; the others retry each
+interval and take over once the lease lapses.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from elasticsearch import ConflictError, NotFoundError
+from elasticsearch.helpers import async_bulk, async_scan
+from app.config import es_client, ROLLUP_INTERVAL_SECONDS, ROLLUP_LATENESS_SECONDS, ROLLUP_LEASE_SECONDS
+
+logger = logging.getLogger("voiceops")
+
+ROLLUP_INDEX = "voiceops-actions-rollup"
+CHECKPOINT_ID = "checkpoint"
+LEASE_ID = "updater-lease"
+
+# Exclusive upper bounds of the duration histogram buckets (range aggregations
+# exclude "to"); slower actions land in gte_<last>
+DURATION_BUCKETS_MS = [100, 250, 500, 1000, 2000, 5000, 10000, 30000]
+HISTOGRAM_KEYS = [f"lt_{edge}" for edge in DURATION_BUCKETS_MS] + [f"gte_{DURATION_BUCKETS_MS[-1]}"]
+
+# Backfills roll up history this many days at a time to bound memory
+BACKFILL_WINDOW_DAYS = 7
+
+MAPPINGS = {
+    "properties": {
+        "kind": {"type": "keyword"},
+        "granularity": {"type": "keyword"},
+        "bucket": {"type": "date"},
+        "action_type": {"type": "keyword"},
+        "tool_used": {"type": "keyword"},
+        "success": {"type": "boolean"},
+        "count": {"type": "long"},
+        "duration_sum": {"type": "double"},
+        "duration_min": {"type": "double"},
+        "duration_max": {"type": "double"},
+        "duration_histogram": {"properties": {key: {"type": "long"} for key in HISTOGRAM_KEYS}},
+        "rolled_up_at": {"type": "date"},
+        "cursor": {"type": "date"},
+        "rolled_up_to": {"type": "date"},
+        "updated_at": {"type": "date"},
+        "owner": {"type": "keyword"},
+        "expires_at": {"type": "date"},
+    }
+}
+
+_index_ready = False
+_updater: asyncio.Task | None = None
+# Last checkpoint seen by this process, for freshness without a round-trip
+_checkpoint: dict | None = None
+# Identifies this process in the updater lease
+_owner = uuid.uuid4().hex[:12]
+_leader = False
+_stats = {"lease_acquired": 0, "lease_lost": 0, "runs": 0, "failed_runs": 0, "hour_buckets": 0, "day_buckets": 0, "last_run_ms": 0}
+
+
+def _floor_hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+async def _ensure_index():
+    global _index_ready
+    if _index_ready:
+        return
+    if not await es_client.indices.exists(index=ROLLUP_INDEX):
+        await es_client.indices.create(index=ROLLUP_INDEX, mappings=MAPPINGS)
+    _index_ready = True
+
+
+def _raw_hours_query(start: datetime, end: datetime, after: dict | None) -> dict:
+    composite = {
+        "size": 1000,
+        "sources": [
+            {"bucket": {"date_histogram": {"field": "timestamp", "calendar_interval": "1h"}}},
+            {"action_type": {"terms": {"field": "action_type", "missing_bucket": True}}},
+            {"tool_used": {"terms": {"field": "tool_used", "missing_bucket": True}}},
+            {"success": {"terms": {"field": "success", "missing_bucket": True}}},
+        ],
+    }
+    if after:
+        composite["after"] = after
+    ranges = [{"key": HISTOGRAM_KEYS[0], "to": DURATION_BUCKETS_MS[0]}]
+    ranges += [
+        {"key": key, "from": low, "to": high}
+        for key, low, high in zip(HISTOGRAM_KEYS[1:], DURATION_BUCKETS_MS, DURATION_BUCKETS_MS[1:])
+    ]
+    ranges.append({"key": HISTOGRAM_KEYS[-1], "from": DURATION_BUCKETS_MS[-1]})
+    return {
+        "size": 0,
+        "query": {"range": {"timestamp": {"gte": start.isoformat(), "lt": end.isoformat()}}},
+        "aggs": {
+            "buckets": {
+                "composite": composite,
+                "aggs": {
+                    "duration": {"stats": {"field": "duration_ms"}},
+                    "histogram": {"range": {"field": "duration_ms", "keyed": True, "ranges": ranges}},
+                },
+            }
+        },
+    }
+
+
+def _bucket_doc(granularity: str, bucket: datetime, action_type, tool_used, success,
+                count: int, duration_sum: float, duration_min, duration_max, histogram: dict) -> dict:
+    return {
+        "kind": "bucket",
+        "granularity": granularity,
+        "bucket": bucket.isoformat(),
+        "action_type": action_type,
+        "tool_used": tool_used,
+        "success": success,
+        "count": count,
+        "duration_sum": duration_sum,
+        "duration_min": duration_min,
+        "duration_max": duration_max,
+        "duration_histogram": histogram,
+    }
+
+
+def _doc_id(doc: dict) -> str:
+    return "|".join(str(doc[key]) for key in ("granularity", "bucket", "action_type", "tool_used", "success"))
+
+
+async def _hours_from_raw(start: datetime, end: datetime) -> list:
+    docs, after = [], None
+    while True:
+        result = await es_client.search(index="voiceops-actions", body=_raw_hours_query(start, end, after))
+        agg = result["aggregations"]["buckets"]
+        for bucket in agg["buckets"]:
+            key, duration = bucket["key"], bucket["duration"]
+            success = key["success"]
+            docs.append(_bucket_doc(
+                "hour",
+                datetime.fromtimestamp(key["bucket"] / 1000, timezone.utc),
+                key["action_type"],
+                key["tool_used"],
+                None if success is None else success in (True, 1, "true"),
+                bucket["doc_count"],
+                duration.get("sum") or 0,
+                duration.get("min"),
+                duration.get("max"),
+                {k: bucket["histogram"]["buckets"].get(k, {}).get("doc_count", 0) for k in HISTOGRAM_KEYS},
+            ))
+        after = agg.get("after_key")
+        if not after or not agg["buckets"]:
+            return docs
+
+
+async def _stored_hours(start: datetime, end: datetime) -> list:
+    query = {"query": {"bool": {"filter": [
+        {"term": {"kind": "bucket"}},
+        {"term": {"granularity": "hour"}},
+        {"range": {"bucket": {"gte": start.isoformat(), "lt": end.isoformat()}}},
+    ]}}}
+    return [hit["_source"] async for hit in async_scan(es_client, index=ROLLUP_INDEX, query=query)]
+
+
+def _merge_days(hours: list) -> list:
+    days = {}
+    for hour in hours:
+        day = _floor_day(_parse(hour["bucket"]) if isinstance(hour["bucket"], str) else hour["bucket"])
+        key = (day, hour["action_type"], hour["tool_used"], hour["success"])
+        merged = days.get(key)
+        if merged is None:
+            days[key] = _bucket_doc("day", *key, hour["count"], hour["duration_sum"], hour["duration_min"],
+                                    hour["duration_max"], dict(hour["duration_histogram"]))
+            continue
+        merged["count"] += hour["count"]
+        merged["duration_sum"] += hour["duration_sum"]
+        merged["duration_min"] = min(v for v in (merged["duration_min"], hour["duration_min"], float("inf")) if v is not None)
+        merged["duration_max"] = max(v for v in (merged["duration_max"], hour["duration_max"], float("-inf")) if v is not None)
+        for k in HISTOGRAM_KEYS:
+            merged["duration_histogram"][k] += hour["duration_histogram"].get(k, 0)
+    for doc in days.values():
+        # No durations at all: keep the fields empty rather than +/-inf
+        if doc["duration_min"] == float("inf"):
+            doc["duration_min"] = None
+        if doc["duration_max"] == float("-inf"):
+            doc["duration_max"] = None
+    return list(days.values())
+
+
+async def _roll(start: datetime, end: datetime) -> dict:
+    """Recompute hour buckets in [start, end) and the day buckets they belong to."""
+    hours = await _hours_from_raw(start, end)
+    day_start = _floor_day(start)
+    # Hours of the first day that precede this window are already rolled up
+    earlier = await _stored_hours(day_start, start) if day_start < start else []
+    days = _merge_days(earlier + hours)
+
+    now = datetime.now(timezone.utc).isoformat()
+    operations = [
+        {"_op_type": "index", "_index": ROLLUP_INDEX, "_id": _doc_id(doc), "_source": {**doc, "rolled_up_at": now}}
+        for doc in hours + days
+    ]
+    if operations:
+        await async_bulk(es_client, operations)
+    _stats["hour_buckets"] += len(hours)
+    _stats["day_buckets"] += len(days)
+    return {"hour_buckets": len(hours), "day_buckets": len(days)}
+
+
+async def _read_checkpoint() -> dict | None:
+    global _checkpoint
+    try:
+        result = await es_client.get(index=ROLLUP_INDEX, id=CHECKPOINT_ID)
+    except NotFoundError:
+        return None
+    _checkpoint = result["_source"]
+    return _checkpoint
+
+
+async def _write_checkpoint(cursor: datetime, rolled_up_to: datetime) -> dict:
+    global _checkpoint
+    checkpoint = {
+        "kind": "checkpoint",
+        "cursor": cursor.isoformat(),
+        "rolled_up_to": rolled_up_to.isoformat(),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await es_client.index(index=ROLLUP_INDEX, id=CHECKPOINT_ID, document=checkpoint, refresh="wait_for")
+    _checkpoint = checkpoint
+    return checkpoint
+
+
+async def update() -> dict:
+    """Roll up everything since the checkpoint cursor; backfills when there is none."""
+    await _ensure_index()
+    checkpoint = await _read_checkpoint()
+    if checkpoint is None:
+        return await backfill()
+
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    start = _parse(checkpoint["cursor"])
+    result = await _roll(start, now)
+    # Hours older than the lateness window are final; later runs start after them
+    cursor = max(start, _floor_hour(now - timedelta(seconds=ROLLUP_LATENESS_SECONDS)))
+    await _write_checkpoint(cursor, now)
+
+    _stats["runs"] += 1
+    _stats["last_run_ms"] = int((time.perf_counter() - started) * 1000)
+    return {"window_start": start.isoformat(), "window_end": now.isoformat(), **result}
+
+
+async def backfill(since: str | None = None) -> dict:
+    """Recompute the rollup from since (default: the first action) up to now."""
+    await _ensure_index()
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    if since:
+        start = _floor_hour(_parse(since))
+    else:
+        result = await es_client.search(index="voiceops-actions", body={
+            "size": 0, "aggs": {"first": {"min": {"field": "timestamp"}}},
+        })
+        first = result["aggregations"]["first"].get("value")
+        start = _floor_hour(datetime.fromtimestamp(first / 1000, timezone.utc)) if first else _floor_hour(now)
+
+    totals = {"hour_buckets": 0, "day_buckets": 0}
+    window_start = start
+    while window_start < now:
+        if _leader:
+            # Keep the lease through long backfills so no other worker starts one
+            await _hold_lease()
+        window_end = min(_floor_day(window_start) + timedelta(days=BACKFILL_WINDOW_DAYS), now)
+        result = await _roll(window_start, window_end)
+        for key in totals:
+            totals[key] += result[key]
+        window_start = window_end
+
+    await _write_checkpoint(_floor_hour(now - timedelta(seconds=ROLLUP_LATENESS_SECONDS)), now)
+    _stats["runs"] += 1
+    _stats["last_run_ms"] = int((time.perf_counter() - started) * 1000)
+    return {"index": ROLLUP_INDEX, "since": start.isoformat(), **totals}
+
+
+async def _hold_lease() -> bool:
+    """Acquire or renew the updater lease; False while another process holds it."""
+    global _leader
+    now = datetime.now(timezone.utc)
+    lease = {
+        "kind": "lease",
+        "owner": _owner,
+        "expires_at": (now + timedelta(seconds=ROLLUP_LEASE_SECONDS)).isoformat(),
+        "updated_at": now.isoformat(),
+    }
+    try:
+        await es_client.create(index=ROLLUP_INDEX, id=LEASE_ID, document=lease)
+    except ConflictError:
+        current = await es_client.get(index=ROLLUP_INDEX, id=LEASE_ID)
+        source = current["_source"]
+        if source["owner"] != _owner and _parse(source["expires_at"]) > now:
+            if _leader:
+                _stats["lease_lost"] += 1
+            _leader = False
+            return False
+        # Ours to renew, or expired: the sequence number check lets only one
+        # of several contending processes take it over
+        try:
+            await es_client.index(
+                index=ROLLUP_INDEX, id=LEASE_ID, document=lease,
+                if_seq_no=current["_seq_no"], if_primary_term=current["_primary_term"],
+            )
+        except ConflictError:
+            _leader = False
+            return False
+    if not _leader:
+        _stats["lease_acquired"] += 1
+        logger.info("Rollup updater lease acquired by %s", _owner)
+    _leader = True
+    return True
+
+
+async def _release_lease():
+    global _leader
+    if not _leader:
+        return
+    _leader = False
+    try:
+        current = await es_client.get(index=ROLLUP_INDEX, id=LEASE_ID)
+        if current["_source"]["owner"] == _owner:
+            await es_client.delete(
+                index=ROLLUP_INDEX, id=LEASE_ID,
+                if_seq_no=current["_seq_no"], if_primary_term=current["_primary_term"],
+            )
+    except Exception as e:
+        logger.warning("Could not release the rollup lease: %s", e)
+
+
+async def _run():
+    while True:
+        try:
+            await _ensure_index()
+            if await _hold_lease():
+                await update()
+        except Exception as e:
+            _stats["failed_runs"] += 1
+            logger.warning("Rollup update failed: %s", e)
+        await asyncio.sleep(ROLLUP_INTERVAL_SECONDS)
+
+
+def start():
+    global _updater
+    if _updater is None and ROLLUP_INTERVAL_SECONDS > 0:
+        _updater = asyncio.create_task(_run())
+
+
+async def stop():
+    global _updater
+    if _updater is not None:
+        _updater.cancel()
+        try:
+            await _updater
+        except asyncio.CancelledError:
+            pass
+        _updater = None
+        await _release_lease()
+
+
+async def get_freshness() -> dict | None:
+    """How current the rollup is; None when it has never been built."""
+    checkpoint = _checkpoint
+    if checkpoint is None or not _leader:
+        # Another process may be the one keeping it up to date
+        try:
+            checkpoint = await _read_checkpoint()
+        except Exception:
+            checkpoint = None
+    if checkpoint is None:
+        return None
+    rolled_up_to = _parse(checkpoint["rolled_up_to"])
+    return {
+        "source": ROLLUP_INDEX,
+        "rolled_up_to": checkpoint["rolled_up_to"],
+        "lag_seconds": round((datetime.now(timezone.utc) - rolled_up_to).total_seconds(), 1),
+        "update_interval_seconds": ROLLUP_INTERVAL_SECONDS,
+    }
+
+
+def _day_buckets_query(aggs: dict) -> dict:
+    return {
+        "size": 0,
+        "query": {"bool": {"filter": [{"term": {"kind": "bucket"}}, {"term": {"granularity": "day"}}]}},
+        "aggs": aggs,
+    }
+
+
+async def get_action_stats() -> dict:
+    """Same shape as es_service.get_action_stats, summed from daily buckets."""
+    def by(field: str) -> dict:
+        return {
+            "terms": {"field": field, "order": {"actions": "desc"}},
+            "aggs": {"actions": {"sum": {"field": "count"}}},
+        }
+
+    result = await es_client.search(index=ROLLUP_INDEX, body=_day_buckets_query({
+        "total": {"sum": {"field": "count"}},
+        "duration": {"sum": {"field": "duration_sum"}},
+        "by_type": by("action_type"),
+        "by_tool": by("tool_used"),
+    }))
+    aggs = result["aggregations"]
+    total = int(aggs["total"]["value"] or 0)
+    return {
+        "total": total,
+        "by_type": {b["key"]: int(b["actions"]["value"]) for b in aggs["by_type"]["buckets"]},
+        "by_tool": {b["key"]: int(b["actions"]["value"]) for b in aggs["by_tool"]["buckets"]},
+        "avg_duration_ms": aggs["duration"]["value"] / total if total else 0,
+    }
+
+
+def get_stats() -> dict:
+    return {
+        **_stats,
+        "index": ROLLUP_INDEX,
+        "checkpoint": _checkpoint,
+        "running": _updater is not None,
+        "leader": _leader,
+        "owner": _owner,
+        "lease_seconds": ROLLUP_LEASE_SECONDS,
+        "interval_seconds": ROLLUP_INTERVAL_SECONDS,
+        "lateness_seconds": ROLLUP_LATENESS_SECONDS,
+    }
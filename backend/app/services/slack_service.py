@@ -1,28 +1,69 @@
-import requests
+"""
+Asynchronous Slack delivery queue.
+send_notification only enqueues; a background sender posts to the webhook
+through a token bucket (Slack allows ~1 message/second per webhook), honours
+Retry-After on 429s, and coalesces messages for the same channel that arrive
+within SLACK_COALESCE_MS into one Block Kit post. Each message gets a
+delivery_id whose status can be looked up later.
+Delivery status lives in the memory of the process that queued the message,
+so /api/slack/deliveries/{delivery_id} only finds it reliably with a single
+worker process; with --workers N the lookup may land on another worker.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone
-from app.config import SLACK_WEBHOOK_URL
+import httpx
+from app.config import (
+    SLACK_WEBHOOK_URL,
+    SLACK_RATE_PER_SECOND,
+    SLACK_BURST,
+    SLACK_COALESCE_MS,
+    SLACK_COALESCE_MAX,
+    SLACK_MAX_ATTEMPTS,
+    SLACK_TIMEOUT_SECONDS,
+)
 
+# Statuses a delivery moves through: queued -> sending -> sent | failed
+# (retrying while waiting out a 429 or a transient error)
+_deliveries: OrderedDict = OrderedDict()
+_DELIVERIES_MAX = 1000
 
-def send_notification(channel: str, message: str) -> dict:
-    if not SLACK_WEBHOOK_URL:
-        return {
-            "status": "skipped",
-            "reason": "No Slack webhook configured",
-            "channel": channel,
-            "message": message
-        }
+# channel -> {"due_at": monotonic time, "ids": [delivery_id, ...]}
+_pending: dict = {}
+_wakeup = asyncio.Event()
+_sender: asyncio.Task | None = None
+_client: httpx.AsyncClient | None = None
 
-    payload = {
-        "text": "🎙️ VoiceOps Agent Alert",
+# Token bucket state, plus the Retry-After pause shared by every channel
+_tokens = float(SLACK_BURST)
+_refilled_at = time.monotonic()
+_paused_until = 0.0
+
+_stats = {"enqueued": 0, "posts": 0, "sent": 0, "failed": 0, "coalesced": 0, "rate_limited": 0, "retries": 0}
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=SLACK_TIMEOUT_SECONDS)
+    return _client
+
+
+def _payload(channel: str, messages: list) -> dict:
+    return {
+        "text": "🎙️ VoiceOps Agent Alert" if len(messages) == 1 else f"🎙️ VoiceOps Agent: {len(messages)} updates",
         "blocks": [
             {
                 "type": "header",
                 "text": {"type": "plain_text", "text": "🎙️ VoiceOps Agent"}
             },
-            {
-                "type": "section",
-                "text": {"type": "mrkdwn", "text": message}
-            },
+            *(
+                {"type": "section", "text": {"type": "mrkdwn", "text": message}}
+                for message in messages
+            ),
             {
                 "type": "context",
                 "elements": [{
@@ -33,12 +74,204 @@ def send_notification(channel: str, message: str) -> dict:
         ]
     }
 
-    try:
-        response = requests.post(SLACK_WEBHOOK_URL, json=payload, timeout=5)
+
+def _record(delivery_id: str, channel: str, message: str):
+    _deliveries[delivery_id] = {
+        "delivery_id": delivery_id,
+        "status": "queued",
+        "channel": channel,
+        "message": message,
+        "attempts": 0,
+        "enqueued_at": datetime.now(timezone.utc).isoformat(),
+    }
+    while len(_deliveries) > _DELIVERIES_MAX:
+        _deliveries.popitem(last=False)
+
+
+def _update(ids: list, **fields):
+    for delivery_id in ids:
+        if delivery_id in _deliveries:
+            _deliveries[delivery_id].update(fields)
+
+
+async def send_notification(channel: str, message: str) -> dict:
+    """Queue a message for channel and return immediately with its delivery_id."""
+    if not SLACK_WEBHOOK_URL:
         return {
-            "status": "sent" if response.status_code == 200 else "failed",
+            "status": "skipped",
+            "reason": "No Slack webhook configured",
             "channel": channel,
-            "message": message,
+            "message": message
         }
-    except Exception as e:
-        return {"status": "error", "error": str(e)}
\ No newline at end of file
+
+    delivery_id = f"slack-{uuid.uuid4().hex[:8]}"
+    _record(delivery_id, channel, message)
+    _stats["enqueued"] += 1
+
+    if _sender is None:
+        # No background sender running (e.g. scripts): deliver inline
+        await _deliver(channel, [delivery_id])
+        return get_delivery(delivery_id)
+
+    batch = _pending.get(channel)
+    if batch is None:
+        _pending[channel] = {"due_at": time.monotonic() + SLACK_COALESCE_MS / 1000, "ids": [delivery_id]}
+    else:
+        batch["ids"].append(delivery_id)
+        _stats["coalesced"] += 1
+        if len(batch["ids"]) >= SLACK_COALESCE_MAX:
+            batch["due_at"] = time.monotonic()
+    _wakeup.set()
+
+    return {"status": "queued", "delivery_id": delivery_id, "channel": channel, "message": message}
+
+
+async def _wait_for_slot():
+    """Block until the Retry-After pause is over and a token is available."""
+    global _tokens, _refilled_at
+    while True:
+        now = time.monotonic()
+        if now < _paused_until:
+            await asyncio.sleep(_paused_until - now)
+            continue
+        _tokens = min(SLACK_BURST, _tokens + (now - _refilled_at) * SLACK_RATE_PER_SECOND)
+        _refilled_at = now
+        if _tokens >= 1:
+            _tokens -= 1
+            return
+        await asyncio.sleep((1 - _tokens) / SLACK_RATE_PER_SECOND)
+
+
+async def _deliver(channel: str, ids: list):
+    global _paused_until
+    messages = [_deliveries[i]["message"] for i in ids if i in _deliveries]
+    attempts = 0
+
+    while True:
+        await _wait_for_slot()
+        attempts += 1
+        _update(ids, status="sending", attempts=attempts, batch_size=len(ids))
+        _stats["posts"] += 1
+
+        retry_after, error = None, None
+        try:
+            response = await _get_client().post(SLACK_WEBHOOK_URL, json=_payload(channel, messages))
+        except httpx.HTTPError as e:
+            error = str(e) or type(e).__name__
+        else:
+            if response.status_code == 200:
+                _update(ids, status="sent", sent_at=datetime.now(timezone.utc).isoformat())
+                for delivery_id in ids:
+                    _deliveries.get(delivery_id, {}).pop("error", None)
+                _stats["sent"] += len(ids)
+                return
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code == 429:
+                _stats["rate_limited"] += 1
+                try:
+                    retry_after = float(response.headers.get("Retry-After", "1"))
+                except ValueError:
+                    retry_after = 1.0
+            elif response.status_code < 500:
+                # Bad payload or revoked webhook: retrying will not help
+                attempts = SLACK_MAX_ATTEMPTS
+
+        if attempts >= SLACK_MAX_ATTEMPTS:
+            _update(ids, status="failed", error=error)
+            _stats["failed"] += len(ids)
+            return
+
+        _stats["retries"] += 1
+        _update(ids, status="retrying", error=error)
+        if retry_after is not None:
+            # The limit is per webhook, so the pause holds back every channel
+            _paused_until = max(_paused_until, time.monotonic() + retry_after)
+        else:
+            await asyncio.sleep(min(2 ** attempts * 0.5, 30))
+
+
+def _next_due() -> str | None:
+    if not _pending:
+        return None
+    return min(_pending, key=lambda channel: _pending[channel]["due_at"])
+
+
+async def _run():
+    while True:
+        channel = _next_due()
+        if channel is None:
+            await _wakeup.wait()
+            _wakeup.clear()
+            continue
+
+        wait = _pending[channel]["due_at"] - time.monotonic()
+        if wait > 0:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        batch = _pending.pop(channel)
+        try:
+            await _deliver(channel, batch["ids"])
+        except asyncio.CancelledError:
+            # Shutting down mid-delivery: put the batch back for stop() to flush
+            if channel in _pending:
+                _pending[channel]["ids"][:0] = batch["ids"]
+            else:
+                _pending[channel] = batch
+            raise
+
+
+def start():
+    global _sender
+    if _sender is None and SLACK_WEBHOOK_URL:
+        _sender = asyncio.create_task(_run())
+
+
+async def stop(timeout: float = 10):
+    """Stop the sender, then try to deliver what is still queued within timeout seconds."""
+    global _sender, _client
+    if _sender is not None:
+        _sender.cancel()
+        try:
+            await _sender
+        except asyncio.CancelledError:
+            pass
+        _sender = None
+
+    async def flush():
+        while _pending:
+            channel = _next_due()
+            await _deliver(channel, _pending.pop(channel)["ids"])
+
+    try:
+        await asyncio.wait_for(flush(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    for batch in _pending.values():
+        _update(batch["ids"], status="failed", error="Not delivered before shutdown")
+    _pending.clear()
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_delivery(delivery_id: str) -> dict | None:
+    delivery = _deliveries.get(delivery_id)
+    return dict(delivery) if delivery else None
+
+
+def get_stats() -> dict:
+    return {
+        **_stats,
+        "queued": sum(len(batch["ids"]) for batch in _pending.values()),
+        "channels_pending": len(_pending),
+        "paused_for_ms": max(0, int((_paused_until - time.monotonic()) * 1000)),
+        "rate_per_second": SLACK_RATE_PER_SECOND,
+        "coalesce_ms": SLACK_COALESCE_MS,
+        "running": _sender is not None,
+    }
@@ -3,30 +3,407 @@ Cross-browser speech-to-text using Groq's Whisper API.
 Records audio in the browser (MediaRecorder API), sends to backend,
 backend forwards to Groq Whisper for transcription.
 Works on Chrome, Firefox, Safari, and Edge.
+
+Before upload the audio goes through audio_preprocess (16 kHz mono,
+silence trimmed, re-encoded) when AUDIO_PREPROCESS is on and the upload can
+be decoded (WAV, or any format when ffmpeg is installed). Recordings longer
+than STT_LONG_AUDIO_SECONDS are split at pauses into overlapping chunks
+(by the preprocessing pipeline, or on their own when STT_LONG_AUDIO is on
+and preprocessing is off), transcribed concurrently and stitched back
+together with the repeated overlap words removed.
+
+Uploads are read in chunks into a spooled temp file (in memory up to
+AUDIO_SPOOL_THRESHOLD_BYTES, then on disk), checked against the size and
+duration limits, and streamed to any OpenAI-compatible
+/audio/transcriptions endpoint (STT_BASE_URL) over a shared keep-alive client.
 """
 
+import asyncio
+import re
+import shutil
+import time
+import wave
+from tempfile import SpooledTemporaryFile
 import httpx
-from app.config import LLM_API_KEY
+from starlette.datastructures import Headers, UploadFile
+from starlette.formparsers import MultiPartParser
+from starlette.requests import Request
+from app.config import (
+    STT_BASE_URL,
+    STT_API_KEY,
+    STT_MODEL,
+    STT_LANGUAGE,
+    STT_TIMEOUT_SECONDS,
+    STT_MAX_CONNECTIONS,
+    AUDIO_MAX_BYTES,
+    AUDIO_MAX_DURATION_SECONDS,
+    AUDIO_SPOOL_THRESHOLD_BYTES,
+    AUDIO_PREPROCESS,
+    STT_LONG_AUDIO,
+    STT_LONG_AUDIO_SECONDS,
+    STT_CHUNK_CONCURRENCY,
+    STT_CHUNK_ATTEMPTS,
+)
+from app.services import audio_preprocess
 
+MIME_TYPES = {
+    ".webm": "audio/webm",
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".m4a": "audio/m4a",
+    ".ogg": "audio/ogg",
+    ".flac": "audio/flac",
+}
 
-async def transcribe_audio(audio_bytes: bytes, filename: str = "audio.webm") -> str:
-    mime_types = {
-        ".webm": "audio/webm",
-        ".mp3": "audio/mpeg",
-        ".wav": "audio/wav",
-        ".m4a": "audio/m4a",
-        ".ogg": "audio/ogg",
-    }
+# Longest run of words that can repeat across a chunk overlap
+_MAX_OVERLAP_WORDS = 12
+
+# Room for multipart boundaries and part headers around the audio itself
+_MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+# Shared keep-alive client, created on first use inside the running event loop
+_client: httpx.AsyncClient | None = None
+
+_stats = {
+    "uploads": 0,
+    "spooled_to_disk": 0,
+    "bytes_received": 0,
+    "rejected_size": 0,
+    "rejected_duration": 0,
+    "transcriptions": 0,
+    "failed_transcriptions": 0,
+    "stt_ms": 0,
+    "chunked": 0,
+    "chunk_retries": 0,
+}
+
+
+class AudioRejected(ValueError):
+    """An upload refused before transcription; status_code is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
 
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=STT_BASE_URL,
+            headers={"Authorization": f"Bearer {STT_API_KEY}"},
+            limits=httpx.Limits(max_connections=STT_MAX_CONNECTIONS),
+            timeout=STT_TIMEOUT_SECONDS,
+        )
+    return _client
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _content_type(filename: str) -> str:
     ext = "." + filename.rsplit(".", 1)[-1] if "." in filename else ".webm"
-    content_type = mime_types.get(ext, "audio/webm")
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(
-            "https://api.groq.com/openai/v1/audio/transcriptions",
-            headers={"Authorization": f"Bearer {LLM_API_KEY}"},
-            files={"file": (filename, audio_bytes, content_type)},
-            data={"model": "whisper-large-v3", "language": "en"},
+    return MIME_TYPES.get(ext, "audio/webm")
+
+
+def _too_large() -> AudioRejected:
+    _stats["rejected_size"] += 1
+    return AudioRejected(413, f"Audio exceeds the {AUDIO_MAX_BYTES // (1024 * 1024)} MB upload limit")
+
+
+async def _limited(stream, limit: int):
+    """Pass the request body through, failing as soon as it grows past limit."""
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise _too_large()
+        yield chunk
+
+
+async def receive_upload(request: Request) -> UploadFile:
+    """Read an audio upload into a spooled file without holding it all in memory.
+
+    Accepts multipart/form-data with an "audio" file field (what the frontend
+    sends) or a raw audio/* body. Raises AudioRejected when the upload is
+    missing, too large or too long.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > AUDIO_MAX_BYTES + _MULTIPART_OVERHEAD_BYTES:
+        # Refuse before reading a byte of the body
+        raise _too_large()
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        parser = MultiPartParser(
+            request.headers,
+            _limited(request.stream(), AUDIO_MAX_BYTES + _MULTIPART_OVERHEAD_BYTES),
+            max_files=1,
+            max_fields=1,
+        )
+        # Instance override of Starlette's fixed 1 MB in-memory limit per file
+        parser.max_file_size = AUDIO_SPOOL_THRESHOLD_BYTES
+        form = await parser.parse()
+        upload = form.get("audio")
+        if not isinstance(upload, UploadFile):
+            raise AudioRejected(422, "Expected an 'audio' file field")
+    elif content_type.startswith("audio/"):
+        spool = SpooledTemporaryFile(max_size=AUDIO_SPOOL_THRESHOLD_BYTES)
+        size = 0
+        async for chunk in _limited(request.stream(), AUDIO_MAX_BYTES):
+            # Writes past the threshold go to disk; rolled-over writes are small
+            spool.write(chunk)
+            size += len(chunk)
+        spool.seek(0)
+        ext = next((e for e, mime in MIME_TYPES.items() if content_type.startswith(mime)), ".webm")
+        upload = UploadFile(spool, size=size, filename=f"audio{ext}", headers=Headers({"content-type": content_type}))
+    else:
+        raise AudioRejected(415, "Send multipart/form-data with an 'audio' field or an audio/* body")
+
+    upload.file.seek(0, 2)
+    upload.size = upload.file.tell()
+    upload.file.seek(0)
+    if upload.size > AUDIO_MAX_BYTES:
+        await upload.close()
+        raise _too_large()
+
+    _stats["uploads"] += 1
+    _stats["bytes_received"] += upload.size
+    if upload.size > AUDIO_SPOOL_THRESHOLD_BYTES:
+        _stats["spooled_to_disk"] += 1
+
+    duration = await probe_duration(upload)
+    if duration is not None and duration > AUDIO_MAX_DURATION_SECONDS:
+        await upload.close()
+        _stats["rejected_duration"] += 1
+        raise AudioRejected(413, f"Audio is {duration:.0f}s long; the limit is {AUDIO_MAX_DURATION_SECONDS:.0f}s")
+    return upload
+
+
+def _wav_duration(file) -> float | None:
+    try:
+        with wave.open(file, "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+    finally:
+        file.seek(0)
+
+
+async def _ffprobe_duration(upload: UploadFile) -> float | None:
+    if shutil.which("ffprobe") is None:
+        return None
+    # Container duration when the header has one; MediaRecorder webm does not,
+    # so fall back to the timestamp of the last audio packet (demux only, no decode)
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "format=duration:packet=pts_time,duration_time", "-of", "default=nw=1", "pipe:0",
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+
+    async def feed():
+        try:
+            while chunk := upload.file.read(64 * 1024):
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            process.stdin.close()
+
+    output, _ = await asyncio.gather(process.stdout.read(), feed())
+    await process.wait()
+    upload.file.seek(0)
+
+    # Packets print pts_time/duration_time pairs; the format section prints duration
+    fields, last_packet_end = {}, None
+    for line in output.decode().splitlines():
+        key, _, value = line.partition("=")
+        try:
+            fields[key] = float(value)
+        except ValueError:
+            continue
+        if key == "duration_time" and "pts_time" in fields:
+            last_packet_end = fields.pop("pts_time") + fields.pop("duration_time")
+    return fields.get("duration", last_packet_end)
+
+
+async def probe_duration(upload: UploadFile) -> float | None:
+    """Audio length in seconds, or None when it cannot be determined cheaply."""
+    if (upload.filename or "").lower().endswith(".wav"):
+        return await asyncio.to_thread(_wav_duration, upload.file)
+    return await _ffprobe_duration(upload)
+
+
+async def transcribe_audio(audio, filename: str = "audio.webm", content_type: str | None = None) -> str:
+    """Transcribe audio given as bytes or a binary file object.
+
+    File objects are streamed to the STT endpoint in chunks rather than
+    copied into memory first.
+    """
+    content_type = content_type or _content_type(filename)
+
+    start = time.perf_counter()
+    try:
+        response = await _get_client().post(
+            "/audio/transcriptions",
+            files={"file": (filename, audio, content_type)},
+            data={"model": STT_MODEL, "language": STT_LANGUAGE},
         )
         response.raise_for_status()
-        return response.json()["text"]
\ No newline at end of file
+    except Exception:
+        _stats["failed_transcriptions"] += 1
+        raise
+    finally:
+        _stats["stt_ms"] += int((time.perf_counter() - start) * 1000)
+    _stats["transcriptions"] += 1
+    return response.json()["text"]
+
+
+def _can_decode(upload: UploadFile) -> bool:
+    """Whether the upload can be decoded here: WAV natively, anything else via ffmpeg."""
+    if shutil.which("ffmpeg") is not None:
+        return True
+    header = upload.file.read(12)
+    upload.file.seek(0)
+    return header[:4] in (b"RIFF", b"RF64") and header[8:12] == b"WAVE"
+
+
+async def _is_long(upload: UploadFile) -> bool:
+    if not STT_LONG_AUDIO:
+        return False
+    duration = await probe_duration(upload)
+    return duration is not None and duration > STT_LONG_AUDIO_SECONDS
+
+
+async def transcribe_upload(upload: UploadFile) -> dict:
+    """Transcribe a received upload.
+
+    Returns the transcript, a preprocessing report (None when AUDIO_PREPROCESS
+    is off) and a chunking report (None unless the recording was long enough
+    to be split). Decoding reads the whole upload into memory, so it only
+    happens for preprocessing or long recordings; everything else is
+    streamed to STT as received.
+    """
+    filename = upload.filename or "audio.webm"
+    stem = filename.rsplit(".", 1)[0]
+    decodable = (AUDIO_PREPROCESS or STT_LONG_AUDIO) and _can_decode(upload)
+
+    if decodable and AUDIO_PREPROCESS:
+        # Bounded by AUDIO_MAX_BYTES
+        data = await asyncio.to_thread(upload.file.read)
+        report = await audio_preprocess.run(data)
+        segments, ext = report.pop("segments", None), report.pop("ext", None)
+        chunking = None
+        if not report["applied"]:
+            transcript = await transcribe_audio(data, filename, upload.content_type)
+        elif len(segments) == 1:
+            transcript = await transcribe_audio(segments[0]["audio"], stem + ext)
+        else:
+            transcript, chunking = await transcribe_chunks(segments, stem, ext)
+        return {"transcript": transcript, "preprocessing": report, "chunking": chunking}
+
+    if decodable and await _is_long(upload):
+        data = await asyncio.to_thread(upload.file.read)
+        segments = await audio_preprocess.run_split(data)
+        transcript, chunking = await transcribe_chunks(segments, stem, ".wav")
+        return {"transcript": transcript, "preprocessing": None, "chunking": chunking}
+
+    if upload.size <= AUDIO_SPOOL_THRESHOLD_BYTES:
+        # Still in memory: send the bytes, since handing httpx the spooled
+        # file would roll it over to disk just to measure its length
+        audio = upload.file.read()
+    else:
+        audio = upload.file
+    return {
+        "transcript": await transcribe_audio(audio, filename, upload.content_type),
+        "preprocessing": None,
+        "chunking": None,
+    }
+
+
+async def transcribe_chunks(segments: list, stem: str, ext: str) -> tuple[str, dict]:
+    """Transcribe overlapping chunks concurrently and stitch the text.
+
+    At most STT_CHUNK_CONCURRENCY requests are in flight; after each round
+    only the chunks that failed are sent again, up to STT_CHUNK_ATTEMPTS
+    tries each. Raises the last error if a chunk never succeeds.
+    """
+    semaphore = asyncio.Semaphore(STT_CHUNK_CONCURRENCY)
+    texts = [None] * len(segments)
+    chunk_ms = [0] * len(segments)
+    start = time.perf_counter()
+
+    async def transcribe_chunk(index: int):
+        async with semaphore:
+            chunk_start = time.perf_counter()
+            try:
+                texts[index] = await transcribe_audio(segments[index]["audio"], f"{stem}-{index}{ext}")
+            finally:
+                chunk_ms[index] = int((time.perf_counter() - chunk_start) * 1000)
+
+    pending, attempts, retried = list(range(len(segments))), 0, []
+    while pending:
+        attempts += 1
+        results = await asyncio.gather(*(transcribe_chunk(i) for i in pending), return_exceptions=True)
+        failed = [(i, r) for i, r in zip(pending, results) if isinstance(r, Exception)]
+        if failed and attempts >= STT_CHUNK_ATTEMPTS:
+            raise failed[0][1]
+        pending = [i for i, _ in failed]
+        if pending:
+            retried.extend(pending)
+            _stats["chunk_retries"] += len(pending)
+            await asyncio.sleep(0.5 * attempts)
+
+    _stats["chunked"] += 1
+    return stitch(texts), {
+        "chunks": len(segments),
+        "bounds_seconds": [[s["start_seconds"], s["end_seconds"]] for s in segments],
+        "concurrency": STT_CHUNK_CONCURRENCY,
+        "retried_chunks": retried,
+        "longest_chunk_ms": max(chunk_ms),
+        "wall_ms": int((time.perf_counter() - start) * 1000),
+    }
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch(texts: list) -> str:
+    """Join chunk transcripts, dropping words repeated across each overlap.
+
+    The longest run of up to _MAX_OVERLAP_WORDS words that ends one chunk
+    and starts the next (ignoring case and punctuation) is kept once. A
+    single-word match only counts for words of four letters or more, so
+    a genuinely repeated "the" or "a" survives.
+    """
+    words = []
+    for text in texts:
+        incoming = text.split()
+        overlap = 0
+        for size in range(min(_MAX_OVERLAP_WORDS, len(words), len(incoming)), 0, -1):
+            tail = [_normalize(w) for w in words[-size:]]
+            if tail == [_normalize(w) for w in incoming[:size]] and (size > 1 or len(tail[0]) >= 4):
+                overlap = size
+                break
+        words.extend(incoming[overlap:])
+    return " ".join(words)
+
+
+def get_stats() -> dict:
+    calls = _stats["transcriptions"] + _stats["failed_transcriptions"]
+    return {
+        **_stats,
+        "avg_stt_ms": round(_stats["stt_ms"] / calls, 1) if calls else 0.0,
+        "stt_base_url": STT_BASE_URL,
+        "stt_model": STT_MODEL,
+        "max_bytes": AUDIO_MAX_BYTES,
+        "max_duration_seconds": AUDIO_MAX_DURATION_SECONDS,
+        "spool_threshold_bytes": AUDIO_SPOOL_THRESHOLD_BYTES,
+        "preprocessing": audio_preprocess.get_stats() if AUDIO_PREPROCESS else None,
+    }
@@ -1,6 +1,59 @@
+import argparse
+import importlib.util
+import os
 import uvicorn
 
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the VoiceOps Agent API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Worker processes; each builds its own ES/LLM/Jira clients (default: $WEB_CONCURRENCY or 1)",
+    )
+    parser.add_argument("--reload", action="store_true", help="Development only: restart on code changes")
+    parser.add_argument(
+        "--graceful-timeout", type=float, default=float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30")),
+        help="Seconds to let in-flight requests finish after SIGTERM",
+    )
+    args = parser.parse_args()
+    if args.reload and args.workers > 1:
+        parser.error("--reload is a development mode and cannot be combined with --workers > 1")
+    if args.workers > 1 and os.getenv("PENDING_STORE", "").lower() == "memory":
+        parser.error("PENDING_STORE=memory keeps plans in one worker, so confirmations sent to another "
+                     "worker fail; use PENDING_STORE=sqlite with --workers > 1")
+    return args
+
+
+def shared_pending_store(workers: int):
+    """Plans awaiting confirmation must be visible to every worker."""
+    if workers > 1 and not os.getenv("PENDING_STORE"):
+        # Workers inherit the environment, and each reads it in app.config
+        os.environ["PENDING_STORE"] = "sqlite"
+        print("PENDING_STORE not set: using sqlite so any worker can confirm a pending plan")
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    shared_pending_store(args.workers)
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+
     print("VoiceOps Agent — Starting...")
-    print("API docs: http://localhost:8000/docs")
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    print(f"Workers: {args.workers} | loop: {loop} | http: {http}{' | reload' if args.reload else ''}")
+    print(f"API docs: http://localhost:{args.port}/docs")
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=None if args.reload else args.workers,
+        reload=args.reload,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# app.config builds the ES and LLM clients at import time
+os.environ.setdefault("ELASTICSEARCH_URL", "http://localhost:9200")
+os.environ.setdefault("LLM_API_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
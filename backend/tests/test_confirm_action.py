@@ -0,0 +1,29 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from app.pipeline import agent
+from app.services import pending_store
+
+PENDING = {
+    "transcript": "close AUTH-1",
+    "intent_data": {"intent": "close_ticket"},
+    "plan": {"actions": [{"step": 1, "type": "close_ticket", "params": {"ticket_id": "AUTH-1"}}]},
+    "start_time": datetime(2026, 1, 1, tzinfo=timezone.utc),
+}
+
+
+def test_plan_survives_a_failed_job_submit(monkeypatch):
+    async def submit(kind, command_id, payload):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(pending_store, "store", pending_store.MemoryPendingStore())
+    monkeypatch.setattr(agent, "JOB_QUEUE_ENABLED", True)
+    monkeypatch.setattr(agent.job_queue, "submit", submit)
+
+    async def scenario():
+        await pending_store.put("cmd-1", PENDING)
+        with pytest.raises(RuntimeError):
+            await agent.confirm_action("cmd-1", True, background=True)
+        return await pending_store.take("cmd-1")
+
+    assert asyncio.run(scenario()) == PENDING
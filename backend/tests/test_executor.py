@@ -0,0 +1,61 @@
+from app.pipeline import executor
+
+
+def test_string_step_numbers_are_coerced():
+    actions = [
+        {"step": "1", "type": "create_ticket", "params": {}},
+        {"step": "2", "type": "notify_slack", "params": {"message": "{{step1.ticket_id}}"}},
+        {"step": "three", "type": "notify_slack", "params": {}, "depends_on": ["2"]},
+    ]
+    assert executor._step_numbers(actions) == [1, 2, 3]
+    assert executor.infer_dependencies(actions) == {1: [], 2: [1], 3: [2]}
+
+
+def test_duplicate_step_numbers_fall_back_to_positions():
+    actions = [{"step": 1, "type": "create_ticket"}, {"step": 1, "type": "create_ticket"}]
+    assert executor._step_numbers(actions) == [1, 2]
+
+
+def test_dependencies_from_shared_tickets_and_slack_mentions():
+    actions = [
+        {"step": 1, "type": "update_ticket", "params": {"ticket_id": "AUTH-1"}},
+        {"step": 2, "type": "create_ticket", "params": {}},
+        {"step": 3, "type": "close_ticket", "params": {"ticket_id": "AUTH-1"}},
+        {"step": 4, "type": "notify_slack", "params": {"message": "AUTH-1 is closed"}},
+    ]
+    assert executor.infer_dependencies(actions) == {1: [], 2: [], 3: [1], 4: [3]}
+
+
+def test_only_earlier_steps_are_dependencies():
+    actions = [
+        {"step": 1, "type": "create_ticket", "params": {}, "depends_on": [2]},
+        {"step": 2, "type": "create_ticket", "params": {}, "depends_on": [1]},
+    ]
+    assert executor.infer_dependencies(actions) == {1: [], 2: [1]}
+
+
+def test_resolve_placeholders():
+    outputs = {1: {"ticket_id": "AUTH-7", "jira": {"jira_key": "VO-3"}, "count": 2}}
+    params = {
+        "ticket_id": "{{step1.ticket_id}}",
+        "count": "{{ step1.count }}",
+        "message": "Created {{step1.ticket_id}} ({{step1.jira.jira_key}}), see {{step2.ticket_id}}",
+        "labels": ["{{step1.missing}}"],
+    }
+    assert executor._resolve(params, outputs) == {
+        "ticket_id": "AUTH-7",
+        "count": 2,
+        "message": "Created AUTH-7 (VO-3), see {{step2.ticket_id}}",
+        "labels": [None],
+    }
+
+
+def test_critical_path_follows_latest_dependency():
+    results = [
+        {"step": 1, "depends_on": [], "end_offset_ms": 100},
+        {"step": 2, "depends_on": [], "end_offset_ms": 300},
+        {"step": 3, "depends_on": [1, 2], "end_offset_ms": 350},
+        {"step": 4, "depends_on": [1], "end_offset_ms": 200},
+    ]
+    assert executor.critical_path(results) == {"steps": [2, 3], "duration_ms": 350}
+    assert executor.critical_path([{"step": 1, "status": "error"}]) == {"steps": [], "duration_ms": 0}
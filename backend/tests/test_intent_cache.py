@@ -0,0 +1,31 @@
+import pytest
+from app.services import intent_cache
+
+
+@pytest.fixture(autouse=True)
+def near_duplicates(monkeypatch):
+    monkeypatch.setattr(intent_cache, "_entries", intent_cache.OrderedDict())
+    monkeypatch.setattr(intent_cache, "INTENT_CACHE_NEAR_DUPLICATES", True)
+    monkeypatch.setattr(intent_cache, "INTENT_CACHE_SIMILARITY", 0.5)
+
+
+def test_leading_zeros_are_kept():
+    assert intent_cache.normalize("close AUTH-012") != intent_cache.normalize("close AUTH-12")
+
+
+def test_near_duplicate_hit():
+    intent = {"intent": "close_ticket", "entities": {"ticket_id": "AUTH-12"}}
+    intent_cache.put("please close AUTH-12 now", intent)
+    assert intent_cache.get("um could you close AUTH-12 right now") == intent
+
+
+def test_near_duplicate_needs_same_ticket_reference():
+    intent_cache.put("close AUTH-12 it is fixed", {"intent": "close_ticket", "entities": {"ticket_id": "AUTH-12"}})
+    assert intent_cache.get("close VO-12 it is fixed") is None
+
+
+def test_near_duplicate_needs_cached_entities():
+    intent = {"intent": "update_ticket", "entities": {"ticket_id": "AUTH-12", "assignee": "maria.garcia"}}
+    intent_cache.put("assign AUTH-12 to maria today", intent)
+    assert intent_cache.get("assign AUTH-12 to alex today") is None
+    assert intent_cache.get("assign AUTH-12 to maria today please") == intent
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from app.services import speech_service
+
+
+def segments(count: int) -> list:
+    return [{"audio": b"", "start_seconds": i * 20.0, "end_seconds": i * 20.0 + 21} for i in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    async def sleep(seconds):
+        pass
+    monkeypatch.setattr(speech_service.asyncio, "sleep", sleep)
+
+
+def test_stitch_drops_repeated_overlap():
+    texts = ["we need to fix the login bug", "the login bug, on mobile safari", "Safari. And notify the team"]
+    assert speech_service.stitch(texts) == "we need to fix the login bug on mobile safari And notify the team"
+
+
+def test_stitch_keeps_short_single_word_repeats():
+    assert speech_service.stitch(["assign it to the", "the team"]) == "assign it to the the team"
+    assert speech_service.stitch(["page is broken", "Broken. again"]) == "page is broken again"
+
+
+def test_stitch_limits_overlap_length():
+    words = " ".join(f"w{i}" for i in range(20))
+    # Only the last _MAX_OVERLAP_WORDS words are compared, so a longer repeat is kept
+    assert speech_service.stitch([words, words]) == f"{words} {words}"
+
+
+def test_transcribe_chunks_retries_only_failed_chunks(monkeypatch):
+    calls = []
+    failures = {1: 2, 3: 1}
+
+    async def transcribe_audio(audio, filename):
+        index = int(filename.rsplit("-", 1)[1].split(".")[0])
+        calls.append(index)
+        if failures.get(index):
+            failures[index] -= 1
+            raise RuntimeError("503")
+        return f"part{index}"
+
+    monkeypatch.setattr(speech_service, "transcribe_audio", transcribe_audio)
+    text, report = asyncio.run(speech_service.transcribe_chunks(segments(4), "rec", ".wav"))
+
+    assert text == "part0 part1 part2 part3"
+    assert sorted(calls) == [0, 1, 1, 1, 2, 3, 3]
+    assert report["retried_chunks"] == [1, 3, 1]
+    assert report["chunks"] == 4
+
+
+def test_transcribe_chunks_gives_up_after_max_attempts(monkeypatch):
+    calls = []
+
+    async def transcribe_audio(audio, filename):
+        calls.append(filename)
+        if filename == "rec-1.wav":
+            raise RuntimeError("503")
+        return "ok"
+
+    monkeypatch.setattr(speech_service, "transcribe_audio", transcribe_audio)
+    with pytest.raises(RuntimeError):
+        asyncio.run(speech_service.transcribe_chunks(segments(2), "rec", ".wav"))
+    assert calls.count("rec-1.wav") == speech_service.STT_CHUNK_ATTEMPTS
+    assert calls.count("rec-0.wav") == 1
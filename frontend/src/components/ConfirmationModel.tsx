@@ -1,5 +1,6 @@
 import {
   CheckCircle2,
+  Clock,
   XCircle,
   AlertTriangle,
   ExternalLink,
@@ -95,6 +96,8 @@ export function ConfirmationModal({
                       <div style={styles.resultIcon}>
                         {r.status === 'success' ? (
                           <CheckCircle2 size={16} color={colors.success} />
+                        ) : r.status === 'queued' ? (
+                          <Clock size={16} color={colors.warning} />
                         ) : (
                           <XCircle size={16} color={colors.error} />
                         )}
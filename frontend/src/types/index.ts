@@ -83,7 +83,7 @@ export interface ExecutionResult {
   step: number
   type: string
   description: string
-  status: 'success' | 'failed' | 'error'
+  status: 'success' | 'queued' | 'failed' | 'skipped' | 'error'
   result?: Record<string, unknown>
   error?: string
 }
@@ -95,6 +95,7 @@ export interface ConfirmResponse {
   execution_results?: ExecutionResult[]
   total_actions?: number
   successful_actions?: number
+  queued_actions?: number
 }
 
 export interface AuditAction {